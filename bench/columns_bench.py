@@ -0,0 +1,91 @@
+""" Columnar aggregation benchmark for bungie_net_api
+
+Aggregates kills, deaths and efficiency over a synthetic activity history
+the way analytics code walks the decoded dicts, and again over the columns
+built by columns.ActivityColumns, reporting the time of each.  The column
+file round trip is timed too.
+
+usage: python bench/columns_bench.py [-r ROWS]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from bungie_net_api import columns  # noqa: E402
+from bungie_net_api import decoders  # noqa: E402
+from model_bench import history_body  # noqa: E402
+
+AGGREGATED = ('kills', 'deaths', 'efficiency')
+
+
+def aggregate_dicts(activities):
+    """aggregate_dicts(activities) -> {stat: total}"""
+
+    totals = dict((stat, 0.0) for stat in AGGREGATED)
+
+    for activity in activities:
+        values = activity['values']
+        for stat in AGGREGATED:
+            if stat in values:
+                totals[stat] += values[stat]['basic']['value']
+
+    return totals
+
+
+def aggregate_columns(table):
+    """aggregate_columns(table) -> {stat: total}"""
+
+    if columns.numpy is not None:
+        return dict((stat, float(columns.numpy.nansum(table[stat])))
+                    for stat in AGGREGATED)
+
+    return dict((stat, sum(value for value in table[stat] if value == value))
+                for stat in AGGREGATED)
+
+
+def timed(fn, *args):
+    """timed(fn, *args) -> (result, seconds)"""
+
+    start = time.perf_counter()
+    result = fn(*args)
+
+    return result, time.perf_counter() - start
+
+
+def main():
+    """main()"""
+
+    parser = argparse.ArgumentParser(description='columnar benchmark')
+    parser.add_argument('-r', '--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    activities = decoders.decode(history_body(args.rows))['Response'][
+        'activities']
+
+    expected, dict_seconds = timed(aggregate_dicts, activities)
+    table, build_seconds = timed(columns.activity_columns, activities)
+    totals, column_seconds = timed(aggregate_columns, table)
+
+    assert totals == expected, (totals, expected)
+
+    path = os.path.join(tempfile.mkdtemp(), 'history.cols')
+    _, write_seconds = timed(columns.write_columns, path, table)
+    _, read_seconds = timed(columns.read_columns, path)
+
+    print('%d activities, %s columns' % (
+        args.rows, 'numpy' if columns.numpy is not None else 'array'))
+    print('aggregate dicts     %8.2f ms' % (dict_seconds * 1000))
+    print('build columns       %8.2f ms (once)' % (build_seconds * 1000))
+    print('aggregate columns   %8.2f ms' % (column_seconds * 1000))
+    print('write / read file   %8.2f / %.2f ms (%.1f MB)' % (
+        write_seconds * 1000, read_seconds * 1000
+        , os.path.getsize(path) / 1e6))
+
+
+if __name__ == '__main__':
+    main()
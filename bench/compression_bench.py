@@ -0,0 +1,170 @@
+""" Compression benchmark for the bungie_net_api transport
+
+Runs the same workload against the fixture-replaying stand-in twice, once
+with the transport asking for identity bodies and once negotiating gzip,
+and reports the bytes received, the elapsed time and the median time to
+first byte and body read:
+
+  profiles  --requests getProfile() calls
+  pgcrs     --requests get_activity_stats() calls
+  manifest  Manifest.sync() of the json component tables
+  world     download_world_content(), streamed to disk
+
+--bandwidth caps the stand-in's sending rate per response, which is where
+the smaller bodies pay off in time as well as in bytes.
+
+usage: python bench/compression_bench.py [-n REQUESTS] [--bandwidth BPS]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import standin  # noqa: E402
+import bungie_net_api.api as api  # noqa: E402
+from bungie_net_api import instrumentation  # noqa: E402
+from bungie_net_api import manifest  # noqa: E402
+from bungie_net_api import transport  # noqa: E402
+
+
+def profiles(requests, threads, directory):
+    """profiles(requests, threads, directory)"""
+
+    first = int(standin.RECORDED_MEMBERSHIP_ID)
+
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(lambda member: api.getProfile(
+            str(first + member), '2', 'Profiles,Characters')
+            , range(requests)))
+
+
+def pgcrs(requests, threads, directory):
+    """pgcrs(requests, threads, directory)"""
+
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(lambda offset: api.get_activity_stats(
+            str(standin.FIRST_INSTANCE_ID - offset)), range(requests)))
+
+
+def manifest_tables(requests, threads, directory):
+    """manifest_tables(requests, threads, directory)"""
+
+    local = manifest.Manifest(os.path.join(directory, 'manifest.sqlite3'))
+    try:
+        local.sync(force=True)
+    finally:
+        local.close()
+
+
+def world_content(requests, threads, directory):
+    """world_content(requests, threads, directory)"""
+
+    os.remove(manifest.download_world_content(directory))
+
+
+class CountingTransport(transport.Transport):
+    """CountingTransport(**options)
+
+    Keeps the streamed responses it opened, which the request hooks do not
+    see, to count their bytes.
+    """
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.streamed = []
+
+    def open(self, url, headers=None):
+        """open(url, headers=None) -> StreamingResponse"""
+
+        response = super().open(url, headers)
+        self.streamed.append(response)
+
+        return response
+
+
+WORKLOADS = (('profiles', profiles), ('pgcrs', pgcrs)
+             , ('manifest', manifest_tables), ('world', world_content))
+
+
+def run(workload, compress, args):
+    """run(workload, compress, args) -> (bytes, seconds, first byte p50
+    , read p50)"""
+
+    counting = CountingTransport(compress=compress, pool_size=args.threads)
+    transport.set_transport(counting).close()
+
+    events = []
+    lock = threading.Lock()
+
+    def on_end(event):
+        with lock:
+            events.append(event)
+
+    hook = instrumentation.add_hook(on_end=on_end)
+
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            start = time.perf_counter()
+            workload(args.requests, args.threads, directory)
+            elapsed = time.perf_counter() - start
+    finally:
+        instrumentation.remove_hook(hook)
+
+    received = (sum(event.bytes_received or 0 for event in events)
+                + sum(response.size for response in counting.streamed))
+    first_bytes = [event.timings['first_byte'] for event in events
+                   if 'first_byte' in event.timings]
+    reads = [event.timings['read'] for event in events
+             if 'read' in event.timings]
+
+    return (received, elapsed
+            , statistics.median(first_bytes) if first_bytes else None
+            , statistics.median(reads) if reads else None)
+
+
+def _milliseconds(seconds):
+    """_milliseconds(seconds) -> formatted milliseconds or '-'"""
+
+    return '-' if seconds is None else '%.2f' % (seconds * 1e3)
+
+
+def main():
+    """main()"""
+
+    parser = standin.add_arguments(argparse.ArgumentParser(
+        description='compression benchmark'))
+    parser.add_argument('-n', '--requests', type=int, default=500)
+    parser.add_argument('-t', '--threads', type=int, default=8)
+    parser.set_defaults(compress=6, definitions=2000)
+    args = parser.parse_args()
+
+    # never touch a real key or config file
+
+    api.configure(config_file=os.devnull, api_key='benchmark'
+                  , scheduler=False)
+    api.ensure_configured()
+
+    print('%-9s %-9s %10s %9s %10s %9s' % (
+        'workload', 'encoding', 'MB recv', 'seconds', 'ttfb p50', 'read p50'))
+
+    with standin.StandIn(**standin.options_from(args)) as root:
+        api.BUNGIE_NET_ROOT = root
+        for name, workload in WORKLOADS:
+            for compress in (False, True):
+                received, elapsed, first_byte, read = run(workload, compress
+                                                          , args)
+                print('%-9s %-9s %10.2f %9.3f %10s %9s' % (
+                    name, 'gzip' if compress else 'identity', received / 1e6
+                    , elapsed, _milliseconds(first_byte)
+                    , _milliseconds(read)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+""" JSON decoding benchmark for bungie_net_api
+
+Decodes a synthetic multi-megabyte getProfile() body the way the transport
+used to (bytes -> str -> json.loads) and through each decoder available in
+bungie_net_api.decoders, reporting time per decode and peak memory
+allocated while decoding.  The getCharacters() projection is measured too,
+decoded in full and, with ijson installed, while parsing.
+
+usage: python bench/decode_bench.py [-i ITEMS] [-n RUNS]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from bungie_net_api import api  # noqa: E402
+from bungie_net_api import decoders  # noqa: E402
+from bungie_net_api import projection  # noqa: E402
+
+
+def profile_body(items):
+    """profile_body(items) -> bytes of a profile-shaped response"""
+
+    item_list = [{'itemHash': 1000 + index
+                  , 'itemInstanceId': str(6917529 + index)
+                  , 'quantity': 1, 'bindStatus': 0, 'location': 1
+                  , 'bucketHash': 138197802, 'transferStatus': 0
+                  , 'lockable': True, 'state': 1, 'dismantlePermission': 2
+                  , 'isWrapper': False, 'tooltipNotificationIndexes': []
+                  , 'overrideStyleItemHash': None}
+                 for index in range(items)]
+
+    response = {'Response': {
+        'profileInventory': {'data': {'items': item_list}, 'privacy': 1},
+        'characters': {'data': dict(
+            (str(2305843009 + index), {'characterId': str(2305843009 + index)
+                                       , 'classType': index, 'light': 1810
+                                       , 'stats': {'1935470627': 1810}
+                                       , 'emblemPath': '/common/x.jpg'})
+            for index in range(3)), 'privacy': 1},
+    }, 'ErrorCode': 1, 'ThrottleSeconds': 0, 'ErrorStatus': 'Success'
+        , 'Message': 'Ok', 'MessageData': {}}
+
+    return json.dumps(response).encode('utf-8')
+
+
+def legacy_decode(body):
+    """legacy_decode(body) -> the pre-decoders path"""
+
+    return json.loads(body.decode('utf-8'))
+
+
+def measure(decode, body, runs):
+    """measure(decode, body, runs) -> (seconds per decode, peak bytes)"""
+
+    decode(body)
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        decode(body)
+    elapsed = (time.perf_counter() - start) / runs
+
+    tracemalloc.start()
+    decode(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return elapsed, peak
+
+
+def main():
+    """main()"""
+
+    parser = argparse.ArgumentParser(description='decode benchmark')
+    parser.add_argument('-i', '--items', type=int, default=20000)
+    parser.add_argument('-n', '--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    body = profile_body(args.items)
+    print('body: %.1f MB' % (len(body) / 1e6))
+
+    candidates = [('bytes.decode + json.loads', legacy_decode)]
+    candidates.extend(('decoders.' + name, decoder)
+                      for name, decoder in sorted(decoders.DECODERS.items()))
+    candidates.append(('projection', projection.Projection(
+        api.CHARACTER_FIELDS).decode))
+    if decoders.ijson is not None:
+        candidates.append(('projection, streaming', projection.Projection(
+            api.CHARACTER_FIELDS, streaming=True).decode))
+
+    for name, decode in candidates:
+        elapsed, peak = measure(decode, body, args.runs)
+        print('%-28s %8.2f ms %8.1f MB peak' % (name, elapsed * 1000
+                                                , peak / 1e6))
+
+
+if __name__ == '__main__':
+    main()
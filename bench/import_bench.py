@@ -0,0 +1,87 @@
+""" Import-time benchmark for bungie_net_api
+
+Imports the package in fresh interpreters with no config file and no API
+key, reports the median cumulative import time from -X importtime, and
+fails if it exceeds the budget or if any of the modules that should only be
+loaded on the first request were imported eagerly.
+
+usage: python bench/import_bench.py [-n RUNS] [--budget-ms MS]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# modules that belong to the first request, not to the import
+
+DEFERRED_MODULES = ('asyncio', 'configparser', 'http.client', 'json', 'ssl'
+                    , 'sqlite3', 'urllib.request', 'concurrent.futures'
+                    , 'bungie_net_api.transport', 'bungie_net_api.scheduler')
+
+_PROBE = ("import sys, bungie_net_api; "
+          "print(','.join(m for m in %r if m in sys.modules))"
+          % (DEFERRED_MODULES,))
+
+
+def import_once(env):
+    """import_once(env) -> (microseconds, eagerly imported modules)"""
+
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', _PROBE]
+                            , cwd=ROOT, env=env, capture_output=True
+                            , text=True, check=True)
+
+    cumulative = None
+    for line in result.stderr.splitlines():
+        fields = [field.strip() for field in line.split('|')]
+        if len(fields) == 3 and fields[2] == 'bungie_net_api':
+            cumulative = int(fields[1])
+
+    eager = [module for module in result.stdout.strip().split(',') if module]
+
+    return cumulative, eager
+
+
+def main():
+    """main()"""
+
+    parser = argparse.ArgumentParser(description='import time benchmark')
+    parser.add_argument('-n', '--runs', type=int, default=20)
+    parser.add_argument('--budget-ms', type=float, default=25.0)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env['HOME'] = tempfile.mkdtemp()
+    env['PYTHONPATH'] = ROOT
+    for name in ('BUNGIE_NET_API_KEY', 'BUNGIE_NET_API_CONFIG'):
+        env.pop(name, None)
+
+    timings = []
+    eager = set()
+    for _ in range(args.runs):
+        microseconds, modules = import_once(env)
+        timings.append(microseconds)
+        eager.update(modules)
+
+    median_ms = statistics.median(timings) / 1000.0
+
+    print('import bungie_net_api: median %.2f ms, min %.2f ms over %d runs'
+          % (median_ms, min(timings) / 1000.0, args.runs))
+
+    failed = False
+    if eager:
+        print('eagerly imported: ' + ', '.join(sorted(eager)))
+        failed = True
+    if median_ms > args.budget_ms:
+        print('over budget of %.1f ms' % args.budget_ms)
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
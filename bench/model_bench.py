@@ -0,0 +1,90 @@
+""" Model memory benchmark for bungie_net_api
+
+Builds a synthetic activity history of N rows and reports the memory held
+by the decoded dicts and by the equivalent list of models.Activity, plus
+the time taken to convert.
+
+usage: python bench/model_bench.py [-r ROWS]
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from bungie_net_api import decoders  # noqa: E402
+from bungie_net_api import models  # noqa: E402
+
+STATS = ('assists', 'score', 'kills', 'deaths', 'averageScorePerKill'
+         , 'averageScorePerLife', 'completed', 'opponentsDefeated'
+         , 'efficiency', 'killsDeathsRatio', 'killsDeathsAssists'
+         , 'activityDurationSeconds', 'completionReason', 'fireteamId'
+         , 'startSeconds', 'timePlayedSeconds', 'playerCount', 'teamScore')
+
+
+def history_body(rows):
+    """history_body(rows) -> bytes of a getActivityHistory() response"""
+
+    activities = [{
+        'period': '2024-01-01T00:00:00Z',
+        'activityDetails': {'referenceId': 2693136600
+                            , 'directorActivityHash': 2693136600
+                            , 'instanceId': str(10000000000 + row)
+                            , 'mode': 5, 'modes': [5, 69]
+                            , 'isPrivate': False, 'membershipType': 2},
+        'values': dict((stat, {'statId': stat
+                               , 'basic': {'value': float(row % 17)
+                                           , 'displayValue': str(row % 17)}})
+                       for stat in STATS)} for row in range(rows)]
+
+    return json.dumps({'Response': {'activities': activities}
+                       , 'ErrorCode': 1, 'ThrottleSeconds': 0
+                       , 'ErrorStatus': 'Success', 'Message': 'Ok'
+                       , 'MessageData': {}}).encode('utf-8')
+
+
+def held(build):
+    """held(build) -> (result, bytes still allocated after build())"""
+
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, current
+
+
+def main():
+    """main()"""
+
+    parser = argparse.ArgumentParser(description='model memory benchmark')
+    parser.add_argument('-r', '--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    body = history_body(args.rows)
+
+    envelope, dict_bytes = held(lambda: decoders.decode(body))
+
+    start = time.perf_counter()
+    models.activities_from_envelope(envelope)
+    elapsed = time.perf_counter() - start
+    del envelope
+
+    _, model_bytes = held(lambda: models.activities_from_envelope(
+        decoders.decode(body)))
+
+    print('%d activities' % args.rows)
+    print('dicts    %8.1f MB' % (dict_bytes / 1e6))
+    print('models   %8.1f MB  (%.2f s to convert)' % (model_bytes / 1e6
+                                                      , elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+""" OAuth session benchmark for the bungie_net_api package
+
+Runs --threads threads making getProfile() calls for --sessions users
+against the fixture-replaying stand-in, whose access tokens expire after
+--token-lifetime seconds, for --seconds seconds, in two modes:
+
+  session  each user has an OAuthSession, refreshed before expiry
+  token    each user has the access token it started with
+
+and reports the calls per second, the token refreshes, the calls refused
+with 401 and the p50/p99 call latency.
+
+usage: python bench/oauth_bench.py [--sessions N] [--token-lifetime SECONDS]
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import standin  # noqa: E402
+import bungie_net_api.api as api  # noqa: E402
+from bungie_net_api import oauth  # noqa: E402
+
+MEMBERSHIP_TYPE = '2'
+
+
+def sessions_for(count, lifetime, refresh_margin):
+    """sessions_for(count, lifetime, refresh_margin) -> OAuthSessions
+
+    Their tokens expire at random times within lifetime, like the sessions
+    of users who signed in at different times.
+    """
+
+    first = int(standin.RECORDED_MEMBERSHIP_ID)
+
+    return [oauth.OAuthSession({'access_token': 'signed-in.%d' % index
+                                , 'refresh_token': 'refresh.0.%d' % (
+                                    first + index)
+                                , 'expires_in': random.uniform(0, lifetime)
+                                , 'membership_id': str(first + index)}
+                               , refresh_margin=refresh_margin)
+            for index in range(count)]
+
+
+def run(mode, sessions, args):
+    """run(mode, sessions, args) -> (calls, refused, latencies)"""
+
+    if mode == 'token':
+        # the token each user signed in with, never refreshed
+        users = [(session.token.membership_id, session.token.access_token)
+                 for session in sessions]
+    else:
+        users = [(session.token.membership_id, session)
+                 for session in sessions]
+
+    deadline = time.perf_counter() + args.seconds
+    lock = threading.Lock()
+    latencies = []
+    refused = [0]
+
+    def worker(seed):
+        chooser = random.Random(seed)
+        local = []
+        local_refused = 0
+        while time.perf_counter() < deadline:
+            membership_id, token = chooser.choice(users)
+            start = time.perf_counter()
+            try:
+                api.getProfile(membership_id, MEMBERSHIP_TYPE, 'Profiles'
+                               , token=token)
+            except urllib.error.HTTPError as error:
+                if error.code != 401:
+                    raise
+                local_refused += 1
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+            refused[0] += local_refused
+
+    threads = [threading.Thread(target=worker, args=(seed,))
+               for seed in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+
+    return len(latencies), refused[0], latencies
+
+
+def main():
+    """main()"""
+
+    parser = standin.add_arguments(argparse.ArgumentParser(
+        description='OAuth session benchmark'))
+    parser.add_argument('--sessions', type=int, default=2000)
+    parser.add_argument('-t', '--threads', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--refresh-margin', type=float, default=1.0)
+    parser.set_defaults(token_lifetime=4.0)
+    args = parser.parse_args()
+
+    # never touch a real key or config file; every call goes to the server
+
+    api.configure(config_file=os.devnull, api_key='benchmark'
+                  , pool_size=args.threads, scheduler=False)
+
+    print('%-8s %8s %8s %9s %8s %8s %8s' % (
+        'mode', 'calls', 'calls/s', 'refreshes', 'refused', 'p50 ms'
+        , 'p99 ms'))
+
+    with standin.StandIn(**standin.options_from(args)) as root:
+        api.BUNGIE_NET_ROOT = root
+        for mode in ('session', 'token'):
+            sessions = sessions_for(args.sessions, args.token_lifetime
+                                    , args.refresh_margin)
+            if mode == 'token':
+                # sign everyone in first, then stop refreshing
+                for session in sessions:
+                    session.refresh()
+            signed_in = sum(session.refreshes for session in sessions)
+            calls, refused, latencies = run(mode, sessions, args)
+            print('%-8s %8d %8.0f %9d %8d %8.2f %8.2f' % (
+                mode, calls, calls / args.seconds
+                , sum(session.refreshes for session in sessions) - signed_in
+                , refused
+                , latencies[len(latencies) // 2] * 1e3
+                , latencies[min(len(latencies) - 1
+                                , int(0.99 * len(latencies)))] * 1e3))
+
+
+if __name__ == '__main__':
+    main()
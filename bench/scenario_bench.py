@@ -0,0 +1,341 @@
+""" Offline scenario benchmark for bungie_net_api
+
+Starts the fixture-replaying stand-in (bench/standin.py) and runs typical
+workloads through the public functions of the package against it:
+
+  clan      get_clan_roster() of a --clan-size member clan
+  history   sync_characters() of --characters full activity histories
+  manifest  Manifest.sync() then --lookups get_item_by_hash() calls
+  pgcr      fetch_pgcrs() of --reports Post Game Carnage Reports
+  pipeline  process_pgcrs() of --reports reports, reduced in a process pool
+  leaderboards  ClanLeaderboards.refresh() of --modes, then --lookups
+            top() and rank_of() queries
+  identity  --lookups IdentityResolver.search_many() names in batches of
+            50, one in ten a name nobody has
+
+Each scenario runs in a fresh interpreter, so its peak RSS is its own, and
+reports operations per second, HTTP requests, p50/p99 request latency (from
+an instrumentation hook), throttled responses and peak RSS.  --json writes
+the results; --baseline compares against such a file and exits non-zero
+when throughput or p99 latency regressed by more than --tolerance.
+
+usage: python bench/scenario_bench.py [SCENARIO ...] [--latency SECONDS]
+                                      [--throttle-rate RATE] ...
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import standin  # noqa: E402
+
+GROUP_ID = '4107840'
+MEMBERSHIP_TYPE = '2'
+ITEM_DEFINITION = 'DestinyInventoryItemDefinition'
+
+
+def percentile(values, fraction):
+    """percentile(values, fraction) -> nearest-rank percentile of sorted
+    values"""
+
+    if not values:
+        return None
+
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def peak_rss():
+    """peak_rss() -> peak resident set size of this process in bytes"""
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # kilobytes everywhere but on macOS
+
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def clan_fanout(args, directory):
+    """clan_fanout(args, directory) -> members fetched"""
+
+    from bungie_net_api import roster
+
+    return len(roster.get_clan_roster(GROUP_ID, workers=args.workers)[
+        'members'])
+
+
+def history_crawl(args, directory):
+    """history_crawl(args, directory) -> activities stored"""
+
+    from bungie_net_api import history
+
+    first_member = int(standin.RECORDED_MEMBERSHIP_ID)
+    first_character = int(standin.RECORDED_CHARACTER_ID)
+    characters = [(str(first_member + index), MEMBERSHIP_TYPE
+                   , str(first_character + index))
+                  for index in range(args.characters)]
+
+    store = history.HistoryStore(os.path.join(directory, 'history.sqlite3'))
+    try:
+        synced = history.sync_characters(store, characters
+                                         , workers=args.workers)
+    finally:
+        store.close()
+
+    return sum(len(new_ids) for new_ids in synced.values())
+
+
+def manifest_resolution(args, directory):
+    """manifest_resolution(args, directory) -> definitions resolved"""
+
+    from bungie_net_api import api
+    from bungie_net_api import manifest
+
+    local = manifest.Manifest(os.path.join(directory, 'manifest.sqlite3'))
+    local.sync()
+    api.use_manifest(local)
+
+    first = standin.recorded_hash(args.fixtures, ITEM_DEFINITION)
+
+    try:
+        for index in range(args.lookups):
+            api.get_item_by_hash(ITEM_DEFINITION
+                                 , str(first + index % args.definitions))
+    finally:
+        api.use_manifest(None)
+        local.close()
+
+    return args.lookups
+
+
+def pgcr_ingest(args, directory):
+    """pgcr_ingest(args, directory) -> reports stored"""
+
+    from bungie_net_api import pgcr
+
+    activity_ids = range(standin.FIRST_INSTANCE_ID
+                         , standin.FIRST_INSTANCE_ID - args.reports, -1)
+
+    store = pgcr.PGCRStore(os.path.join(directory, 'pgcr.sqlite3'))
+    try:
+        return sum(1 for _ in pgcr.fetch_pgcrs(activity_ids, store
+                                               , workers=args.workers
+                                               , skip_errors=True))
+    finally:
+        store.close()
+
+
+def player_kills(envelope):
+    """player_kills(envelope) -> {characterId: kills} of a PGCR"""
+
+    return dict((entry['characterId'], entry['values']['kills']['basic'][
+        'value']) for entry in envelope['Response']['entries'])
+
+
+def pipeline_ingest(args, directory):
+    """pipeline_ingest(args, directory) -> reports reduced"""
+
+    from bungie_net_api import pipeline
+
+    activity_ids = range(standin.FIRST_INSTANCE_ID
+                         , standin.FIRST_INSTANCE_ID - args.reports, -1)
+
+    return sum(1 for _ in pipeline.process_pgcrs(activity_ids, player_kills
+                                                 , workers=args.workers
+                                                 , skip_errors=True))
+
+
+def leaderboard_queries(args, directory):
+    """leaderboard_queries(args, directory) -> queries answered"""
+
+    from bungie_net_api import leaderboards
+
+    boards = leaderboards.ClanLeaderboards(GROUP_ID, args.modes
+                                           , max_top=args.clan_size
+                                           , workers=args.workers)
+    boards.refresh()
+
+    keys = sorted(boards.boards())
+    first = int(standin.RECORDED_MEMBERSHIP_ID)
+
+    for index in range(args.lookups):
+        mode, stat_id = keys[index % len(keys)]
+        boards.top(mode, stat_id, 10)
+        boards.rank_of(mode, stat_id, first + index % args.clan_size)
+
+    return args.lookups
+
+
+def identity_lookups(args, directory):
+    """identity_lookups(args, directory) -> names resolved"""
+
+    from bungie_net_api import identity
+
+    # members past --clan-size do not exist
+
+    names = ['Guardian%d#1234' % (index % (args.clan_size * 11 // 10))
+             for index in range(args.lookups)]
+
+    with identity.IdentityResolver(os.path.join(directory, 'identities')
+                                   , workers=args.workers) as resolver:
+        for start in range(0, len(names), 50):
+            resolver.search_many(names[start:start + 50])
+
+    return len(names)
+
+
+SCENARIOS = {'clan': clan_fanout, 'history': history_crawl
+             , 'manifest': manifest_resolution, 'pgcr': pgcr_ingest
+             , 'pipeline': pipeline_ingest
+             , 'leaderboards': leaderboard_queries
+             , 'identity': identity_lookups}
+
+
+def run_scenario(name, root, args):
+    """run_scenario(name, root, args) -> result dict
+
+    Runs in a worker process of its own.
+    """
+
+    from bungie_net_api import api
+    from bungie_net_api import instrumentation
+
+    # never touch a real key or config file
+
+    api.configure(config_file=os.devnull, api_key='benchmark'
+                  , pool_size=args.workers, scheduler=bool(args.client_rate)
+                  , rate=args.client_rate or None
+                  , burst=int(args.client_rate) or None)
+    api.BUNGIE_NET_ROOT = root
+
+    durations = []
+    throttled = []
+    errors = []
+    lock = threading.Lock()
+
+    def on_end(event):
+        with lock:
+            durations.append(event.duration)
+            if event.throttled:
+                throttled.append(event)
+            if event.error is not None:
+                errors.append(event)
+
+    hook = instrumentation.add_hook(on_end=on_end)
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        operations = SCENARIOS[name](args, directory)
+        elapsed = time.perf_counter() - start
+
+    instrumentation.remove_hook(hook)
+    durations.sort()
+
+    return {'scenario': name, 'operations': operations
+            , 'requests': len(durations), 'seconds': elapsed
+            , 'throughput': operations / elapsed
+            , 'p50': percentile(durations, 0.50)
+            , 'p99': percentile(durations, 0.99)
+            , 'throttled': len(throttled), 'errors': len(errors)
+            , 'peak_rss': peak_rss()}
+
+
+def regressions(results, baseline, tolerance):
+    """regressions(results, baseline, tolerance) -> list of messages"""
+
+    previous = dict((result['scenario'], result) for result in baseline)
+    messages = []
+
+    for result in results:
+        before = previous.get(result['scenario'])
+        if before is None:
+            continue
+        if result['throughput'] < before['throughput'] * (1 - tolerance):
+            messages.append('%s: throughput %.1f/s, was %.1f/s' % (
+                result['scenario'], result['throughput']
+                , before['throughput']))
+        if (result['p99'] is not None and before['p99'] is not None
+                and result['p99'] > before['p99'] * (1 + tolerance)):
+            messages.append('%s: p99 %.1f ms, was %.1f ms' % (
+                result['scenario'], result['p99'] * 1e3, before['p99'] * 1e3))
+
+    return messages
+
+
+def _milliseconds(seconds):
+    """_milliseconds(seconds) -> formatted milliseconds or '-'"""
+
+    return '-' if seconds is None else '%.1f' % (seconds * 1e3)
+
+
+def main():
+    """main()"""
+
+    parser = standin.add_arguments(argparse.ArgumentParser(
+        description='offline scenario benchmark'))
+    parser.add_argument('scenarios', nargs='*', metavar='SCENARIO'
+                        , help=', '.join(sorted(SCENARIOS)) + ' (all)')
+    parser.add_argument('-w', '--workers', type=int, default=8)
+    parser.add_argument('--characters', type=int, default=8)
+    parser.add_argument('--lookups', type=int, default=20000)
+    parser.add_argument('--reports', type=int, default=2000)
+    parser.add_argument('--modes', default='allPvP,pvecomp_gambit,raid'
+                        ',allStrikes', help='leaderboard modes')
+    parser.add_argument('--client-rate', type=float, default=0.0
+                        , help='requests per second of the client scheduler'
+                        ' (0: no scheduler)')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--baseline', help='results file to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+
+    scenarios = args.scenarios or ['clan', 'history', 'manifest', 'pgcr'
+                                   , 'pipeline', 'leaderboards'
+                                   , 'identity']
+
+    for name in scenarios:
+        if name not in SCENARIOS:
+            parser.error('unknown scenario ' + repr(name))
+    context = multiprocessing.get_context('spawn')
+    results = []
+
+    print('%-12s %8s %10s %8s %9s %9s %9s %8s' % (
+        'scenario', 'ops', 'ops/s', 'requests', 'p50 ms', 'p99 ms'
+        , 'throttled', 'rss MB'))
+
+    with standin.StandIn(**standin.options_from(args)) as root:
+        for name in scenarios:
+            with ProcessPoolExecutor(1, mp_context=context) as executor:
+                result = executor.submit(run_scenario, name, root
+                                         , args).result()
+            results.append(result)
+            print('%-12s %8d %10.1f %8d %9s %9s %9d %8.1f' % (
+                name, result['operations'], result['throughput']
+                , result['requests'], _milliseconds(result['p50'])
+                , _milliseconds(result['p99']), result['throttled']
+                , result['peak_rss'] / 1e6))
+
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump(results, output, indent=1)
+
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            messages = regressions(results, json.load(baseline)
+                                   , args.tolerance)
+        for message in messages:
+            print('REGRESSION ' + message)
+        if messages:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,705 @@
+""" Local stand-in for the Bungie.net API, replaying recorded fixtures
+
+Serves the responses recorded in bench/fixtures (or another directory of
+the same names) with the requested ids substituted, so a benchmark sees
+realistic payloads without touching the live API:
+
+  profile.json      GET /Platform/Destiny2/{type}/Profile/{id}/
+  members.json      GET /Platform/GroupV2/{id}/Members/, repeated to
+                    --clan-size members; the same members are found as
+                    Guardian{n}#1234 by .../SearchDestinyPlayer/{type}/
+                    {name}/ and by /Platform/User/GetMembershipsById/{id}/
+  leaderboards.json GET /Platform/Destiny2/Stats/Leaderboards/Clans/{id}/
+                    with maxtop of the --clan-size members on the boards
+                    of every requested mode and stat
+  activity.json     GET .../Character/{id}/Stats/Activities/, paged out of
+                    a history of --history activities
+  pgcr.json         GET /Platform/Destiny2/Stats/PostGameCarnageReport/{id}/
+                    with --players entries
+  manifest.json     GET /Platform/Destiny2/Manifest/
+  <EntityType>.json the manifest's json component tables, repeated to
+                    --definitions definitions, and single definitions at
+                    /Platform/Destiny2/Manifest/{type}/{hash}/; the same
+                    tables make up the zipped world content database
+
+POST /Platform/App/OAuth/token/ exchanges any refresh token for an access
+token valid for --token-lifetime seconds.  Requests bearing such a token
+after it expired are refused with HTTP 401 and ErrorCode 99
+(WebAuthRequired); other bearer tokens are not checked.
+
+Every response is delayed by --latency seconds, and once more than
+--throttle-rate requests per second arrive the excess is answered with
+ErrorCode 36 (ThrottleLimitExceededMomentarily) and --throttle-seconds.
+With --compress, bodies are gzip or deflate encoded for clients that
+accept it, as www.bungie.net does, and --bandwidth caps how fast each body
+is sent, to make the transfer size show in the timings.
+
+StandIn runs the server in its own process so it does not compete with the
+client for the interpreter lock:
+
+  with StandIn(latency=0.02) as root:
+      api.BUNGIE_NET_ROOT = root
+
+usage: python bench/standin.py [--port PORT] [--latency SECONDS] ...
+"""
+
+import argparse
+import gzip
+import http.server
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import re
+import socketserver
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import zipfile
+import zlib
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__))
+                        , 'fixtures')
+
+DEFAULT_CLAN_SIZE = 100
+DEFAULT_HISTORY = 2000
+DEFAULT_PLAYERS = 12
+DEFAULT_DEFINITIONS = 5000
+
+# ids the recorded fixtures carry, replaced in every response
+
+RECORDED_MEMBERSHIP_ID = b'4611686018429783292'
+RECORDED_CHARACTER_ID = b'2305843009260574394'
+RECORDED_INSTANCE_ID = b'14120875113'
+RECORDED_PERIOD = b'2024-03-02T20:51:05Z'
+
+FIRST_INSTANCE_ID = 14120875113
+PERIOD_STEP = 600
+
+THROTTLE_ERROR_CODE = 36
+
+ACCOUNT_NOT_FOUND_CODE = 217
+
+AUTH_ERROR_CODE = 99
+TOKEN_PATH = '/Platform/App/OAuth/token/'
+DEFAULT_TOKEN_LIFETIME = 3600
+REFRESH_TOKEN_LIFETIME = 90 * 24 * 3600
+
+BANDWIDTH_CHUNK = 16 * 1024
+
+# the boards of a leaderboard request without a statId
+
+LEADERBOARD_STATS = ('lbKills', 'lbDeaths', 'lbAssists', 'lbPrecisionKills'
+                     , 'lbSingleGameKills')
+
+_COMPONENT_PATH = re.compile(r'/(\w+)-bench\.json$')
+
+
+def recorded_hash(directory, entity_type):
+    """recorded_hash(directory, entity_type) -> hash of the recorded
+    definition; the table serves it and the definitions - 1 hashes after
+    it"""
+
+    with open(os.path.join(directory, entity_type + '.json')) as fixture:
+        (hash_identifier, _), = json.load(fixture).items()
+
+    return int(hash_identifier)
+
+
+def _envelope(response, error_code=1, error_status='Success'
+              , message='Ok', throttle_seconds=0):
+    """_envelope(response, ...) -> bytes of a Bungie response envelope"""
+
+    return json.dumps({'Response': response, 'ErrorCode': error_code
+                       , 'ThrottleSeconds': throttle_seconds
+                       , 'ErrorStatus': error_status, 'Message': message
+                       , 'MessageData': {}}
+                      , separators=(',', ':')).encode('utf-8')
+
+
+def _period(index):
+    """_period(index) -> bytes of the period of the index-th newest
+    activity"""
+
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(
+        1709412665 - index * PERIOD_STEP)).encode('ascii')
+
+
+class Fixtures(object):
+    """Fixtures(directory=FIXTURES, clan_size=100, history=2000, players=12
+    , definitions=5000)
+
+    Pre-renders the recorded responses once; render() only substitutes ids.
+    """
+
+    def __init__(self, directory=FIXTURES, clan_size=DEFAULT_CLAN_SIZE
+                 , history=DEFAULT_HISTORY, players=DEFAULT_PLAYERS
+                 , definitions=DEFAULT_DEFINITIONS):
+
+        self.directory = directory
+        self.history = history
+        self.clan_size = clan_size
+
+        def load(name):
+            with open(os.path.join(directory, name + '.json')) as fixture:
+                return json.load(fixture)
+
+        def compact(document):
+            return json.dumps(document, separators=(',', ':')).encode('utf-8')
+
+        self.profile = compact(load('profile'))
+
+        members = load('members')
+        recorded = json.dumps(members['Response']['results'][0])
+        members['Response']['results'] = [
+            json.loads(recorded.replace(RECORDED_MEMBERSHIP_ID.decode()
+                                        , str(int(RECORDED_MEMBERSHIP_ID)
+                                              + member)))
+            for member in range(clan_size)]
+        members['Response']['totalResults'] = clan_size
+        self.members = compact(members)
+        self.user_info = json.dumps(members['Response']['results'][0][
+            'destinyUserInfo'])
+
+        self.activity = compact(load('activity'))
+
+        (self.leaderboard_entry,), = (
+            board['entries'] for boards in load('leaderboards')[
+                'Response'].values() for board in boards.values())
+        self._leaderboards = {}
+
+        report = load('pgcr')
+        recorded = json.dumps(report['Response']['entries'][0])
+        report['Response']['entries'] = [
+            json.loads(recorded.replace(RECORDED_CHARACTER_ID.decode()
+                                        , str(int(RECORDED_CHARACTER_ID)
+                                              + player)))
+            for player in range(players)]
+        self.pgcr = compact(report)
+
+        manifest = load('manifest')
+        self.manifest = compact(manifest)
+
+        # every component table holds definitions copies of its recorded
+        # definition, under consecutive hashes
+
+        self.tables = {}
+        self.definitions = {}
+
+        for path in manifest['Response']['jsonWorldComponentContentPaths'][
+                'en'].values():
+            entity_type = _COMPONENT_PATH.search(path).group(1)
+            (hash_identifier, definition), = load(entity_type).items()
+            template = compact(definition)
+            self.definitions[entity_type] = (hash_identifier.encode('ascii')
+                                             , template)
+            self.tables[path] = b'{' + b','.join(
+                b'"%d":%s' % (int(hash_identifier) + index, template.replace(
+                    hash_identifier.encode('ascii')
+                    , b'%d' % (int(hash_identifier) + index)))
+                for index in range(definitions)) + b'}'
+
+        self.world_content_path = manifest['Response'][
+            'mobileWorldContentPaths']['en']
+        self.world_content = self._world_content()
+
+    def _world_content(self):
+        """_world_content() -> bytes of the zipped world content database"""
+
+        # Bungie's schema: one table per entity type, keyed by the signed
+        # 32 bit hash
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'world.content')
+            database = sqlite3.connect(path)
+            with database:
+                for table_path, table in self.tables.items():
+                    entity_type = _COMPONENT_PATH.search(table_path).group(1)
+                    database.execute('CREATE TABLE %s (id INTEGER PRIMARY KEY'
+                                     ' NOT NULL, json BLOB)' % entity_type)
+                    database.executemany(
+                        'INSERT INTO %s VALUES (?, ?)' % entity_type
+                        , ((int(hash_identifier) - (1 << 32)
+                            if int(hash_identifier) >= 1 << 31
+                            else int(hash_identifier)
+                            , json.dumps(definition).encode('utf-8'))
+                           for hash_identifier, definition
+                           in json.loads(table).items()))
+            database.close()
+
+            archive = io.BytesIO()
+            with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zipped:
+                zipped.write(path, os.path.basename(self.world_content_path))
+
+        return archive.getvalue()
+
+    def user_card(self, member):
+        """user_card(member) -> destinyUserInfo of the member-th member"""
+
+        card = json.loads(self.user_info.replace(
+            RECORDED_MEMBERSHIP_ID.decode()
+            , str(int(RECORDED_MEMBERSHIP_ID) + member)))
+        card['bungieGlobalDisplayName'] = 'Guardian%d' % member
+
+        return card
+
+    def search_player(self, display_name):
+        """search_player(display_name) -> bytes of a SearchDestinyPlayer
+        response"""
+
+        match = re.match(r'guardian(\d+)#1234$', display_name.lower())
+
+        if match is None or int(match.group(1)) >= self.clan_size:
+            return _envelope([])
+
+        return _envelope([self.user_card(int(match.group(1)))])
+
+    def memberships(self, membership_id):
+        """memberships(membership_id) -> bytes of a GetMembershipsById
+        response"""
+
+        member = membership_id - int(RECORDED_MEMBERSHIP_ID)
+
+        if not 0 <= member < self.clan_size:
+            return _envelope(None, ACCOUNT_NOT_FOUND_CODE
+                             , 'UserCannotResolveCentralAccount'
+                             , 'We could not find the account')
+
+        return _envelope({'destinyMemberships': [self.user_card(member)]
+                          , 'primaryMembershipId': str(membership_id)
+                          , 'bungieNetUser': None})
+
+    def leaderboards(self, modes, stat_id, max_top):
+        """leaderboards(modes, stat_id, max_top) -> bytes of a clan
+        leaderboards response"""
+
+        key = (modes, stat_id, max_top)
+        body = self._leaderboards.get(key)
+
+        if body is not None:
+            return body
+
+        # member i ranks i + 1 on every board, by a board specific margin
+
+        recorded = json.dumps(self.leaderboard_entry)
+        entries = []
+        for member in range(min(max_top, self.clan_size)):
+            entry = json.loads(recorded.replace(
+                RECORDED_MEMBERSHIP_ID.decode()
+                , str(int(RECORDED_MEMBERSHIP_ID) + member)).replace(
+                    RECORDED_CHARACTER_ID.decode()
+                    , str(int(RECORDED_CHARACTER_ID) + member)))
+            entry['rank'] = member + 1
+            entries.append(entry)
+
+        response = {}
+        for mode in modes.split(','):
+            response[mode] = {}
+            for stat in ([stat_id] if stat_id else LEADERBOARD_STATS):
+                margin = 1 + zlib.crc32((mode + stat).encode('utf-8')) % 7
+                board = json.loads(json.dumps(entries))
+                for entry in board:
+                    value = (self.clan_size - entry['rank'] + 1) * margin
+                    entry['value'] = {'statId': stat, 'basic': {
+                        'value': float(value), 'displayValue': str(value)}}
+                response[mode][stat] = {'statId': stat, 'entries': board}
+
+        body = self._leaderboards[key] = _envelope(response)
+
+        return body
+
+    def activity_page(self, character_id, count, page):
+        """activity_page(character_id, count, page) -> bytes of one history
+        page"""
+
+        # each character gets its own run of instance ids
+
+        first = count * page
+        rows = range(first, min(first + count, self.history))
+        newest = FIRST_INSTANCE_ID - (character_id % 1000) * self.history
+        activities = b','.join(
+            self.activity.replace(RECORDED_INSTANCE_ID
+                                  , b'%d' % (newest - row))
+            .replace(RECORDED_PERIOD, _period(row)) for row in rows)
+
+        # an exhausted history answers with an empty Response, like the API
+
+        if not rows:
+            return _envelope({})
+
+        return (b'{"Response":{"activities":[' + activities
+                + b']},"ErrorCode":1,"ThrottleSeconds":0'
+                b',"ErrorStatus":"Success","Message":"Ok","MessageData":{}}')
+
+    def render(self, path, query):
+        """render(path, query) -> (status, body)"""
+
+        match = re.match(r'/Platform/Destiny2/\d+/Profile/(\d+)/$', path)
+        if match:
+            return 200, self.profile.replace(RECORDED_MEMBERSHIP_ID
+                                             , match.group(1).encode())
+
+        match = re.match(r'/Platform/GroupV2/\d+/Members/$', path)
+        if match:
+            return 200, self.members
+
+        match = re.match(r'/Platform/Destiny2/SearchDestinyPlayer/-?\d+/'
+                         r'([^/]+)/$', path)
+        if match:
+            return 200, self.search_player(urllib.parse.unquote(
+                match.group(1)))
+
+        match = re.match(r'/Platform/User/GetMembershipsById/(\d+)/-?\d+/$'
+                         , path)
+        if match:
+            return 200, self.memberships(int(match.group(1)))
+
+        if re.match(r'/Platform/Destiny2/Stats/Leaderboards/Clans/\d+/?$'
+                    , path):
+            return 200, self.leaderboards(query.get('modes', '')
+                                          , query.get('statId')
+                                          , int(query.get('maxtop', 5)))
+
+        match = re.match(r'/Platform/Destiny2/\d+/Account/\d+/Character/(\d+)'
+                         r'/Stats/Activities/$', path)
+        if match:
+            return 200, self.activity_page(int(match.group(1))
+                                           , int(query.get('count', 25))
+                                           , int(query.get('page', 0)))
+
+        match = re.match(r'/Platform/Destiny2/Stats/PostGameCarnageReport'
+                         r'/(\d+)/$', path)
+        if match:
+            return 200, self.pgcr.replace(RECORDED_INSTANCE_ID
+                                          , match.group(1).encode())
+
+        if path == '/Platform/Destiny2/Manifest/':
+            return 200, self.manifest
+
+        match = re.match(r'/Platform/Destiny2/Manifest/(\w+)/(\d+)/$', path)
+        if match and match.group(1) in self.definitions:
+            recorded_hash, template = self.definitions[match.group(1)]
+            return 200, (b'{"Response":' + template.replace(
+                recorded_hash, match.group(2).encode())
+                + b',"ErrorCode":1,"ThrottleSeconds":0,"ErrorStatus"'
+                b':"Success","Message":"Ok","MessageData":{}}')
+
+        if path in self.tables:
+            return 200, self.tables[path]
+
+        if path == self.world_content_path:
+            return 200, self.world_content
+
+        return 404, _envelope(None, 2101, 'ApiInvalidOrExpiredKey'
+                              , 'Not recorded: ' + path)
+
+
+class Throttle(object):
+    """Throttle(rate, seconds=1)
+
+    Token bucket of rate requests per second; allow() is False once it is
+    empty.
+    """
+
+    def __init__(self, rate, seconds=1):
+        self.rate = float(rate)
+        self.seconds = seconds
+        self.throttled = 0
+
+        self._tokens = self.rate
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """allow() -> whether a request may be served now"""
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens
+                               + (now - self._updated) * self.rate)
+            self._updated = now
+
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+
+            self.throttled += 1
+            return False
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    """StandInHandler()"""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        """do_GET()"""
+
+        server = self.server
+        url = urllib.parse.urlsplit(self.path)
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        # the manifest tables come from the CDN, which is not rate limited
+
+        if (server.throttle is not None and url.path.startswith('/Platform/')
+                and not server.throttle.allow()):
+            status, body = 200, _envelope(
+                None, THROTTLE_ERROR_CODE, 'ThrottleLimitExceededMomentarily'
+                , 'Too many requests', server.throttle.seconds)
+        elif server.expired(self.headers.get('Authorization')):
+            status, body = 401, _envelope(
+                None, AUTH_ERROR_CODE, 'WebAuthRequired'
+                , 'Please sign-in to continue.')
+        else:
+            status, body = server.fixtures.render(
+                url.path, dict(urllib.parse.parse_qsl(url.query)))
+
+        self._send(status, body)
+
+    def do_POST(self):
+        """do_POST()"""
+
+        server = self.server
+        form = dict(urllib.parse.parse_qsl(self.rfile.read(int(
+            self.headers.get('Content-Length') or 0)).decode('ascii')))
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        if urllib.parse.urlsplit(self.path).path != TOKEN_PATH:
+            status, body = 404, _envelope(None, 2101, 'NotFound', 'Not found')
+        elif (form.get('grant_type') != 'refresh_token'
+                or not form.get('refresh_token')):
+            status, body = 400, json.dumps({
+                'error': 'invalid_request'
+                , 'error_description': 'refresh_token is required'}).encode()
+        else:
+            status, body = 200, server.issue_token(form['refresh_token'])
+
+        self._send(status, body)
+
+    def _send(self, status, body):
+        """_send(status, body)"""
+
+        server = self.server
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+
+        if server.compress:
+            accepted = (self.headers.get('Accept-Encoding') or '').lower()
+            self.send_header('Vary', 'Accept-Encoding')
+            if 'gzip' in accepted:
+                body = gzip.compress(body, server.compress)
+                self.send_header('Content-Encoding', 'gzip')
+            elif 'deflate' in accepted:
+                body = zlib.compress(body, server.compress)
+                self.send_header('Content-Encoding', 'deflate')
+
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+
+        if not server.bandwidth:
+            self.wfile.write(body)
+            return
+
+        for offset in range(0, len(body), BANDWIDTH_CHUNK):
+            chunk = body[offset:offset + BANDWIDTH_CHUNK]
+            self.wfile.write(chunk)
+            time.sleep(len(chunk) / server.bandwidth)
+
+    def log_message(self, *args):
+        """log_message()"""
+
+
+class StandInServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """StandInServer(address, fixtures, latency=0, throttle=None, compress=0
+    , bandwidth=0, token_lifetime=3600)
+
+    compress is the zlib level of encoded responses, 0 for none;
+    bandwidth is in bytes per second per response, 0 for unlimited.
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, fixtures, latency=0, throttle=None
+                 , compress=0, bandwidth=0
+                 , token_lifetime=DEFAULT_TOKEN_LIFETIME):
+        super().__init__(address, StandInHandler)
+
+        self.fixtures = fixtures
+        self.latency = latency
+        self.throttle = throttle
+        self.compress = compress
+        self.bandwidth = bandwidth
+        self.token_lifetime = token_lifetime
+
+        self._issued = itertools.count(1)
+
+    def issue_token(self, refresh_token):
+        """issue_token(refresh_token) -> token endpoint response body"""
+
+        # access tokens carry their own expiry, in milliseconds since the
+        # epoch: standin.<expiry>.<serial>
+
+        serial = next(self._issued)
+        membership_id = refresh_token.rpartition('.')[2]
+
+        return json.dumps({
+            'access_token': 'standin.%d.%d' % (
+                (time.time() + self.token_lifetime) * 1e3, serial)
+            , 'token_type': 'Bearer', 'expires_in': self.token_lifetime
+            , 'refresh_token': 'refresh.%d.%s' % (serial, membership_id)
+            , 'refresh_expires_in': REFRESH_TOKEN_LIFETIME
+            , 'membership_id': membership_id}).encode('utf-8')
+
+    def expired(self, authorization):
+        """expired(authorization) -> whether the header carries an expired
+        stand-in access token"""
+
+        if not authorization or not authorization.startswith(
+                'Bearer standin.'):
+            return False
+
+        return int(authorization.split('.')[1]) < time.time() * 1e3
+
+    def handle_error(self, request, client_address):
+        """handle_error(request, client_address)"""
+
+        # clients dropping keep-alive connections are not errors here
+
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def serve(options, port_sink=None):
+    """serve(options, port_sink=None)
+
+    Serves forever; the bound port is sent to port_sink, a Connection.
+    """
+
+    fixtures = Fixtures(options.get('fixtures') or FIXTURES
+                        , options.get('clan_size', DEFAULT_CLAN_SIZE)
+                        , options.get('history', DEFAULT_HISTORY)
+                        , options.get('players', DEFAULT_PLAYERS)
+                        , options.get('definitions', DEFAULT_DEFINITIONS))
+
+    throttle = None
+    if options.get('throttle_rate'):
+        throttle = Throttle(options['throttle_rate']
+                            , options.get('throttle_seconds', 1))
+
+    server = StandInServer(('127.0.0.1', options.get('port', 0)), fixtures
+                           , options.get('latency', 0), throttle
+                           , options.get('compress', 0)
+                           , options.get('bandwidth', 0)
+                           , options.get('token_lifetime'
+                                         , DEFAULT_TOKEN_LIFETIME))
+
+    if port_sink is not None:
+        port_sink.send(server.server_address[1])
+        port_sink.close()
+
+    server.serve_forever()
+
+
+class StandIn(object):
+    """StandIn(**options)
+
+    Context manager running serve(options) in a child process; entering it
+    returns the root URL to use as api.BUNGIE_NET_ROOT.
+    """
+
+    def __init__(self, **options):
+        self.options = options
+        self.root = None
+
+        self._process = None
+
+    def __enter__(self):
+        context = multiprocessing.get_context('spawn')
+        receiver, sender = context.Pipe(duplex=False)
+
+        self._process = context.Process(target=serve
+                                        , args=(self.options, sender)
+                                        , daemon=True)
+        self._process.start()
+        sender.close()
+
+        self.root = 'http://127.0.0.1:%d' % receiver.recv()
+        receiver.close()
+
+        return self.root
+
+    def __exit__(self, *exc_info):
+        self._process.terminate()
+        self._process.join()
+
+
+def add_arguments(parser):
+    """add_arguments(parser) -> parser with the stand-in options"""
+
+    parser.add_argument('--fixtures', default=FIXTURES
+                        , help='directory of recorded responses')
+    parser.add_argument('--latency', type=float, default=0.0
+                        , help='seconds added to every response')
+    parser.add_argument('--throttle-rate', type=float, default=0.0
+                        , help='requests per second served before'
+                        ' answering with ErrorCode 36 (0: never)')
+    parser.add_argument('--throttle-seconds', type=int, default=1)
+    parser.add_argument('--compress', type=int, default=0, metavar='LEVEL'
+                        , help='gzip/deflate level of the responses'
+                        ' (0: uncompressed)')
+    parser.add_argument('--bandwidth', type=float, default=0.0
+                        , help='bytes per second per response'
+                        ' (0: unlimited)')
+    parser.add_argument('--token-lifetime', type=float
+                        , default=DEFAULT_TOKEN_LIFETIME
+                        , help='seconds an issued access token is valid')
+    parser.add_argument('--clan-size', type=int, default=DEFAULT_CLAN_SIZE)
+    parser.add_argument('--history', type=int, default=DEFAULT_HISTORY
+                        , help='activities per character')
+    parser.add_argument('--players', type=int, default=DEFAULT_PLAYERS
+                        , help='entries per PGCR')
+    parser.add_argument('--definitions', type=int
+                        , default=DEFAULT_DEFINITIONS
+                        , help='definitions per manifest table')
+
+    return parser
+
+
+def options_from(args):
+    """options_from(args) -> serve() options of parsed add_arguments()"""
+
+    return dict((name, getattr(args, name))
+                for name in ('fixtures', 'latency', 'throttle_rate'
+                             , 'throttle_seconds', 'compress', 'bandwidth'
+                             , 'token_lifetime', 'clan_size', 'history'
+                             , 'players', 'definitions'))
+
+
+def main():
+    """main()"""
+
+    parser = add_arguments(argparse.ArgumentParser(
+        description='local Bungie.net API stand-in'))
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args()
+
+    options = options_from(args)
+    options['port'] = args.port
+
+    print('serving on http://127.0.0.1:%d' % args.port)
+    serve(options)
+
+
+if __name__ == '__main__':
+    main()
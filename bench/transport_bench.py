@@ -0,0 +1,108 @@
+""" Connection reuse benchmark for the bungie_net_api transport
+
+Runs callBungieAPI() against a local HTTP stand-in for www.bungie.net, once
+with a fresh connection per request and once through the keep-alive pool,
+and reports how many connections (handshakes) the server accepted.
+
+usage: python bench/transport_bench.py [-n REQUESTS] [-t THREADS]
+"""
+
+import argparse
+import http.server
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import bungie_net_api.api as api  # noqa: E402
+from bungie_net_api import transport  # noqa: E402
+
+# never touch a real key or config file
+
+api.configure(config_file=os.devnull, api_key='benchmark')
+
+PROFILE = json.dumps({'Response': {'profile': {'data': {}}}, 'ErrorCode': 1
+                      , 'ThrottleSeconds': 0, 'ErrorStatus': 'Success'
+                      , 'Message': 'Ok', 'MessageData': {}}).encode('utf-8')
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    """StandInHandler()"""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        """do_GET()"""
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(PROFILE)))
+        self.end_headers()
+        self.wfile.write(PROFILE)
+
+    def log_message(self, *args):
+        """log_message()"""
+
+
+class StandInServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """StandInServer()"""
+
+    daemon_threads = True
+    request_queue_size = 128
+    accepted = 0
+
+    def get_request(self):
+        """get_request()"""
+
+        conn = super().get_request()
+        self.accepted += 1
+        return conn
+
+
+def run(requests, threads, keep_alive):
+    """run(requests, threads, keep_alive)"""
+
+    server = StandInServer(('127.0.0.1', 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    api.BUNGIE_NET_ROOT = 'http://127.0.0.1:%d' % server.server_address[1]
+    api.use_scheduler(None)
+    previous = transport.set_transport(
+        transport.Transport(keep_alive=keep_alive, pool_size=threads))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(lambda member: api.callBungieAPI(
+            '/Destiny2/1/Profile/%d/' % member), range(requests)))
+    elapsed = time.perf_counter() - start
+
+    transport.set_transport(previous).close()
+    server.shutdown()
+    server.server_close()
+
+    return elapsed, server.accepted
+
+
+def main():
+    """main()"""
+
+    parser = argparse.ArgumentParser(description='transport benchmark')
+    parser.add_argument('-n', '--requests', type=int, default=2000)
+    parser.add_argument('-t', '--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    for keep_alive in (False, True):
+        elapsed, accepted = run(args.requests, args.threads, keep_alive)
+        print('keep_alive=%-5s %6d requests %8.3fs %8.0f req/s'
+              ' %6d connections' % (keep_alive, args.requests, elapsed
+                                    , args.requests / elapsed, accepted))
+
+
+if __name__ == '__main__':
+    main()
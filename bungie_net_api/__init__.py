@@ -1,2 +1,54 @@
 from .utility import *
 from .api import *
+
+# everything beyond the api.py wrappers is imported on first use, so that
+# "import bungie_net_api" stays cheap for short-lived processes.
+
+_LAZY_ATTRIBUTES = {
+    'AsyncBungieClient': 'async_client',
+    'Manifest': 'manifest',
+    'MappedManifest': 'mapped_manifest',
+    'ResponseCache': 'cache',
+    'iter_activity_history': 'pagination',
+    'PGCRStore': 'pgcr',
+    'fetch_pgcrs': 'pgcr',
+    'get_clan_roster': 'roster',
+    'MetricsRegistry': 'instrumentation',
+    'HistoryStore': 'history',
+    'sync_history': 'history',
+    'Projection': 'projection',
+    'project': 'projection',
+    'Profile': 'models',
+    'Character': 'models',
+    'Activity': 'models',
+    'PGCR': 'models',
+    'PGCREntry': 'models',
+    'ActivityColumns': 'columns',
+    'PGCRColumns': 'columns',
+    'Pipeline': 'pipeline',
+    'hydrate': 'hydration',
+    'OAuthSession': 'oauth',
+    'ClanLeaderboards': 'leaderboards',
+    'IdentityResolver': 'identity',
+    'Endpoint': 'endpoints',
+    'ENDPOINTS': 'endpoints',
+    'OAuthError': 'oauth',
+    'process_pgcrs': 'pipeline',
+    'process_profiles': 'pipeline',
+    'API_KEY': 'api',
+    'KEEP_ALIVE': 'api',
+    'POOL_SIZE': 'api',
+    'IDLE_TIMEOUT': 'api',
+}
+
+
+def __getattr__(name):
+    module = _LAZY_ATTRIBUTES.get(name)
+
+    if module is None:
+        raise AttributeError("module %r has no attribute %r"
+                             % (__name__, name))
+
+    import importlib
+
+    return getattr(importlib.import_module('.' + module, __name__), name)
@@ -1,29 +1,406 @@
 """ Bungie.net API module """
 
-import urllib.request
-import urllib.parse
-import urllib.error
-import json
-import configparser
-import os.path
+import os
 import sys
+import threading
 
-# enum DestinyClass { Titan = 0, Hunter = 1, Warlock = 2, Unknown = 3 }
+from . import settings
+from .settings import CONFIG_FILE, CONFIG_FILE_NAME, ConfigurationError
 
-CONFIG_FILE_NAME = '.bungie_net_api.rc'
+# enum DestinyClass { Titan = 0, Hunter = 1, Warlock = 2, Unknown = 3 }
 
 # API_KEY = <secret API key>
 
 # put a BungieNet API-KEY obtained from https://www.bungie.net/en-US/User/API
-# into a ini style file at $HOME/CONFIG_FILE_NAME.
+# into a ini style file at $HOME/CONFIG_FILE_NAME, export BUNGIE_NET_API_KEY,
+# or call configure(api_key=...).  See settings.py for the other options.
+#
+# Importing this module reads nothing: the settings are resolved, and the
+# shared transport and scheduler are built, on the first request.  The
+# transport, scheduler, json and the http stack are imported only then.
+
+DEBUG = settings._flag(os.environ.get('BUNGIE_NET_API_DEBUG'))
+
+BUNGIE_NET_ROOT = 'https://www.bungie.net'
+
+# a local manifest.Manifest installed with use_manifest() answers
+# get_manifest_item() and get_item_by_hash() without a network round-trip.
+
+LOCAL_MANIFEST = None
+
+# a cache.ResponseCache installed with use_cache() answers repeated calls
+# without going to the network.
+
+RESPONSE_CACHE = None
+
+# all network calls are paced and retried by a scheduler.Scheduler, tuned in
+# an optional [scheduler] section; use_scheduler(None) turns it off.
+
+REQUEST_SCHEDULER = None
+
+# concurrent identical calls share one request through a
+# singleflight.SingleFlight; use_single_flight(None) turns it off.
+
+SINGLE_FLIGHT = None
+
+# an instrumentation.MetricsRegistry installed with use_metrics() records
+# per-endpoint latency histograms and error counters for every request.
+
+METRICS = None
+_metrics_hook = None
+
+# A BungieClient carries settings of its own -- API key, transport, scheduler
+# and single flight -- so that several keys or configurations can be used
+# side by side in one process:
+#
+#   client = BungieClient(api_key=other_key, rate=5)
+#   profile = client.call('GetProfile', membershipType='2'
+#                         , destinyMembershipId=member_id, components='100')
+#
+# BungieClient() alone resolves its settings from the environment and the
+# config file, like configure() does.  The module level functions run on a
+# default client whose parts are the globals above; configure() replaces its
+# settings.
+
+class BungieClient(object):
+    """BungieClient(config_file=None, api_key=None, rate=None, ...)
+
+    Settings are resolved, and the transport and scheduler built, on the
+    first request.  Any endpoint of endpoints.ENDPOINTS can be called with
+    call(); debug and decoder are process wide and follow configure().
+    """
+
+    def __init__(self, config_file=None, cache=None, **values):
+        self.settings = settings.Settings(config_file=config_file, **values)
+        self.cache = cache
+        self.transport = None
+        self.scheduler = None
+        self.single_flight = None
+
+        self._configured = False
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def configure(self, config_file=None, **values):
+        """configure(config_file=None, api_key=None, ...)
+
+        Replaces the settings; the transport and scheduler are rebuilt from
+        them on the next request.
+        """
+
+        with self._lock:
+            self.settings = settings.Settings(config_file=config_file
+                                              , **values)
+            self._configured = False
+            self._release()
+
+    def ensure_configured(self):
+        """ensure_configured()
+
+        Resolves the settings and builds the transport and scheduler; called
+        on every request, cheap after the first.
+        """
+
+        if self._configured:
+            return
+
+        with self._lock:
+            if self._configured:
+                return
+
+            from . import scheduler
+            from . import transport
+
+            if self.settings.get('scheduler', True):
+                request_scheduler = scheduler.Scheduler(
+                    **self.settings.options('rate', 'burst', 'max_retries'))
+            else:
+                request_scheduler = None
+
+            self._install(transport.Transport(**self.settings.options(
+                'keep_alive', 'pool_size', 'idle_timeout', 'compress'))
+                , request_scheduler)
+
+            self._configured = True
+
+    def _install(self, new_transport, request_scheduler):
+        """_install(new_transport, request_scheduler)"""
+
+        from . import singleflight
+
+        if self.transport is None:
+            self.transport = new_transport
+        self.scheduler = request_scheduler
+        if self.single_flight is None:
+            self.single_flight = singleflight.SingleFlight()
+
+    def _release(self):
+        """_release() -> drops and closes the transport"""
+
+        previous, self.transport = self.transport, None
+
+        if previous is not None:
+            previous.close()
+
+    def close(self):
+        """close()"""
+
+        with self._lock:
+            self._configured = False
+            self._release()
+
+    def _headers(self):
+        """_headers()"""
+
+        return {'X-API-Key': self.settings.api_key}
+
+    def callBungieAPI(self, method, fields=None):
+        """callBungieAPI(method, fields=None)"""
+
+        return self._fetch_json(BUNGIE_NET_ROOT + '/Platform' + method
+                                , self._headers(), fields)
+
+    def callOauthBungieAPI(self, method=None, token=None, fields=None):
+        """callOauthBungieAPI(method=None, token=None, fields=None)"""
+
+        if not isinstance(token, str):
+            return token.call(method, fields, client=self)
+
+        if DEBUG:
+            print(("DEBUG: ", method, "\n"))
+
+        headers = self._headers()
+        headers['Authorization'] = 'Bearer ' + token
+
+        return self._fetch_json(BUNGIE_NET_ROOT + '/Platform' + method
+                                , headers, fields)
+
+    def call_bungie_api(self, method):
+        """call_bungie_api(method)"""
+
+        return self._fetch_json(BUNGIE_NET_ROOT + '/Platform/Destiny2' + method
+                                , self._headers())
+
+    def call(self, name, token=None, fields=None, **params):
+        """call(name, token=None, fields=None, **params) -> envelope
+
+        Calls the endpoints.ENDPOINTS entry name through this client; token
+        is an access token or an oauth.OAuthSession.
+        """
+
+        from . import endpoints
+
+        method = endpoints.prepare(name, params, token)
+
+        if token:
+            return self.callOauthBungieAPI(method, token=token, fields=fields)
+
+        return self.callBungieAPI(method, fields=fields)
+
+    def _fetch_json(self, call_url, headers, fields=None):
+        """_fetch_json()"""
+
+        from . import projection
+        from . import singleflight
+
+        self.ensure_configured()
+
+        fields = projection.projection(fields)
+
+        cache = self.cache
+        lookup = None
+
+        if cache is not None:
+            lookup = cache.prepare(call_url, headers)
+            if lookup.body is not None:
+                return projection.decode(lookup.body, fields)
+            headers = lookup.headers
 
-CONFIG_FILE = (os.path.join(os.path.expanduser("~"), CONFIG_FILE_NAME))
+        single_flight = self.single_flight
 
-config = configparser.ConfigParser()
-config.read(CONFIG_FILE)
-API_KEY = config.get('api', 'API-KEY')
+        if single_flight is None:
+            response, parsed_result = self._scheduled_request_json(
+                call_url, headers, fields)
+        else:
+            response, parsed_result = single_flight.do(
+                singleflight.request_key(call_url, headers, fields)
+                , self._scheduled_request_json, call_url, headers, fields)
 
-DEBUG = int(config.get('default', 'debug'))
+        # only successful envelopes (or a 304 for one) are worth caching
+
+        if lookup is not None and (response.status == 304
+                                   or parsed_result.get('ErrorCode', 1) == 1):
+            body = cache.complete(lookup, call_url, response)
+            if parsed_result is None:
+                parsed_result = projection.decode(body, fields)
+
+        return parsed_result
+
+    def _scheduled_request_json(self, call_url, headers, fields=None):
+        """_scheduled_request_json() -> (response, parsed_result)"""
+
+        request_scheduler = self.scheduler
+
+        if request_scheduler is None:
+            return self._request_json(call_url, headers, fields)
+
+        return request_scheduler.execute(
+            self._request_json, headers.get('X-API-Key'), call_url, headers
+            , fields)
+
+    def _request_json(self, call_url, headers, fields=None):
+        """_request_json() -> (response, parsed_result)"""
+
+        from . import instrumentation
+        from . import projection
+
+        event = instrumentation.start(call_url)
+        response = parsed_result = None
+
+        try:
+            response = self.transport.request(call_url, headers=headers)
+            if response.status != 304:
+                parsed_result = instrumentation.timed_decode(
+                    event, projection.decode, response.body, fields)
+        except Exception as error:
+            instrumentation.finish(event, response, error=error)
+            raise
+
+        instrumentation.finish(event, response, parsed_result)
+
+        return response, parsed_result
+
+
+class _ModuleClient(BungieClient):
+    """_ModuleClient() -> the BungieClient behind the module level functions
+
+    Its cache, scheduler, single flight and transport are the module globals
+    that use_cache(), use_scheduler(), use_single_flight() and
+    transport.set_transport() replace.
+    """
+
+    def __init__(self):
+        self.settings = settings.Settings()
+
+        self._configured = False
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return RESPONSE_CACHE
+
+    @property
+    def scheduler(self):
+        return REQUEST_SCHEDULER
+
+    @property
+    def single_flight(self):
+        return SINGLE_FLIGHT
+
+    @property
+    def transport(self):
+        from . import transport
+        return transport.get_transport()
+
+    def _install(self, new_transport, request_scheduler):
+        """_install(new_transport, request_scheduler)"""
+
+        global DEBUG, REQUEST_SCHEDULER, SINGLE_FLIGHT
+
+        from . import decoders
+        from . import singleflight
+        from . import transport
+
+        DEBUG = self.settings.get('debug', False)
+
+        if self.settings.get('decoder'):
+            decoders.set_decoder(self.settings.get('decoder'))
+
+        transport.set_transport(new_transport, replace=False)
+
+        REQUEST_SCHEDULER = request_scheduler
+
+        if SINGLE_FLIGHT is None:
+            SINGLE_FLIGHT = singleflight.SingleFlight()
+
+    def _release(self):
+        """_release() -> drops and closes the shared transport"""
+
+        if 'bungie_net_api.transport' in sys.modules:
+            previous = sys.modules['bungie_net_api.transport'].set_transport(
+                None)
+            if previous is not None:
+                previous.close()
+
+
+_default_client = _ModuleClient()
+
+def configure(config_file=None, **values):
+    """configure(config_file=None, api_key=None, debug=None, ...)
+
+    Replaces the settings of the default client; the transport and scheduler
+    are rebuilt from them on the next request.
+    """
+
+    _default_client.configure(config_file, **values)
+
+def get_settings():
+    """get_settings() -> settings.Settings"""
+
+    return _default_client.settings
+
+def get_client():
+    """get_client() -> the default BungieClient"""
+
+    return _default_client
+
+def ensure_configured():
+    """ensure_configured()
+
+    Resolves the settings and installs the shared transport and scheduler;
+    called on every request, cheap after the first.
+    """
+
+    _default_client.ensure_configured()
+
+def __getattr__(name):
+    # module level names that used to be read from the config file at import
+
+    if name == 'API_KEY':
+        return get_settings().api_key
+    if name == 'KEEP_ALIVE':
+        return get_settings().get('keep_alive', True)
+    if name == 'POOL_SIZE':
+        return get_settings().get('pool_size')
+    if name == 'IDLE_TIMEOUT':
+        return get_settings().get('idle_timeout')
+
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+class BungieAPIError(Exception):
+    """BungieAPIError(error_code, error_status, message)"""
+
+    def __init__(self, error_code=None, error_status=None, message=None):
+        super().__init__(error_code, error_status, message)
+        self.error_code = error_code
+        self.error_status = error_status
+        self.message = message
+
+    def __str__(self):
+        return '%s (%s): %s' % (self.error_status, self.error_code
+                                , self.message)
+
+    @classmethod
+    def from_envelope(cls, envelope):
+        """from_envelope(envelope)"""
+
+        return cls(envelope.get('ErrorCode'), envelope.get('ErrorStatus')
+                   , envelope.get('Message'))
 
 # Bungie-net github:
 #   https://github.com/Bungie-net/api
@@ -36,101 +413,83 @@ DEBUG = int(config.get('default', 'debug'))
 # Lowlines documentation of D1 API:
 #  http://destinydevs.github.io/BungieNetPlatform/docs/Getting-Started
 
-# getProfile https://www.bungie.net/platform/destinys/help/
+# Every wrapper below maps its arguments onto an endpoint of
+# endpoints.ENDPOINTS, which builds the URL, and returns the envelope.
 
-def getProfile(destinyMembershipId=None, membershipType=None
-  , components=None, token=None):
-    """getProfile()"""
+def _call(name, token=None, fields=None, **params):
+    """_call(name, token=None, fields=None, **params) -> BungieClient.call()"""
 
-    if DEBUG:
-        print(("DEBUG: getProfile(/Destiny2/" + membershipType + "/Profile/"
-                + destinyMembershipId + "/" + "?components=" + components))
+    return _default_client.call(name, token=token, fields=fields, **params)
 
-    if token:
-        acctSummary = callOauthBungieAPI('/Destiny2/' + membershipType 
-          + '/Profile/' + destinyMembershipId + '/' 
-          + '?components=' + components, token = token)
-    else:
-        acctSummary = callBungieAPI('/Destiny2/' + membershipType + '/Profile/'
-          + destinyMembershipId + '/' + '?components=' + components)
+def _flag(value):
+    """_flag(value) -> True, or None (not sent) for None"""
 
-    return acctSummary
+    # definitions=<anything> always asked for ?definitions=true
 
-def getClanLeaderboards(clanId=None, modes=None, maxTop=None, statId=None):
-    """getClanLeanderboards()"""
+    return None if value is None else True
 
-    if DEBUG:
-        print(("DEBUG: getClanLeanderboards(/Destiny2/Stats/Leaderboards/Clans/" + clanId + "/" + "?modes=" + modes))
+# getProfile https://www.bungie.net/platform/destinys/help/
 
-    if maxTop:
-        top = maxTop
-    else:
-        top = 5
+def getProfile(destinyMembershipId=None, membershipType=None
+  , components=None, token=None, fields=None, as_models=False):
+    """getProfile()
 
-    if statId:
+    as_models=True returns a models.Profile instead of the envelope.
+    """
 
-        leaderboards = callBungieAPI('/Destiny2/Stats/Leaderboards/Clans/'
-              + str(clanId) + '?modes=' + modes + '&maxtop=' + str(top)
-              + '&statId=' + statId)
+    acctSummary = _call('GetProfile', token=token, fields=fields
+                        , membershipType=membershipType
+                        , destinyMembershipId=destinyMembershipId
+                        , components=components)
 
-    else:
+    if as_models:
+        from . import models
+        return models.profile_from_envelope(acctSummary)
 
-        leaderboards = callBungieAPI('/Destiny2/Stats/Leaderboards/Clans/'
-              + str(clanId) + '?modes=' + modes + '&maxtop=' + str(top))
+    return acctSummary
 
+def getClanLeaderboards(clanId=None, modes=None, maxTop=None, statId=None):
+    """getClanLeanderboards()"""
 
-    return leaderboards
+    return _call('GetClanLeaderboards', groupId=clanId, modes=modes
+                 , maxtop=maxTop or None, statId=statId or None)
 
 
 def getMembershipsById(membership_id=None, membership_type=None):
     """getMembershipsById()"""
 
-    if DEBUG:
-        print(("DEBUG: getMembershipsById(/User/GetMembershipsById/"
-                + membership_id + "/" + membership_type + "/"))
-
-    accounts = callBungieAPI('/User/GetMembershipsById/' 
-                 + membership_id + '/' + membership_type + '/')
-
-    return accounts
+    return _call('GetMembershipsById', membershipId=membership_id
+                 , membershipType=membership_type)
 
 def getMembershipDataById(membershipId=None, membershipType=None):
     """getMembershipDataById()"""
 
-    if DEBUG:
-        print(("DEBUG: getMembershipDataById(/User/GetMembershipsById/"
-                + membershipId + "/" + membershipType + "/"))
+    return _call('GetMembershipsById', membershipId=membershipId
+                 , membershipType=membershipType)
 
-    accounts = callBungieAPI('/User/GetMembershipsById/' 
-                 + membershipId + '/' + membershipType + '/')
+def getMembershipsForCurrentUser(token=None):
+    """getMembershipsForCurrentUser(token)"""
 
-    return accounts
+    return _call('GetMembershipsForCurrentUser', token=token)
 
 # get_account_summary https://www.bungie.net/platform/destiny/help/
 
 def getActivityHistory(destiny_membership_id=None, membership_type=None
                        , character_id=None, mode=None, count=None
-                       , page=None):
-    """getActivityHistory()"""
-
-    if mode is None:
-        optional_arg = '?mode=None'
-    else:
-        optional_arg = '?mode=' + mode
+                       , page=None, as_models=False):
+    """getActivityHistory()
 
-    if count is not None:
-        optional_arg = optional_arg + '&count=' + count
-    if page is not None:
-        optional_arg = optional_arg + '&page=' + page
+    as_models=True returns a list of models.Activity instead of the envelope.
+    """
 
-    if DEBUG:
-        print ("DEBUG: getActivityHistory()")
+    activity_history_stats = _call(
+        'GetActivityHistory', membershipType=membership_type
+        , destinyMembershipId=destiny_membership_id, characterId=character_id
+        , mode=mode, count=count, page=page)
 
-    activity_history_stats = callBungieAPI('/Destiny2/' + membership_type 
-                              + '/Account/' + destiny_membership_id 
-                              + '/Character/' + character_id
-                              + '/Stats/Activities/'
-                              + optional_arg)
+    if as_models:
+        from . import models
+        return models.activities_from_envelope(activity_history_stats)
 
     return activity_history_stats
 
@@ -138,20 +497,9 @@ def get_account_summary(destiny_membership_id=None, membership_type=None
                         , definitions=None):
     """get_account_summary()"""
 
-    if definitions is None:
-        optional_arg = ''
-    else:
-        optional_arg = '?definitions=true'
-
-    if DEBUG:
-        print(("DEBUG: call_bungie_api(/" + membership_type + "/Account/"
-               + destiny_membership_id + "/Summary/" + optional_arg +")"))
-
-    acct_summary = call_bungie_api('/' + membership_type + '/Account/'
-                                   + destiny_membership_id + '/Summary/'
-                                   + optional_arg)
-
-    return acct_summary
+    return _call('GetAccountSummary', membershipType=membership_type
+                 , destinyMembershipId=destiny_membership_id
+                 , definitions=_flag(definitions))
 
 # get_activity_history_stats https://www.bungie.net/platform/destiny/help/
 
@@ -161,33 +509,10 @@ def get_activity_history_stats(destiny_membership_id=None
                                , mode=None, count=None):
     """get_activity_history_stats()"""
 
-    if definitions is None:
-        optional_arg = ''
-    else:
-        optional_arg = '?definitions=true'
-
-    if mode is None:
-        optional_arg = optional_arg + '&mode=None'
-    else:
-        optional_arg = optional_arg + '&mode=' + mode
-
-    if count is not None:
-        optional_arg = optional_arg + '&count=' + count
-    if page is not None:
-        optional_arg = optional_arg + '&page=' + page
-
-    if DEBUG:
-        print(("DEBUG: call_bungie_api(/Stats/ActivityHistory/"
-               + membership_type + "/" + destiny_membership_id + "/"
-               + character_id + "/" + optional_arg +")"))
-
-    activity_history_stats = call_bungie_api('/Stats/ActivityHistory/'
-                                             + membership_type + '/'
-                                             + destiny_membership_id + '/'
-                                             + character_id +'/'
-                                             + optional_arg)
-
-    return activity_history_stats
+    return _call('GetActivityHistoryStats', membershipType=membership_type
+                 , destinyMembershipId=destiny_membership_id
+                 , characterId=character_id, definitions=_flag(definitions)
+                 , mode=mode, count=count, page=page)
 
 # get_account_advisors https://www.bungie.net/platform/destiny/help/
 
@@ -195,20 +520,9 @@ def get_account_advisors(destiny_membership_id=None, membership_type=None
                          , definitions=None):
     """get_account_advisors()"""
 
-    if definitions is None:
-        optional_arg = ''
-    else:
-        optional_arg = '?definitions=true'
-
-    if DEBUG:
-        print(("DEBUG: call_bungie_api(/" + membership_type + "/Account/"
-               + destiny_membership_id + "/Advisors/" + optional_arg +")"))
-
-    acct_advisors = call_bungie_api('/' + membership_type + '/Account/'
-                                    + destiny_membership_id + '/Advisors/'
-                                    + optional_arg)
-
-    return acct_advisors
+    return _call('GetAdvisors', membershipType=membership_type
+                 , destinyMembershipId=destiny_membership_id
+                 , definitions=_flag(definitions))
 
 # get_account_advisors_v2 https://www.bungie.net/platform/destiny/help/
 
@@ -216,22 +530,16 @@ def get_account_advisors_v2(destiny_membership_id=None, membership_type=None
                             , character_id=None, definitions=None):
     """get_account_adviors()"""
 
-    if definitions is None:
-        optional_arg = ''
-    else:
-        optional_arg = '?definitions=true'
+    return _call('GetAdvisorsV2ForCharacter', membershipType=membership_type
+                 , destinyMembershipId=destiny_membership_id
+                 , characterId=character_id, definitions=_flag(definitions))
 
-    if DEBUG:
-        print(("DEBUG: call_bungie_api(/" + membership_type + "/Account/"
-               + destiny_membership_id + "/Character/" + character_id
-               + "/Advisors/V2/" + optional_arg +")"))
+# get_advisors_v2 https://www.bungie.net/platform/destiny/help/
 
-    acct_advisors_v2 = call_bungie_api('/' + membership_type + '/Account/'
-                                       + destiny_membership_id + '/Character/'
-                                       + character_id + '/Advisors/V2/'
-                                       + optional_arg)
+def get_advisors_v2(definitions=None):
+    """get_advisors_v2()"""
 
-    return acct_advisors_v2
+    return _call('GetAdvisorsV2', definitions=_flag(definitions))
 
 # get_account_items https://www.bungie.net/platform/destiny/help/
 
@@ -239,20 +547,19 @@ def get_account_items(destiny_membership_id=None, membership_type=None
                       , definitions=None):
     """get_account_items()"""
 
-    if definitions is None:
-        optional_arg = ''
-    else:
-        optional_arg = '?definitions=true'
+    return _call('GetAccountItems', membershipType=membership_type
+                 , destinyMembershipId=destiny_membership_id
+                 , definitions=_flag(definitions))
 
-    if DEBUG:
-        print(("DEBUG: call_bungie_api(/" + membership_type + "/Account/"
-               + destiny_membership_id + "/Items/" + optional_arg +")"))
+# get_triumphs https://www.bungie.net/platform/destiny/help/
 
-    acct_items = call_bungie_api('/' + membership_type + '/Account/'
-                                 + destiny_membership_id + '/items/'
-                                 + optional_arg)
+def get_triumphs(destiny_membership_id=None, membership_type=None
+                 , definitions=None):
+    """get_triumphs()"""
 
-    return acct_items
+    return _call('GetTriumphs', membershipType=membership_type
+                 , destinyMembershipId=destiny_membership_id
+                 , definitions=_flag(definitions))
 
 # get_character_activities https://www.bungie.net/platform/destiny/help/
 
@@ -260,22 +567,9 @@ def get_character_activities(destiny_membership_id=None, membership_type=None
                              , character_id=None, definitions=None):
     """get_character_activities()"""
 
-    if definitions is None:
-        optional_arg = ''
-    else:
-        optional_arg = '?definitions=true'
-
-    if DEBUG:
-        print(("DEBUG: call_bungie_api(/" + membership_type + "/Account/"
-               + destiny_membership_id + "/Character/"
-               + character_id + "/Activities/" + optional_arg +")"))
-
-    char_activities = call_bungie_api('/' + membership_type + '/Account/'
-                                      + destiny_membership_id + '/Character/'
-                                      + character_id + '/Activities/'
-                                      + optional_arg)
-
-    return char_activities
+    return _call('GetCharacterActivities', membershipType=membership_type
+                 , destinyMembershipId=destiny_membership_id
+                 , characterId=character_id, definitions=_flag(definitions))
 
 # get_character_inventory https://www.bungie.net/platform/destiny/help/
 # DEPREATED use get_character_inventorySummary instead!
@@ -284,22 +578,9 @@ def get_character_inventory(destiny_membership_id=None, membership_type=None
                             , character_id=None, definitions=None):
     """get_character_inventory()"""
 
-    if definitions is None:
-        optional_arg = ''
-    else:
-        optional_arg = '?definitions=true'
-
-    if DEBUG:
-        print(("DEBUG: call_bungie_api(/" + membership_type + "/Account/"
-               + destiny_membership_id + "/Character/"
-               + character_id + "/Inventory/" + optional_arg +")"))
-
-    char_inventory = call_bungie_api('/' + membership_type + '/Account/'
-                                     + destiny_membership_id + '/Character/'
-                                     + character_id + '/Inventory/'
-                                     + optional_arg)
-
-    return char_inventory
+    return _call('GetCharacterInventory', membershipType=membership_type
+                 , destinyMembershipId=destiny_membership_id
+                 , characterId=character_id, definitions=_flag(definitions))
 
 # get_character_inventory_summary https://www.bungie.net/platform/destiny/help/
 
@@ -308,26 +589,34 @@ def get_character_inventory_summary(destiny_membership_id=None
                                     , character_id=None, definitions=None):
     """get_character_inventory_summary()"""
 
-    if definitions is None:
-        optional_arg = ''
-    else:
-        optional_arg = '?definitions=true'
+    return _call('GetCharacterInventorySummary'
+                 , membershipType=membership_type
+                 , destinyMembershipId=destiny_membership_id
+                 , characterId=character_id, definitions=_flag(definitions))
 
-    if DEBUG:
-        print(("DEBUG: call_bungie_api(/" + membership_type + "/Account/"
-               + destiny_membership_id + "/Character/"
-               + character_id + "/Inventory/Summary/"
-               + optional_arg +")"))
+# get_item_details https://www.bungie.net/platform/destiny/help/
 
-    char_inventory_summary = call_bungie_api('/' + membership_type
-                                             + '/Account/'
-                                             + destiny_membership_id
-                                             + '/Character/'
-                                             + character_id
-                                             + '/Inventory/Summary/'
-                                             + optional_arg)
+def get_item_details(destiny_membership_id=None, membership_type=None
+                     , character_id=None, item_instance_id=None
+                     , definitions=None):
+    """get_item_details()"""
 
-    return char_inventory_summary
+    return _call('GetItemDetails', membershipType=membership_type
+                 , destinyMembershipId=destiny_membership_id
+                 , characterId=character_id, itemInstanceId=item_instance_id
+                 , definitions=_flag(definitions))
+
+# get_noninstanced_item_details https://www.bungie.net/platform/destiny/help/
+
+def get_noninstanced_item_details(destiny_membership_id=None
+                                  , membership_type=None, character_id=None
+                                  , item_hash=None, definitions=None):
+    """get_noninstanced_item_details()"""
+
+    return _call('GetNoninstancedItemDetails', membershipType=membership_type
+                 , destinyMembershipId=destiny_membership_id
+                 , characterId=character_id, itemHash=item_hash
+                 , definitions=_flag(definitions))
 
 # get_character_progression https://www.bungie.net/platform/destiny/help/
 
@@ -335,23 +624,9 @@ def get_character_progression(destiny_membership_id=None, membership_type=None
                               , character_id=None, definitions=None):
     """get_character_progression()"""
 
-    if definitions is None:
-        optional_arg = ''
-    else:
-        optional_arg = '?definitions=true'
-
-    if DEBUG:
-        print(("DEBUG: call_bungie_api(/" + membership_type + "/Account/"
-               + destiny_membership_id + "/Character/"
-               + character_id + "/Progression/"
-               + optional_arg +")"))
-
-    char_progression = call_bungie_api('/' + membership_type + '/Account/'
-                                       + destiny_membership_id + '/Character/'
-                                       + character_id + '/Progression/'
-                                       + optional_arg)
-
-    return char_progression
+    return _call('GetCharacterProgression', membershipType=membership_type
+                 , destinyMembershipId=destiny_membership_id
+                 , characterId=character_id, definitions=_flag(definitions))
 
 # get_character_summary https://www.bungie.net/platform/destiny/help/
 
@@ -359,22 +634,9 @@ def get_character_summary(destiny_membership_id=None, membership_type=None
                           , character_id=None, definitions=None):
     """get_character_summary()"""
 
-
-    if definitions is None:
-        optional_arg = ''
-    else:
-        optional_arg = '?definitions=true'
-
-    if DEBUG:
-        print(("DEBUG: call_bungie_api(/" + membership_type + "/Account/"
-               + destiny_membership_id + "/Character/"
-               + character_id + "/" + optional_arg +")"))
-
-    char_summary = call_bungie_api('/' + membership_type + '/Account/'
-                                   + destiny_membership_id + '/Character/'
-                                   + character_id + '/' + optional_arg)
-
-    return char_summary
+    return _call('GetCharacter', membershipType=membership_type
+                 , destinyMembershipId=destiny_membership_id
+                 , characterId=character_id, definitions=_flag(definitions))
 
 # get_character_aggregate_stats at
 # https://www.bungie.net/platform/destiny/help/
@@ -385,23 +647,9 @@ def get_character_aggregate_stats(destiny_membership_id=None
                                   , definitions=None):
     """get_character_aggregate_stats()"""
 
-    if definitions is None:
-        optional_arg = ''
-    else:
-        optional_arg = '?definitions=true'
-
-    if DEBUG:
-        print(("DEBUG: call_bungie_api(/Stats/AggregateActivityStats/"
-               + membership_type + "/" + destiny_membership_id + "/"
-               + character_id + "/" + optional_arg +")"))
-
-    char_agg_activity_stats = call_bungie_api('/Stats/AggregateActivityStats/'
-                                              + membership_type + '/'
-                                              + destiny_membership_id + '/'
-                                              + character_id + '/'
-                                              + optional_arg)
-
-    return char_agg_activity_stats
+    return _call('GetAggregateActivityStats', membershipType=membership_type
+                 , destinyMembershipId=destiny_membership_id
+                 , characterId=character_id, definitions=_flag(definitions))
 
 # get_character_stats https://www.bungie.net/platform/destiny/help/
 
@@ -411,41 +659,12 @@ def get_character_stats(destiny_membership_id=None, membership_type=None
                         , monthend=None, daystart=None, dayend=None):
     """get_character_stats()"""
 
-    optional_arg = ''
-
-    if modes is None:
-        optional_arg = '?modes=None'
-    else:
-        optional_arg = optional_arg + '?modes=' + modes
-
-    if period_type is not None:
-        optional_arg = optional_arg + '&periodType=' + period_type
-
-    if groups is not None:
-        optional_arg = optional_arg + '&groups=' + groups
-
-    if monthstart is not None:
-        optional_arg = optional_arg + '&monthstart=' + monthstart
-
-    if monthend is not None:
-        optional_arg = optional_arg + '&monthend=' + monthend
-
-    if daystart is not None:
-        optional_arg = optional_arg + '&daystart=' + daystart
-
-    if dayend is not None:
-        optional_arg = optional_arg + '&dayend=' + dayend
-
-    if DEBUG:
-        print(("DEBUG: call_bungie_api(/Stats/" + membership_type + "/"
-               + destiny_membership_id + "/" + character_id + "/"
-               + optional_arg + ")"))
-
-    char_stats = call_bungie_api('/Stats/' + membership_type + '/'
-                                 + destiny_membership_id + '/'
-                                 + character_id + '/' + optional_arg)
-
-    return char_stats
+    return _call('GetCharacterStats', membershipType=membership_type
+                 , destinyMembershipId=destiny_membership_id
+                 , characterId=character_id, modes=modes
+                 , periodType=period_type, groups=groups
+                 , monthstart=monthstart, monthend=monthend
+                 , daystart=daystart, dayend=dayend)
 
 # get_account_stats https://www.bungie.net/platform/destiny/help/
 
@@ -453,38 +672,34 @@ def get_account_stats(destiny_membership_id=None, membership_type=None
                       , groups=None):
     """get_account_stats()"""
 
-    if groups is None:
-        optional_arg = ''
-    else:
-        optional_arg = '?groups=' + groups
+    return _call('GetAccountStats', membershipType=membership_type
+                 , destinyMembershipId=destiny_membership_id, groups=groups)
 
-    if DEBUG:
-        print(("DEBUG: call_bungie_api(/Stats/Account/" + membership_type + "/"
-               + destiny_membership_id + "/" + optional_arg + ")"))
+# get_membership_id_by_display_name at
+# https://www.bungie.net/platform/destiny/help/
 
-    acct_stats = call_bungie_api('/Stats/Account/' + membership_type + '/'
-                                 + destiny_membership_id + '/'
-                                 + optional_arg)
+def get_membership_id_by_display_name(display_name=None
+                                      , membership_type=None):
+    """get_membership_id_by_display_name()"""
 
-    return acct_stats
+    return _call('GetMembershipIdByDisplayName'
+                 , membershipType=membership_type, displayName=display_name)
 
 # get_activity_stats https://www.bungie.net/platform/destiny/help/
 
-def get_activity_stats(activity_id=None, definitions=None):
-    """get_activity_stats()"""
+def get_activity_stats(activity_id=None, definitions=None, as_models=False):
+    """get_activity_stats()
 
-    if definitions is None:
-        optional_arg = ''
-    else:
-        optional_arg = '?definitions=true'
+    as_models=True returns a models.PGCR instead of the envelope.
+    """
 
-    if DEBUG:
-        print(("DEBUG: call_bungie_api(/Stats/PostGameCarnageReport/"
-               + activity_id + "/" + optional_arg + ")"))
+    activity_pgc_report_stats = _call('GetPostGameCarnageReport'
+                                      , activityId=activity_id
+                                      , definitions=_flag(definitions))
 
-    activity_pgc_report_stats = call_bungie_api('/Stats/PostGameCarnageReport/'
-                                                + activity_id + '/'
-                                                + optional_arg)
+    if as_models:
+        from . import models
+        return models.pgcr_from_envelope(activity_pgc_report_stats)
 
     return activity_pgc_report_stats
 
@@ -497,23 +712,9 @@ def get_char_uniq_weapon_stats(membership_type=None
                                , definitions=None):
     """get_char_uniq_weapon_stats()"""
 
-    if definitions is None:
-        optional_arg = ''
-    else:
-        optional_arg = '?definitions=true'
-
-    if DEBUG:
-        print(("DEBUG: call_bungie_api(/Stats/UniqueWeapons/"
-               + membership_type + "/" + destiny_membership_id + "/"
-               + character_id + "/" + optional_arg + ")"))
-
-    char_uniq_weapon_stats = call_bungie_api('/Stats/UniqueWeapons/'
-                                             + membership_type + '/'
-                                             + destiny_membership_id + '/'
-                                             + character_id + '/'
-                                             + optional_arg)
-
-    return char_uniq_weapon_stats
+    return _call('GetUniqueWeaponHistory', membershipType=membership_type
+                 , destinyMembershipId=destiny_membership_id
+                 , characterId=character_id, definitions=_flag(definitions))
 
 # get_explorer_items at
 # https://www.bungie.net/platform/destiny/help/
@@ -521,12 +722,7 @@ def get_char_uniq_weapon_stats(membership_type=None
 def get_explorer_items(count=10, page=0):
     """get_explorer_items()"""
 
-    if DEBUG:
-        print ("DEBUG: call_bungie_api(/Explorer/Items/")
-
-    explorer_items = call_bungie_api('/Explorer/Items/')
-
-    return explorer_items
+    return _call('GetExplorerItems', count=count, page=page)
 
 # get_explorer_talent_node_steps at
 # https://www.bungie.net/platform/destiny/help/
@@ -534,42 +730,29 @@ def get_explorer_items(count=10, page=0):
 def get_explorer_talent_node_steps(count=10, page=0):
     """get_explorer_talent_node_steps()"""
 
-    if DEBUG:
-        print ("DEBUG: call_bungie_api(/Explorer/TalentNodeSteps/")
-
-    explorer_talent_node_steps = call_bungie_api('/Explorer/TalentNodeSteps/')
-
-    return explorer_talent_node_steps
+    return _call('GetExplorerTalentNodeSteps', count=count, page=page)
 
 # get_manifest at
 # https://www.bungie.net/platform/destiny/help/
 
 def get_manifest():
-    """get_explorer_talent_node_steps()"""
+    """get_manifest()"""
 
-    if DEBUG:
-        print ("DEBUG: call_bungie_api(/Manifest/")
-
-    manifest = call_bungie_api('/Manifest/')
-
-    return manifest
+    return _call('GetDestinyManifest')
 
 # get_manifest_item at
 # https://www.bungie.net/platform/destiny/help/
 
 def get_manifest_item(definition_type=None, definition_id=None):
-    """get_explorer_talent_node_steps()"""
+    """get_manifest_item()"""
 
-    if DEBUG:
-        print(("DEBUG: call_bungie_api(/Manifest/"
-               + definition_type + "/"
-               + definition_id + "/"))
+    if LOCAL_MANIFEST is not None:
+        item = _local_manifest_item(definition_type, definition_id)
+        if item is not None:
+            return item
 
-    item = call_bungie_api('/Manifest/'
-                           + definition_type + '/'
-                           + definition_id + '/')
-
-    return item
+    return _call('GetDestinyEntityDefinition', entityType=definition_type
+                 , hashIdentifier=definition_id)
 
 # get_account_grimoire at
 # https://www.bungie.net/platform/destiny/help/
@@ -577,84 +760,56 @@ def get_manifest_item(definition_type=None, definition_id=None):
 def get_account_grimoire(destiny_membership_id=None, membership_type=None):
     """get_account_grimoire()"""
 
-    if DEBUG:
-        print(("DEBUG: call_bungie_api(/Vanguard/Grimoire/"
-               + membership_type + "/"
-               + destiny_membership_id + "/"
-               + '?definitions=true&flavour=true'))
+    return _call('GetAccountGrimoire', membershipType=membership_type
+                 , destinyMembershipId=destiny_membership_id)
 
-    grimoire = call_bungie_api('/Vanguard/Grimoire/'
-                           + membership_type + '/'
-                           + destiny_membership_id + '/'
-                           + '?definitions=true&flavour=true')
+# get_grimoire_definition at
+# https://www.bungie.net/platform/destiny/help/
 
-    return grimoire
+def get_grimoire_definition():
+    """get_grimoire_definition()"""
 
-# searchDestinyPlayer at
+    return _call('GetGrimoireDefinition')
+
+# getMembersOfGroup at
 # https://www.bungie.net/platform/destiny2/help/
 
-def searchDestinyPlayer(display_name=None,membership_type=None):
-    """searchDestinyPlayer(membership_type=None,display_name=None)"""
+def getMembersOfGroup(groupId=None, currentpage=None):
+    """getMembersOfGroup()"""
 
-    if DEBUG:
-        print(("DEBUG: callBungieAPI(/Destiny2/SearchDestinyPlayer/"
-                + membership_type + "/"
-                + display_name + "/"))
+    return _call('GetMembersOfGroup', groupId=groupId
+                 , currentpage=currentpage)
 
-    membership_info = callBungieAPI('/Destiny2/SearchDestinyPlayer/'
-                                    + membership_type + '/'
-                                    + display_name + '/')
+# searchDestinyPlayer at
+# https://www.bungie.net/platform/destiny2/help/
+
+def searchDestinyPlayer(display_name=None,membership_type=None):
+    """searchDestinyPlayer(membership_type=None,display_name=None)
 
+    display_name is sent percent-encoded; an encoded name is sent as it is.
+    """
 
-    return membership_info
+    return _call('SearchDestinyPlayer', membershipType=membership_type
+                 , displayName=display_name)
 
-def callBungieAPI (method):
+def callBungieAPI (method, fields=None):
     """callBungieAPI()"""
 
     # takes a BungieNet API method as documented at
     # https://www.bungie.net/platform/destiny2/help/
+    # fields optionally projects the result (see projection.Projection)
 
-##    api_base = 'https://www.bungie.net/Platform/Destiny2'
-    api_base = 'https://www.bungie.net/Platform'
-    call_url = api_base + method
-
-    request = urllib.request.Request(call_url, headers={'X-API-Key':API_KEY})
+    return _default_client.callBungieAPI(method, fields)
 
-    result = urllib.request.urlopen(request).read().decode('utf-8')
-
-    parsed_result = json.loads(result)
-
-    return parsed_result
-
-def callOauthBungieAPI (method=None, token=None):
+def callOauthBungieAPI (method=None, token=None, fields=None):
     """callOauthBungieAPI()"""
 
     # takes a BungieNet API method as documented at
     # https://www.bungie.net/platform/destiny2/help/
+    # token is an access token, or an oauth.OAuthSession that keeps its own
+    # token fresh
 
-##    api_base = 'https://www.bungie.net/Platform/Destiny2'
-    api_base = 'https://www.bungie.net/Platform'
-
-    print(("DEBUG: ", method, "\n"))
-    call_url = api_base + method
-
-    headers = {
-  'X-API-Key': API_KEY,
-  'Authorization': 'Bearer ' + token
-}
-
-    encoded_headers = urllib.parse.urlencode(headers)
-    request = urllib.request.Request(call_url, headers={'X-API-Key': API_KEY, 'Authorization': 'Bearer ' + token})
-
-#    print "DEBUG: before urlopen"
-
-    result = urllib.request.urlopen(request).read().decode('utf-8')
-#    result = urllib2.urlopen(request)
-#    print "DEBUG: after urlopen"
-
-    parsed_result = json.loads(result)
-
-    return parsed_result
+    return _default_client.callOauthBungieAPI(method, token, fields)
 
 def call_bungie_api(method):
     """call_bungie_api()"""
@@ -662,24 +817,27 @@ def call_bungie_api(method):
     # takes a BungieNet API method as documented at
     # https://www.bungie.net/platform/destiny/help/
 
-    api_base = 'https://www.bungie.net/Platform/Destiny2'
-    #api_base = 'https://www.bungie.net/Platform/Destiny2'
-    call_url = api_base + method
+    return _default_client.call_bungie_api(method)
 
-    request = urllib.request.Request(call_url, headers={'X-API-Key':API_KEY})
+def _fetch_json(call_url, headers, fields=None):
+    """_fetch_json()"""
 
-    result = urllib.request.urlopen(request).read().decode('utf-8')
+    # every transport function funnels through the shared, pooled transport
 
-    parsed_result = json.loads(result)
+    return _default_client._fetch_json(call_url, headers, fields)
 
-    return parsed_result
+# the only parts of the Characters component getCharacters() reads
+
+CHARACTER_FIELDS = ('Response.characters.data.*.characterId'
+                    , 'Response.characters.data.*.classType')
 
 def getCharacters(destiny_membership_id=None, membership_type=None):
     """getCharacters()"""
 
-    _summary = callBungieAPI('/Destiny2/' + membership_type + '/Profile/'
-                               + destiny_membership_id + '?components='
-                               + 'Characters')
+    _summary = _call('GetProfile', fields=CHARACTER_FIELDS
+                     , membershipType=membership_type
+                     , destinyMembershipId=destiny_membership_id
+                     , components='Characters')
 
 ##    print json.dumps(_summary, indent=4)
 
@@ -737,8 +895,8 @@ def getCharacters(destiny_membership_id=None, membership_type=None):
 def get_characters(destiny_membership_id=None, membership_type=None):
     """get_characters()"""
 
-    _summary = call_bungie_api('/' + membership_type + '/Account/'
-                               + destiny_membership_id + '/Summary/')
+    _summary = _call('GetAccountSummary', membershipType=membership_type
+                     , destinyMembershipId=destiny_membership_id)
 
     _character = [0 for i in range(3)]
 
@@ -770,18 +928,99 @@ def get_characters(destiny_membership_id=None, membership_type=None):
 def get_item_by_hash(entity_type=None, hash_identifier=None):
     """get_item_by_hash()"""
 
-    if DEBUG:
-        print(("DEBUG: call_bungie_api(/Manifest/"
-               + entity_type + "/"
-               + hash_identifier + "/"))
-
+    if LOCAL_MANIFEST is not None:
+        manifest_item = _local_manifest_item(entity_type, hash_identifier)
+        if manifest_item is not None:
+            return manifest_item
 
-    manifest_item = call_bungie_api('/Manifest/'
-                           + entity_type + '/'
-                           + hash_identifier + '/')
+    manifest_item = _call('GetDestinyEntityDefinition'
+                          , entityType=entity_type
+                          , hashIdentifier=hash_identifier)
     error_code = manifest_item['ErrorCode']
 
     if DEBUG:
         print("DEBUG: ErrorCode = ", error_code)
 
     return manifest_item
+
+def use_manifest(manifest):
+    """use_manifest(manifest) -> previous manifest"""
+
+    global LOCAL_MANIFEST
+
+    previous = LOCAL_MANIFEST
+    LOCAL_MANIFEST = manifest
+
+    return previous
+
+def use_cache(cache):
+    """use_cache(cache) -> previous cache"""
+
+    global RESPONSE_CACHE
+
+    previous = RESPONSE_CACHE
+    RESPONSE_CACHE = cache
+
+    return previous
+
+def use_scheduler(request_scheduler):
+    """use_scheduler(request_scheduler) -> previous scheduler"""
+
+    global REQUEST_SCHEDULER
+
+    ensure_configured()
+
+    previous = REQUEST_SCHEDULER
+    REQUEST_SCHEDULER = request_scheduler
+
+    return previous
+
+def use_single_flight(single_flight):
+    """use_single_flight(single_flight) -> previous single flight"""
+
+    global SINGLE_FLIGHT
+
+    ensure_configured()
+
+    previous = SINGLE_FLIGHT
+    SINGLE_FLIGHT = single_flight
+
+    return previous
+
+def use_metrics(registry):
+    """use_metrics(registry) -> previous metrics registry
+
+    registry is an instrumentation.MetricsRegistry, or None to stop
+    recording.
+    """
+
+    global METRICS, _metrics_hook
+
+    from . import instrumentation
+
+    previous = METRICS
+
+    if _metrics_hook is not None:
+        instrumentation.remove_hook(_metrics_hook)
+        _metrics_hook = None
+
+    METRICS = registry
+
+    if registry is not None:
+        _metrics_hook = instrumentation.add_hook(on_end=registry.observe)
+
+    return previous
+
+def _local_manifest_item(entity_type, hash_identifier):
+    """_local_manifest_item()"""
+
+    # wrap the stored definition in the same envelope the Manifest endpoint
+    # returns; None lets the caller fall back to the network.
+
+    definition = LOCAL_MANIFEST.get(entity_type, hash_identifier)
+
+    if definition is None:
+        return None
+
+    return {'Response': definition, 'ErrorCode': 1, 'ThrottleSeconds': 0
+            , 'ErrorStatus': 'Success', 'Message': 'Ok', 'MessageData': {}}
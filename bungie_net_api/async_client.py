@@ -0,0 +1,1015 @@
+""" asyncio client for the Bungie.net API module """
+
+import asyncio
+import io
+import socket
+import time
+import urllib.error
+import urllib.parse
+from collections import deque
+from email.parser import BytesHeaderParser
+
+from . import api
+from . import endpoints
+from . import instrumentation
+from . import models
+from . import pagination
+from . import projection
+from . import singleflight
+from . import transport
+
+# AsyncBungieClient mirrors the endpoint wrappers in api.py as coroutines.
+# Requests run on one event loop over a small asyncio HTTP/1.1 client with
+# keep-alive connection pooling; a semaphore bounds how many are in flight.
+# Like transport.Transport it follows redirects, fails on other 3xx statuses
+# than 304 and honors the proxy environment variables.
+#
+#   async with AsyncBungieClient(max_concurrency=100) as client:
+#       profiles = await asyncio.gather(*[client.getProfile(m, '2', '100')
+#                                         for m in member_ids])
+
+DEFAULT_MAX_CONCURRENCY = 50
+
+# fetch_body() decodes bodies up to this size to catch error envelopes
+
+PEEK_BODY_SIZE = 4096
+
+
+class _AsyncConnectionPool(object):
+    """_AsyncConnectionPool(scheme, host, port, pool_size, idle_timeout
+    , proxy=None)
+
+    proxy is the URL of an HTTP proxy to connect through, as in
+    transport.ConnectionPool.
+    """
+
+    def __init__(self, scheme, host, port, pool_size, idle_timeout
+                 , proxy=None):
+        self.scheme = scheme
+        self.host = host
+        self.port = port or (443 if scheme == 'https' else 80)
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.proxy = proxy
+        self.connections_opened = 0
+
+        self.proxy_headers = {}
+        self.absolute_form = proxy is not None and scheme != 'https'
+        self._address = (host, self.port)
+
+        if proxy is not None:
+            proxy_host, proxy_port, authorization = transport._parse_proxy(
+                proxy)
+            self._address = (proxy_host, proxy_port)
+            if authorization is not None:
+                self.proxy_headers['Proxy-Authorization'] = authorization
+
+        self._idle = deque()
+
+    async def get(self, timings):
+        """get(timings) -> (reader, writer, reused)
+
+        Records dns and connect (TLS included) seconds into timings when a
+        connection is opened.
+        """
+
+        now = time.monotonic()
+
+        while self._idle:
+            reader, writer, last_used = self._idle.pop()
+            if (now - last_used > self.idle_timeout
+                    or reader.at_eof() or writer.is_closing()):
+                writer.close()
+                continue
+            return reader, writer, True
+
+        host, port = self._address
+        tunnel = self.scheme == 'https' and self.proxy is not None
+        https = self.scheme == 'https' and not tunnel
+
+        start = time.perf_counter()
+        addresses = await asyncio.get_running_loop().getaddrinfo(
+            host, port, type=socket.SOCK_STREAM)
+        resolved = time.perf_counter()
+        timings['dns'] = resolved - start
+
+        error = None
+
+        for _, _, _, _, address in addresses:
+            try:
+                reader, writer = await asyncio.open_connection(
+                    address[0], address[1], ssl=https or None
+                    , server_hostname=self.host if https else None)
+            except OSError as failure:
+                error = failure
+                continue
+            if tunnel:
+                try:
+                    await self._tunnel(reader, writer)
+                except BaseException:
+                    writer.close()
+                    raise
+            timings['connect'] = time.perf_counter() - resolved
+            self.connections_opened += 1
+            return reader, writer, False
+
+        raise error or OSError('getaddrinfo returned no addresses for '
+                               + host)
+
+    async def _tunnel(self, reader, writer):
+        """_tunnel(reader, writer)
+
+        CONNECTs through the proxy to host:port and starts TLS on the
+        tunnel, like http.client's set_tunnel().
+        """
+
+        if not hasattr(writer, 'start_tls'):
+            raise urllib.error.URLError('HTTPS through a proxy needs the'
+                                        ' asyncio of Python 3.11 or later')
+
+        authority = '%s:%d' % (self.host, self.port)
+        head = 'CONNECT ' + authority + ' HTTP/1.1\r\nHost: ' + authority
+        head += ''.join('\r\n' + name + ': ' + value
+                        for name, value in self.proxy_headers.items())
+        writer.write((head + '\r\n\r\n').encode('latin-1'))
+        await writer.drain()
+
+        status_line = (await reader.readline()).decode('latin-1').rstrip()
+        while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+            pass
+
+        status = (status_line.split(' ', 1) + [''])[1]
+        if not status.startswith('200'):
+            raise OSError('Tunnel connection failed: ' + status)
+
+        import ssl
+
+        await writer.start_tls(ssl.create_default_context()
+                               , server_hostname=self.host)
+
+    def put(self, reader, writer):
+        """put(reader, writer)"""
+
+        if len(self._idle) < self.pool_size and not writer.is_closing():
+            self._idle.append((reader, writer, time.monotonic()))
+        else:
+            writer.close()
+
+    def close(self):
+        """close()"""
+
+        while self._idle:
+            _, writer, _ = self._idle.pop()
+            writer.close()
+
+
+class AsyncTransport(object):
+    """AsyncTransport(keep_alive=True, pool_size=10, idle_timeout=60
+                      , timeout=30, compress=True)
+
+    asyncio counterpart of transport.Transport.  Must be used from a single
+    event loop.
+    """
+
+    def __init__(self, keep_alive=True, pool_size=transport.DEFAULT_POOL_SIZE
+                 , idle_timeout=transport.DEFAULT_IDLE_TIMEOUT
+                 , timeout=transport.DEFAULT_TIMEOUT, compress=True):
+
+        self.keep_alive = keep_alive
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.compress = compress
+
+        self._pools = {}
+
+    def pool_for(self, scheme, host, port=None):
+        """pool_for(scheme, host, port)"""
+
+        key = (scheme, host, port)
+        pool = self._pools.get(key)
+
+        if pool is None:
+            pool = _AsyncConnectionPool(scheme, host, port, self.pool_size
+                                        , self.idle_timeout
+                                        , transport.proxy_for(scheme, host))
+            self._pools[key] = pool
+
+        return pool
+
+    @property
+    def connections_opened(self):
+        """number of connections opened by this transport"""
+
+        return sum(pool.connections_opened for pool in self._pools.values())
+
+    async def request(self, url, headers=None, method='GET', body=None):
+        """request(url, headers=None, method='GET', body=None) -> Response
+
+        Like transport.Transport.request(): follows redirects and raises
+        urllib.error.HTTPError for 4xx/5xx statuses and for other 3xx
+        statuses than 304.  Proxies are taken from the environment.
+        """
+
+        for _ in range(transport.MAX_REDIRECTS + 1):
+            result = await self._request(url, headers, method, body)
+            status, reason, response_headers, data, timings, size = result
+
+            if not transport._is_redirect(status, response_headers):
+                break
+
+            url, headers, method, body = transport._redirect(
+                url, status, reason, response_headers, data, headers, method
+                , body)
+        else:
+            raise urllib.error.HTTPError(url, status, 'too many redirects'
+                                         , response_headers, io.BytesIO(data))
+
+        if transport._failed(status):
+            raise urllib.error.HTTPError(url, status, reason
+                                         , response_headers
+                                         , io.BytesIO(data))
+
+        return transport.Response(url, status, reason, response_headers, data
+                                  , timings, size)
+
+    async def _request(self, url, headers, method, body):
+        """_request(url, headers, method, body) -> (status, reason, headers
+        , body, timings, size) of one exchange"""
+
+        parts = urllib.parse.urlsplit(url)
+        target = parts.path or '/'
+        if parts.query:
+            target = target + '?' + parts.query
+
+        host = parts.hostname
+        if parts.port:
+            host = host + ':' + str(parts.port)
+
+        pool = self.pool_for(parts.scheme, parts.hostname, parts.port)
+
+        request_headers = {'Host': host, 'Accept-Encoding': (
+            transport.ACCEPT_ENCODING if self.compress else 'identity')}
+        request_headers.update(headers or {})
+        if not self.keep_alive:
+            request_headers['Connection'] = 'close'
+        if body is not None:
+            request_headers['Content-Length'] = str(len(body))
+        if pool.absolute_form:
+            target = urllib.parse.urlunsplit(parts._replace(fragment=''))
+            request_headers.update(pool.proxy_headers)
+
+        head = method + ' ' + target + ' HTTP/1.1\r\n'
+        head += ''.join(name + ': ' + value + '\r\n'
+                        for name, value in request_headers.items())
+        payload = (head + '\r\n').encode('latin-1') + (body or b'')
+
+        timings = {}
+        reader, writer, reused = await asyncio.wait_for(pool.get(timings)
+                                                        , self.timeout)
+
+        try:
+            result = await asyncio.wait_for(
+                self._exchange(reader, writer, payload, method, timings)
+                , self.timeout)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            writer.close()
+            if not reused:
+                raise
+            timings = {}
+            reader, writer, _ = await asyncio.wait_for(pool.get(timings)
+                                                       , self.timeout)
+            try:
+                result = await asyncio.wait_for(
+                    self._exchange(reader, writer, payload, method, timings)
+                    , self.timeout)
+            except BaseException:
+                writer.close()
+                raise
+        except BaseException:
+            writer.close()
+            raise
+
+        status, reason, response_headers, data, size, will_close = result
+
+        if will_close or not self.keep_alive:
+            writer.close()
+        else:
+            pool.put(reader, writer)
+
+        return status, reason, response_headers, data, timings, size
+
+    async def _exchange(self, reader, writer, payload, method, timings):
+        """_exchange(reader, writer, payload, method, timings)"""
+
+        send_start = time.perf_counter()
+        writer.write(payload)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError('connection closed by server')
+
+        version, status, reason = (status_line.decode('latin-1').rstrip('\r\n')
+                                   .split(' ', 2) + [''])[:3]
+        status = int(status)
+
+        header_lines = []
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            header_lines.append(line)
+        headers = BytesHeaderParser().parsebytes(b''.join(header_lines))
+
+        read_start = time.perf_counter()
+        timings['first_byte'] = read_start - send_start
+
+        connection = (headers.get('Connection') or '').lower()
+        will_close = (connection == 'close'
+                      or (version == 'HTTP/1.0' and connection != 'keep-alive'))
+
+        decompressor = transport.Decompressor(headers.get('Content-Encoding'))
+        chunks = []
+
+        if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+            size = 0
+        elif (headers.get('Transfer-Encoding') or '').lower() == 'chunked':
+            size = await self._read_chunked(reader, decompressor, chunks)
+        elif headers.get('Content-Length') is not None:
+            size = int(headers['Content-Length'])
+            remaining = size
+            while remaining:
+                chunk = await reader.read(min(remaining, transport.CHUNK_SIZE))
+                if not chunk:
+                    raise asyncio.IncompleteReadError(b'', remaining)
+                remaining -= len(chunk)
+                chunks.append(decompressor.decompress(chunk))
+        else:
+            size = 0
+            while True:
+                chunk = await reader.read(transport.CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                chunks.append(decompressor.decompress(chunk))
+            will_close = True
+
+        chunks.append(decompressor.flush())
+        data = b''.join(chunks)
+
+        timings['read'] = time.perf_counter() - read_start
+
+        return status, reason, headers, data, size, will_close
+
+    async def _read_chunked(self, reader, decompressor, chunks):
+        """_read_chunked(reader, decompressor, chunks) -> bytes received
+
+        Appends the decompressed body to chunks.
+        """
+
+        received = 0
+
+        while True:
+            size_line = await reader.readline()
+            size = int(size_line.split(b';', 1)[0].strip(), 16)
+            if size == 0:
+                # trailers end with an empty line
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                break
+            chunks.append(decompressor.decompress(
+                await reader.readexactly(size)))
+            received += size
+            await reader.readexactly(2)
+
+        return received
+
+    def close(self):
+        """close()"""
+
+        for pool in self._pools.values():
+            pool.close()
+        self._pools.clear()
+
+
+class AsyncBungieClient(object):
+    """AsyncBungieClient(api_key=None, max_concurrency=50, transport=None)
+
+    Coroutine versions of the api.py endpoint wrappers.  At most
+    max_concurrency requests are in flight at once.
+    """
+
+    def __init__(self, api_key=None, max_concurrency=DEFAULT_MAX_CONCURRENCY
+                 , transport=None):
+
+        self.api_key = api_key
+        self.max_concurrency = max_concurrency
+        self.transport = transport or AsyncTransport(
+            pool_size=max_concurrency, **api.get_settings().options(
+                'keep_alive', 'idle_timeout', 'compress'))
+
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """close()"""
+
+        self.transport.close()
+
+    async def _fetch_json(self, call_url, headers, fields=None):
+        """_fetch_json()"""
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        api.ensure_configured()
+
+        fields = projection.projection(fields)
+
+        if api.DEBUG:
+            print("DEBUG: AsyncBungieClient(" + call_url + ")")
+
+        cache = api.RESPONSE_CACHE
+        lookup = None
+
+        if cache is not None:
+            lookup = cache.prepare(call_url, headers)
+            if lookup.body is not None:
+                return projection.decode(lookup.body, fields)
+            headers = lookup.headers
+
+        single_flight = api.SINGLE_FLIGHT
+
+        if single_flight is None:
+            response, parsed_result = await self._scheduled_request_json(
+                call_url, headers, fields)
+        else:
+            response, parsed_result = await single_flight.do_async(
+                singleflight.request_key(call_url, headers, fields)
+                , self._scheduled_request_json, call_url, headers, fields)
+
+        if lookup is not None and (response.status == 304
+                                   or parsed_result.get('ErrorCode', 1) == 1):
+            body = cache.complete(lookup, call_url, response)
+            if parsed_result is None:
+                parsed_result = projection.decode(body, fields)
+
+        return parsed_result
+
+    async def _scheduled_request_json(self, call_url, headers, fields=None):
+        """_scheduled_request_json() -> (response, parsed_result)"""
+
+        request_scheduler = api.REQUEST_SCHEDULER
+
+        if request_scheduler is None:
+            return await self._request_json(call_url, headers, fields)
+
+        return await request_scheduler.execute_async(
+            self._request_json, headers.get('X-API-Key'), call_url, headers
+            , fields)
+
+    async def _request_json(self, call_url, headers, fields=None):
+        """_request_json() -> (response, parsed_result)"""
+
+        async with self._semaphore:
+            event = instrumentation.start(call_url)
+            try:
+                response = await self.transport.request(call_url
+                                                        , headers=headers)
+            except Exception as error:
+                instrumentation.finish(event, error=error)
+                raise
+
+        parsed_result = None
+
+        try:
+            if response.status != 304:
+                parsed_result = instrumentation.timed_decode(
+                    event, projection.decode, response.body, fields)
+        except Exception as error:
+            instrumentation.finish(event, response, error=error)
+            raise
+
+        instrumentation.finish(event, response, parsed_result)
+
+        return response, parsed_result
+
+    async def fetch_body(self, method):
+        """fetch_body(method) -> undecoded response body of callBungieAPI()
+
+        For callers that decode elsewhere (see pipeline.py): the request is
+        paced, retried and instrumented like any other, but neither cached
+        nor shared.  Error and throttling envelopes are always small, so
+        only small bodies are decoded here to recognise them.
+        """
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        api.ensure_configured()
+
+        call_url = api.BUNGIE_NET_ROOT + '/Platform' + method
+        headers = self._headers()
+
+        request_scheduler = api.REQUEST_SCHEDULER
+
+        if request_scheduler is None:
+            response, envelope = await self._request_body(call_url, headers)
+        else:
+            response, envelope = await request_scheduler.execute_async(
+                self._request_body, headers.get('X-API-Key'), call_url
+                , headers)
+
+        if envelope is not None and envelope.get('ErrorCode', 1) != 1:
+            raise api.BungieAPIError.from_envelope(envelope)
+
+        return response.body
+
+    async def _request_body(self, call_url, headers):
+        """_request_body() -> (response, envelope of a small body or None)"""
+
+        async with self._semaphore:
+            event = instrumentation.start(call_url)
+            try:
+                response = await self.transport.request(call_url
+                                                        , headers=headers)
+            except Exception as error:
+                instrumentation.finish(event, error=error)
+                raise
+
+        envelope = None
+
+        try:
+            if len(response.body) <= PEEK_BODY_SIZE:
+                envelope = projection.decode(response.body)
+        except Exception as error:
+            instrumentation.finish(event, response, error=error)
+            raise
+
+        instrumentation.finish(event, response, envelope)
+
+        return response, envelope
+
+    def _headers(self):
+        """_headers()"""
+
+        return {'X-API-Key': self.api_key or api.get_settings().api_key}
+
+    async def callBungieAPI(self, method, fields=None):
+        """callBungieAPI()"""
+
+        return await self._fetch_json(api.BUNGIE_NET_ROOT + '/Platform' + method
+                                      , self._headers(), fields)
+
+    async def callOauthBungieAPI(self, method=None, token=None, fields=None):
+        """callOauthBungieAPI()"""
+
+        if not isinstance(token, str):
+            return await token.call_async(self, method, fields)
+
+        headers = self._headers()
+        headers['Authorization'] = 'Bearer ' + token
+
+        return await self._fetch_json(api.BUNGIE_NET_ROOT + '/Platform' + method
+                                      , headers, fields)
+
+    async def call_bungie_api(self, method):
+        """call_bungie_api()"""
+
+        return await self._fetch_json(api.BUNGIE_NET_ROOT + '/Platform/Destiny2'
+                                      + method, self._headers())
+
+    async def call(self, name, token=None, fields=None, **params):
+        """call(name, token=None, fields=None, **params) -> envelope
+
+        Async version of endpoints.call().
+        """
+
+        method = endpoints.prepare(name, params, token)
+
+        if token:
+            return await self.callOauthBungieAPI(method, token=token
+                                                 , fields=fields)
+
+        return await self.callBungieAPI(method, fields=fields)
+
+    async def getProfile(self, destinyMembershipId=None, membershipType=None
+                         , components=None, token=None, fields=None
+                         , as_models=False):
+        """getProfile()"""
+
+        envelope = await self.call('GetProfile', token=token, fields=fields
+                                   , membershipType=membershipType
+                                   , destinyMembershipId=destinyMembershipId
+                                   , components=components)
+
+        if as_models:
+            return models.profile_from_envelope(envelope)
+
+        return envelope
+
+    async def getClanLeaderboards(self, clanId=None, modes=None, maxTop=None
+                                  , statId=None):
+        """getClanLeaderboards()"""
+
+        return await self.call('GetClanLeaderboards', groupId=clanId
+                               , modes=modes, maxtop=maxTop or None
+                               , statId=statId or None)
+
+    async def getMembershipsById(self, membership_id=None
+                                 , membership_type=None):
+        """getMembershipsById()"""
+
+        return await self.call('GetMembershipsById'
+                               , membershipId=membership_id
+                               , membershipType=membership_type)
+
+    async def getMembershipDataById(self, membershipId=None
+                                    , membershipType=None):
+        """getMembershipDataById()"""
+
+        return await self.call('GetMembershipsById', membershipId=membershipId
+                               , membershipType=membershipType)
+
+    async def getMembershipsForCurrentUser(self, token=None):
+        """getMembershipsForCurrentUser(token)"""
+
+        return await self.call('GetMembershipsForCurrentUser', token=token)
+
+    async def getActivityHistory(self, destiny_membership_id=None
+                                 , membership_type=None, character_id=None
+                                 , mode=None, count=None, page=None
+                                 , as_models=False):
+        """getActivityHistory()"""
+
+        envelope = await self.call(
+            'GetActivityHistory', membershipType=membership_type
+            , destinyMembershipId=destiny_membership_id
+            , characterId=character_id, mode=mode, count=count, page=page)
+
+        if as_models:
+            return models.activities_from_envelope(envelope)
+
+        return envelope
+
+    async def iter_activity_history(self, destiny_membership_id=None
+                                    , membership_type=None, character_id=None
+                                    , mode=None
+                                    , count=pagination.MAX_PAGE_SIZE
+                                    , until=None, prefetch=True):
+        """iter_activity_history() -> async iterator of activities
+
+        Async version of pagination.iter_activity_history().
+        """
+
+        until = pagination.as_utc(until)
+        count = int(count)
+
+        async def fetch(page):
+            return pagination.page_activities(await self.getActivityHistory(
+                destiny_membership_id, membership_type, character_id
+                , mode=mode, count=str(count), page=str(page)))
+
+        pending = None
+        page = 0
+
+        try:
+            activities = await fetch(page)
+
+            while activities:
+                if prefetch and len(activities) == count:
+                    pending = asyncio.ensure_future(fetch(page + 1))
+
+                for activity in activities:
+                    if pagination.older_than(activity, until):
+                        return
+                    yield activity
+
+                if len(activities) < count:
+                    return
+
+                page += 1
+                if pending is not None:
+                    activities, pending = await pending, None
+                else:
+                    activities = await fetch(page)
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    async def get_account_summary(self, destiny_membership_id=None
+                                  , membership_type=None, definitions=None):
+        """get_account_summary()"""
+
+        return await self.call('GetAccountSummary'
+                               , membershipType=membership_type
+                               , destinyMembershipId=destiny_membership_id
+                               , definitions=api._flag(definitions))
+
+    async def get_activity_history_stats(self, destiny_membership_id=None
+                                         , membership_type=None
+                                         , character_id=None
+                                         , definitions=None, page=None
+                                         , mode=None, count=None):
+        """get_activity_history_stats()"""
+
+        return await self.call('GetActivityHistoryStats'
+                               , membershipType=membership_type
+                               , destinyMembershipId=destiny_membership_id
+                               , characterId=character_id
+                               , definitions=api._flag(definitions)
+                               , mode=mode, count=count, page=page)
+
+    async def get_account_advisors(self, destiny_membership_id=None
+                                   , membership_type=None, definitions=None):
+        """get_account_advisors()"""
+
+        return await self.call('GetAdvisors', membershipType=membership_type
+                               , destinyMembershipId=destiny_membership_id
+                               , definitions=api._flag(definitions))
+
+    async def get_account_advisors_v2(self, destiny_membership_id=None
+                                      , membership_type=None
+                                      , character_id=None, definitions=None):
+        """get_account_advisors_v2()"""
+
+        return await self.call('GetAdvisorsV2ForCharacter'
+                               , membershipType=membership_type
+                               , destinyMembershipId=destiny_membership_id
+                               , characterId=character_id
+                               , definitions=api._flag(definitions))
+
+    async def get_advisors_v2(self, definitions=None):
+        """get_advisors_v2()"""
+
+        return await self.call('GetAdvisorsV2'
+                               , definitions=api._flag(definitions))
+
+    async def get_account_items(self, destiny_membership_id=None
+                                , membership_type=None, definitions=None):
+        """get_account_items()"""
+
+        return await self.call('GetAccountItems'
+                               , membershipType=membership_type
+                               , destinyMembershipId=destiny_membership_id
+                               , definitions=api._flag(definitions))
+
+    async def get_triumphs(self, destiny_membership_id=None
+                           , membership_type=None, definitions=None):
+        """get_triumphs()"""
+
+        return await self.call('GetTriumphs', membershipType=membership_type
+                               , destinyMembershipId=destiny_membership_id
+                               , definitions=api._flag(definitions))
+
+    async def get_character_activities(self, destiny_membership_id=None
+                                       , membership_type=None
+                                       , character_id=None, definitions=None):
+        """get_character_activities()"""
+
+        return await self.call('GetCharacterActivities'
+                               , membershipType=membership_type
+                               , destinyMembershipId=destiny_membership_id
+                               , characterId=character_id
+                               , definitions=api._flag(definitions))
+
+    async def get_character_inventory(self, destiny_membership_id=None
+                                      , membership_type=None
+                                      , character_id=None, definitions=None):
+        """get_character_inventory()"""
+
+        return await self.call('GetCharacterInventory'
+                               , membershipType=membership_type
+                               , destinyMembershipId=destiny_membership_id
+                               , characterId=character_id
+                               , definitions=api._flag(definitions))
+
+    async def get_character_inventory_summary(self, destiny_membership_id=None
+                                              , membership_type=None
+                                              , character_id=None
+                                              , definitions=None):
+        """get_character_inventory_summary()"""
+
+        return await self.call('GetCharacterInventorySummary'
+                               , membershipType=membership_type
+                               , destinyMembershipId=destiny_membership_id
+                               , characterId=character_id
+                               , definitions=api._flag(definitions))
+
+    async def get_item_details(self, destiny_membership_id=None
+                               , membership_type=None, character_id=None
+                               , item_instance_id=None, definitions=None):
+        """get_item_details()"""
+
+        return await self.call('GetItemDetails'
+                               , membershipType=membership_type
+                               , destinyMembershipId=destiny_membership_id
+                               , characterId=character_id
+                               , itemInstanceId=item_instance_id
+                               , definitions=api._flag(definitions))
+
+    async def get_noninstanced_item_details(self, destiny_membership_id=None
+                                            , membership_type=None
+                                            , character_id=None
+                                            , item_hash=None
+                                            , definitions=None):
+        """get_noninstanced_item_details()"""
+
+        return await self.call('GetNoninstancedItemDetails'
+                               , membershipType=membership_type
+                               , destinyMembershipId=destiny_membership_id
+                               , characterId=character_id, itemHash=item_hash
+                               , definitions=api._flag(definitions))
+
+    async def get_character_progression(self, destiny_membership_id=None
+                                        , membership_type=None
+                                        , character_id=None, definitions=None):
+        """get_character_progression()"""
+
+        return await self.call('GetCharacterProgression'
+                               , membershipType=membership_type
+                               , destinyMembershipId=destiny_membership_id
+                               , characterId=character_id
+                               , definitions=api._flag(definitions))
+
+    async def get_character_summary(self, destiny_membership_id=None
+                                    , membership_type=None, character_id=None
+                                    , definitions=None):
+        """get_character_summary()"""
+
+        return await self.call('GetCharacter', membershipType=membership_type
+                               , destinyMembershipId=destiny_membership_id
+                               , characterId=character_id
+                               , definitions=api._flag(definitions))
+
+    async def get_character_aggregate_stats(self, destiny_membership_id=None
+                                            , membership_type=None
+                                            , character_id=None
+                                            , definitions=None):
+        """get_character_aggregate_stats()"""
+
+        return await self.call('GetAggregateActivityStats'
+                               , membershipType=membership_type
+                               , destinyMembershipId=destiny_membership_id
+                               , characterId=character_id
+                               , definitions=api._flag(definitions))
+
+    async def get_character_stats(self, destiny_membership_id=None
+                                  , membership_type=None, character_id=None
+                                  , modes=None, period_type=None, groups=None
+                                  , monthstart=None, monthend=None
+                                  , daystart=None, dayend=None):
+        """get_character_stats()"""
+
+        return await self.call('GetCharacterStats'
+                               , membershipType=membership_type
+                               , destinyMembershipId=destiny_membership_id
+                               , characterId=character_id, modes=modes
+                               , periodType=period_type, groups=groups
+                               , monthstart=monthstart, monthend=monthend
+                               , daystart=daystart, dayend=dayend)
+
+    async def get_account_stats(self, destiny_membership_id=None
+                                , membership_type=None, groups=None):
+        """get_account_stats()"""
+
+        return await self.call('GetAccountStats'
+                               , membershipType=membership_type
+                               , destinyMembershipId=destiny_membership_id
+                               , groups=groups)
+
+    async def get_membership_id_by_display_name(self, display_name=None
+                                                , membership_type=None):
+        """get_membership_id_by_display_name()"""
+
+        return await self.call('GetMembershipIdByDisplayName'
+                               , membershipType=membership_type
+                               , displayName=display_name)
+
+    async def get_activity_stats(self, activity_id=None, definitions=None
+                                 , as_models=False):
+        """get_activity_stats()"""
+
+        envelope = await self.call('GetPostGameCarnageReport'
+                                   , activityId=activity_id
+                                   , definitions=api._flag(definitions))
+
+        if as_models:
+            return models.pgcr_from_envelope(envelope)
+
+        return envelope
+
+    async def get_char_uniq_weapon_stats(self, membership_type=None
+                                         , destiny_membership_id=None
+                                         , character_id=None
+                                         , definitions=None):
+        """get_char_uniq_weapon_stats()"""
+
+        return await self.call('GetUniqueWeaponHistory'
+                               , membershipType=membership_type
+                               , destinyMembershipId=destiny_membership_id
+                               , characterId=character_id
+                               , definitions=api._flag(definitions))
+
+    async def get_explorer_items(self, count=10, page=0):
+        """get_explorer_items()"""
+
+        return await self.call('GetExplorerItems', count=count, page=page)
+
+    async def get_explorer_talent_node_steps(self, count=10, page=0):
+        """get_explorer_talent_node_steps()"""
+
+        return await self.call('GetExplorerTalentNodeSteps', count=count
+                               , page=page)
+
+    async def get_manifest(self):
+        """get_manifest()"""
+
+        return await self.call('GetDestinyManifest')
+
+    async def get_manifest_item(self, definition_type=None
+                                , definition_id=None):
+        """get_manifest_item()"""
+
+        return await self.get_item_by_hash(definition_type, definition_id)
+
+    async def get_account_grimoire(self, destiny_membership_id=None
+                                   , membership_type=None):
+        """get_account_grimoire()"""
+
+        return await self.call('GetAccountGrimoire'
+                               , membershipType=membership_type
+                               , destinyMembershipId=destiny_membership_id)
+
+    async def get_grimoire_definition(self):
+        """get_grimoire_definition()"""
+
+        return await self.call('GetGrimoireDefinition')
+
+    async def getMembersOfGroup(self, groupId=None, currentpage=None):
+        """getMembersOfGroup()"""
+
+        return await self.call('GetMembersOfGroup', groupId=groupId
+                               , currentpage=currentpage)
+
+    async def searchDestinyPlayer(self, display_name=None
+                                  , membership_type=None):
+        """searchDestinyPlayer()"""
+
+        return await self.call('SearchDestinyPlayer'
+                               , membershipType=membership_type
+                               , displayName=display_name)
+
+    async def getCharacters(self, destiny_membership_id=None
+                            , membership_type=None):
+        """getCharacters()"""
+
+        _summary = await self.call('GetProfile', fields=api.CHARACTER_FIELDS
+                                   , membershipType=membership_type
+                                   , destinyMembershipId=destiny_membership_id
+                                   , components='Characters')
+
+        characters = _summary['Response']['characters']['data']
+        characters_array = []
+
+        for guardian in characters:
+            index = characters[guardian]['classType']
+            characters_array.insert(index, characters[guardian]['characterId'])
+
+        return characters_array
+
+    async def get_characters(self, destiny_membership_id=None
+                             , membership_type=None):
+        """get_characters()"""
+
+        _summary = await self.call('GetAccountSummary'
+                                   , membershipType=membership_type
+                                   , destinyMembershipId=destiny_membership_id)
+
+        _character = [0 for i in range(3)]
+
+        for guardian in range(0, 3):
+            base = _summary['Response']['data']['characters'][guardian]\
+                    ['characterBase']
+            _character[base['classType']] = base['characterId']
+
+        return _character
+
+    async def get_item_by_hash(self, entity_type=None, hash_identifier=None):
+        """get_item_by_hash()"""
+
+        if api.LOCAL_MANIFEST is not None:
+            manifest_item = api._local_manifest_item(entity_type
+                                                     , hash_identifier)
+            if manifest_item is not None:
+                return manifest_item
+
+        return await self.call('GetDestinyEntityDefinition'
+                               , entityType=entity_type
+                               , hashIdentifier=hash_identifier)
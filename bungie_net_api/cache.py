@@ -0,0 +1,276 @@
+""" Response cache for the Bungie.net API module """
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# ResponseCache sits in front of the transport.  Each response is kept for
+# the TTL of the first endpoint policy whose pattern matches its URL;
+# responses that match no policy are kept for the Cache-Control max-age the
+# server sent, if any.  Stale entries that carried an ETag are revalidated
+# with If-None-Match instead of downloaded again.  The memory tier is an LRU
+# bounded by entry count and body bytes; an optional SQLite file adds a
+# persistent tier.
+#
+#   api.use_cache(ResponseCache(disk_path='/var/cache/bungie.sqlite3'))
+
+FOREVER = None
+
+# (url pattern, ttl seconds); FOREVER never expires.  The ttls of the
+# endpoints.ENDPOINTS entries come first, these catch the other URLs.
+
+DEFAULT_POLICIES = [
+    (r'/Stats/PostGameCarnageReport/', FOREVER),
+    (r'/Manifest/', 3600),
+    (r'/Stats/Leaderboards/', 60),
+    (r'/User/GetMembershipsById/', 300),
+    (r'/SearchDestinyPlayer/', 300),
+    (r'/Profile/', 15),
+]
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+_MAX_AGE = re.compile(r'max-age=(\d+)')
+
+
+class CacheEntry(object):
+    """CacheEntry(body, etag, expires)"""
+
+    __slots__ = ('body', 'etag', 'expires')
+
+    def __init__(self, body, etag, expires):
+        self.body = body
+        self.etag = etag
+        self.expires = expires
+
+    def fresh(self, now):
+        """fresh(now)"""
+
+        return self.expires is FOREVER or now < self.expires
+
+
+class CacheLookup(object):
+    """CacheLookup(key, entry, body, headers)
+
+    Result of ResponseCache.prepare(): body is set on a fresh hit, otherwise
+    headers are the request headers to send (with If-None-Match when the
+    stale entry can be revalidated).
+    """
+
+    __slots__ = ('key', 'entry', 'body', 'headers')
+
+    def __init__(self, key, entry, body, headers):
+        self.key = key
+        self.entry = entry
+        self.body = body
+        self.headers = headers
+
+
+class ResponseCache(object):
+    """ResponseCache(policies=None, max_entries=1024, max_bytes=64MB
+                     , disk_path=None)
+
+    policies default to endpoints.cache_policies() + DEFAULT_POLICIES.
+    """
+
+    def __init__(self, policies=None, max_entries=DEFAULT_MAX_ENTRIES
+                 , max_bytes=DEFAULT_MAX_BYTES, disk_path=None):
+
+        if policies is None:
+            from . import endpoints
+
+            policies = endpoints.cache_policies() + DEFAULT_POLICIES
+
+        self.policies = [(re.compile(pattern), ttl)
+                         for pattern, ttl in policies]
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_path = disk_path
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._db = None
+
+        if disk_path is not None:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    body BLOB NOT NULL,
+                    etag TEXT,
+                    expires REAL)""")
+
+    def stats(self):
+        """stats() -> dict of counters"""
+
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses
+                    , 'revalidations': self.revalidations
+                    , 'evictions': self.evictions
+                    , 'entries': len(self._entries), 'bytes': self._bytes}
+
+    def policy_ttl(self, call_url):
+        """policy_ttl(call_url) -> (matched, ttl)"""
+
+        for pattern, ttl in self.policies:
+            if pattern.search(call_url):
+                return True, ttl
+
+        return False, 0
+
+    def key(self, call_url, headers):
+        """key(call_url, headers)"""
+
+        # responses fetched with an OAuth token are private to that user
+
+        authorization = (headers or {}).get('Authorization')
+
+        if not authorization:
+            return call_url
+
+        digest = hashlib.sha1(authorization.encode('utf-8')).hexdigest()
+
+        return call_url + '#' + digest
+
+    def prepare(self, call_url, headers):
+        """prepare(call_url, headers) -> CacheLookup"""
+
+        key = self.key(call_url, headers)
+        entry = self.get(key)
+
+        if entry is not None and entry.fresh(time.time()):
+            with self._lock:
+                self.hits += 1
+            return CacheLookup(key, entry, entry.body, headers)
+
+        with self._lock:
+            self.misses += 1
+
+        if entry is not None and entry.etag:
+            headers = dict(headers)
+            headers['If-None-Match'] = entry.etag
+            return CacheLookup(key, entry, None, headers)
+
+        return CacheLookup(key, None, None, headers)
+
+    def complete(self, lookup, call_url, response):
+        """complete(lookup, call_url, response) -> body bytes"""
+
+        if response.status == 304 and lookup.entry is not None:
+            with self._lock:
+                self.revalidations += 1
+            self.put(lookup.key, lookup.entry.body, lookup.entry.etag
+                     , self._expires(call_url, response.headers))
+            return lookup.entry.body
+
+        cache_control = (response.headers.get('Cache-Control') or '').lower()
+
+        if 'no-store' not in cache_control:
+            expires = self._expires(call_url, response.headers)
+            etag = response.headers.get('ETag')
+            if expires is FOREVER or expires > time.time() or etag:
+                self.put(lookup.key, response.body, etag, expires)
+
+        return response.body
+
+    def _expires(self, call_url, headers):
+        """_expires(call_url, headers) -> expiry timestamp or FOREVER"""
+
+        matched, ttl = self.policy_ttl(call_url)
+        cache_control = (headers.get('Cache-Control') or '').lower()
+
+        if not matched:
+            max_age = _MAX_AGE.search(cache_control)
+            ttl = int(max_age.group(1)) if max_age else 0
+
+        if 'no-cache' in cache_control:
+            ttl = 0
+
+        if ttl is FOREVER:
+            return FOREVER
+
+        return time.time() + ttl
+
+    def get(self, key):
+        """get(key) -> CacheEntry or None"""
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        if self._db is None:
+            return None
+
+        with self._lock:
+            row = self._db.execute("SELECT body, etag, expires FROM responses"
+                                   " WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+
+        entry = CacheEntry(bytes(row[0]), row[1], row[2])
+        self._remember(key, entry)
+
+        return entry
+
+    def put(self, key, body, etag, expires):
+        """put(key, body, etag, expires)"""
+
+        entry = CacheEntry(body, etag, expires)
+        self._remember(key, entry)
+
+        if self._db is not None:
+            with self._lock:
+                with self._db:
+                    self._db.execute("INSERT OR REPLACE INTO responses"
+                                     " VALUES (?, ?, ?, ?)"
+                                     , (key, body, etag, expires))
+
+    def _remember(self, key, entry):
+        """_remember(key, entry)"""
+
+        if len(entry.body) > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous.body)
+
+            self._entries[key] = entry
+            self._bytes += len(entry.body)
+
+            while (len(self._entries) > self.max_entries
+                   or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.body)
+                self.evictions += 1
+
+    def clear(self):
+        """clear()"""
+
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            if self._db is not None:
+                with self._db:
+                    self._db.execute("DELETE FROM responses")
+
+    def close(self):
+        """close()"""
+
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,334 @@
+""" Columnar activity and PGCR statistics for the Bungie.net API module """
+
+import array
+import calendar
+import mmap
+import os
+import struct
+import sys
+
+from . import models
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Activity history rows and PGCR entries carry their statistics as
+# {statId: {'basic': {'value': ..}}} dicts.  The builders below flatten a
+# stream of them into one typed column per stat id (float64, NaN where a row
+# lacks the stat) next to a few int64 identity columns, so season-wide
+# aggregation is a vectorized operation:
+#
+#   builder = ActivityColumns()
+#   builder.extend(iter_activity_history(member_id, '2', character_id
+#                                        , mode='5'))
+#   table = builder.columns()
+#   kd = numpy.nansum(table['kills']) / numpy.nansum(table['deaths'])
+#
+# columns() returns numpy arrays when numpy is installed and array.array
+# columns otherwise; asking for numpy with use_numpy=True when it is not
+# installed raises ImportError.  Rows may be raw JSON dicts or models objects.
+#
+# write_columns() stores a table in a flat file that read_columns() maps
+# back without parsing (zero copy with numpy):
+#
+#   header   magic, byte order, column count, row count
+#   names    length prefixed, newline separated column names, padded to 8
+#   types    one array typecode per column, padded to 8
+#   columns  row count 8 byte values per column
+
+COLUMNS_MAGIC = b'BNCOLS01'
+
+_HEADER = struct.Struct('<8sIIQ')
+_NAMES_LENGTH = struct.Struct('<Q')
+_BYTE_ORDER = {'little': 1, 'big': 2}[sys.byteorder]
+
+_NUMPY_TYPES = {'q': 'int64', 'd': 'float64'}
+
+_MISSING_ID = -1
+_MISSING_STAT = float('nan')
+
+
+def period_seconds(period):
+    """period_seconds(period) -> seconds since the epoch of an API period"""
+
+    if not period:
+        return _MISSING_ID
+
+    return calendar.timegm((int(period[0:4]), int(period[5:7])
+                            , int(period[8:10]), int(period[11:13])
+                            , int(period[14:16]), int(period[17:19])))
+
+
+def _integer(value):
+    """_integer(value) -> int of an id that may be a string or None"""
+
+    if value is None:
+        return _MISSING_ID
+
+    return int(value)
+
+
+def _use_numpy(use_numpy):
+    """_use_numpy(use_numpy) -> whether to build numpy columns"""
+
+    if use_numpy is None:
+        return numpy is not None
+
+    if use_numpy and numpy is None:
+        raise ImportError('use_numpy=True requires numpy, which is not'
+                          ' installed')
+
+    return use_numpy
+
+
+def _pad(length):
+    """_pad(length) -> bytes to the next multiple of 8"""
+
+    return b'\0' * (-length % 8)
+
+
+class ColumnBuilder(object):
+    """ColumnBuilder()
+
+    Base of the builders; subclasses set ID_COLUMNS and implement add().
+    """
+
+    ID_COLUMNS = ()
+
+    def __init__(self):
+        self.rows = 0
+        self._ids = [array.array('q') for _ in self.ID_COLUMNS]
+        self._stats = {}
+
+    def __len__(self):
+        return self.rows
+
+    def _append(self, ids, values):
+        """_append(ids, values)"""
+
+        for column, value in zip(self._ids, ids):
+            column.append(value)
+
+        stats = self._stats
+
+        for stat_id, column in stats.items():
+            column.append(values.get(stat_id, _MISSING_STAT))
+
+        for stat_id, value in values.items():
+            if stat_id not in stats:
+                column = array.array('d', [_MISSING_STAT]) * self.rows
+                column.append(value)
+                stats[stat_id] = column
+
+        self.rows += 1
+
+    def extend(self, rows):
+        """extend(rows)"""
+
+        for row in rows:
+            self.add(row)
+
+    def stat_ids(self):
+        """stat_ids() -> the stat columns, in order of first appearance"""
+
+        return list(self._stats)
+
+    def columns(self, use_numpy=None):
+        """columns(use_numpy=None) -> {name: column}
+
+        Columns are numpy arrays when numpy is installed (or use_numpy is
+        set) and the builder's own array.array columns otherwise.
+        use_numpy=True without numpy raises ImportError.
+        """
+
+        table = dict(zip(self.ID_COLUMNS, self._ids))
+        table.update(self._stats)
+
+        if _use_numpy(use_numpy):
+            return dict((name, numpy.frombuffer(column, _NUMPY_TYPES[
+                column.typecode]).copy()) for name, column in table.items())
+
+        return table
+
+    def write(self, path):
+        """write(path)"""
+
+        write_columns(path, self.columns(use_numpy=False))
+
+
+class ActivityColumns(ColumnBuilder):
+    """ActivityColumns()
+
+    One row per getActivityHistory() activity.
+    """
+
+    ID_COLUMNS = ('instance_id', 'period', 'mode', 'reference_id'
+                  , 'director_activity_hash')
+
+    def add(self, activity):
+        """add(activity)
+
+        activity is an activities element or a models.Activity.
+        """
+
+        if isinstance(activity, dict):
+            activity = models.Activity.from_json(activity)
+
+        self._append((_integer(activity.instance_id)
+                      , period_seconds(activity.period)
+                      , _integer(activity.mode)
+                      , _integer(activity.reference_id)
+                      , _integer(activity.director_activity_hash))
+                     , activity.values)
+
+
+class PGCRColumns(ColumnBuilder):
+    """PGCRColumns()
+
+    One row per player entry of each get_activity_stats() report; the
+    extended values (precision kills, medals, ...) are columns too.
+    """
+
+    ID_COLUMNS = ('instance_id', 'period', 'mode', 'director_activity_hash'
+                  , 'character_id', 'membership_id', 'class_hash')
+
+    def add(self, pgcr):
+        """add(pgcr)
+
+        pgcr is an envelope, its Response or a models.PGCR.
+        """
+
+        if isinstance(pgcr, dict):
+            if 'ErrorCode' in pgcr:
+                pgcr = models.pgcr_from_envelope(pgcr)
+            else:
+                pgcr = models.PGCR.from_json(pgcr)
+
+        activity_ids = (_integer(pgcr.instance_id)
+                        , period_seconds(pgcr.period), _integer(pgcr.mode)
+                        , _integer(pgcr.director_activity_hash))
+
+        for entry in pgcr.entries:
+            values = entry.values
+            if entry.extended:
+                values = dict(values)
+                values.update(entry.extended)
+
+            self._append(activity_ids + (_integer(entry.character_id)
+                                         , _integer(entry.membership_id)
+                                         , _integer(entry.class_hash))
+                         , values)
+
+
+def activity_columns(activities, use_numpy=None):
+    """activity_columns(activities, use_numpy=None) -> {name: column}"""
+
+    builder = ActivityColumns()
+    builder.extend(activities)
+
+    return builder.columns(use_numpy)
+
+
+def pgcr_columns(pgcrs, use_numpy=None):
+    """pgcr_columns(pgcrs, use_numpy=None) -> {name: column}"""
+
+    builder = PGCRColumns()
+    builder.extend(pgcrs)
+
+    return builder.columns(use_numpy)
+
+
+def write_columns(path, table):
+    """write_columns(path, table)
+
+    table maps column names to equally long array.array or numpy columns of
+    8 byte integers or floats.  The file is written next to path and renamed
+    into place.
+    """
+
+    names = list(table)
+    typecodes = []
+    rows = None
+
+    for name in names:
+        column = table[name]
+        if isinstance(column, array.array):
+            typecode = column.typecode
+        else:
+            typecode = 'q' if column.dtype.kind in 'iu' else 'd'
+        if typecode not in _NUMPY_TYPES or '\n' in name:
+            raise ValueError('cannot store column ' + repr(name))
+        if rows is None:
+            rows = len(column)
+        elif len(column) != rows:
+            raise ValueError('column %r has %d rows, not %d'
+                             % (name, len(column), rows))
+        typecodes.append(typecode)
+
+    encoded_names = '\n'.join(names).encode('utf-8')
+    encoded_types = ''.join(typecodes).encode('ascii')
+
+    temp_path = path + '.tmp'
+
+    with open(temp_path, 'wb') as store:
+        store.write(_HEADER.pack(COLUMNS_MAGIC, _BYTE_ORDER, len(names)
+                                 , rows or 0))
+        store.write(_NAMES_LENGTH.pack(len(encoded_names)))
+        store.write(encoded_names + _pad(len(encoded_names)))
+        store.write(encoded_types + _pad(len(encoded_types)))
+        for name, typecode in zip(names, typecodes):
+            column = table[name]
+            if not isinstance(column, array.array):
+                column = numpy.ascontiguousarray(
+                    column, dtype=_NUMPY_TYPES[typecode])
+            store.write(memoryview(column).cast('B'))
+
+    os.replace(temp_path, path)
+
+
+def read_columns(path, use_numpy=None):
+    """read_columns(path, use_numpy=None) -> {name: column}
+
+    With numpy the columns are read-only arrays over a memory map of the
+    file; otherwise they are copied into array.array columns.
+    """
+
+    use_numpy = _use_numpy(use_numpy)
+
+    with open(path, 'rb') as store:
+        mapped = mmap.mmap(store.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, byte_order, count, rows = _HEADER.unpack_from(mapped, 0)
+
+    if magic != COLUMNS_MAGIC:
+        raise ValueError(path + ' is not a column file')
+    if byte_order != _BYTE_ORDER:
+        raise ValueError(path + ' was written with a different byte order')
+
+    offset = _HEADER.size
+    (names_length,) = _NAMES_LENGTH.unpack_from(mapped, offset)
+    offset += _NAMES_LENGTH.size
+    names = (mapped[offset:offset + names_length].decode('utf-8').split('\n')
+             if count else [])
+    offset += names_length + len(_pad(names_length))
+    typecodes = mapped[offset:offset + count].decode('ascii')
+    offset += count + len(_pad(count))
+
+    table = {}
+
+    for name, typecode in zip(names, typecodes):
+        if use_numpy:
+            table[name] = numpy.frombuffer(mapped, _NUMPY_TYPES[typecode]
+                                           , rows, offset)
+        else:
+            column = array.array(typecode)
+            column.frombytes(mapped[offset:offset + 8 * rows])
+            table[name] = column
+        offset += 8 * rows
+
+    if not use_numpy:
+        mapped.close()
+
+    return table
@@ -0,0 +1,113 @@
+""" JSON decoding for the Bungie.net API module """
+
+import json
+
+# The transport hands response bodies to decode() as raw bytes, never as an
+# intermediate str.  orjson parses bytes directly and is used when it is
+# installed; otherwise json.loads() is given the bytes.  set_decoder()
+# selects a decoder by name or installs any callable taking bytes.
+#
+# Very large responses (manifest tables, long activity pages) can be parsed
+# incrementally from a file-like body with iter_items() and iter_kvitems(),
+# which use ijson when it is installed and fall back to a full decode.
+# Prefixes follow ijson: dotted keys, with "item" for list elements, e.g.
+# "Response.activities.item".
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+def _json_loads(data):
+    """_json_loads(data)"""
+
+    return json.loads(data)
+
+
+DECODERS = {'json': _json_loads}
+
+if orjson is not None:
+    DECODERS['orjson'] = orjson.loads
+
+_decoder = DECODERS['orjson' if orjson is not None else 'json']
+
+
+def get_decoder():
+    """get_decoder() -> callable(bytes)"""
+
+    return _decoder
+
+
+def set_decoder(decoder):
+    """set_decoder(decoder) -> previous decoder
+
+    decoder is a name from DECODERS ('json', 'orjson') or a callable taking
+    bytes.
+    """
+
+    global _decoder
+
+    previous = _decoder
+
+    if isinstance(decoder, str):
+        if decoder not in DECODERS:
+            raise ValueError('unknown or unavailable decoder: ' + decoder)
+        decoder = DECODERS[decoder]
+
+    _decoder = decoder
+
+    return previous
+
+
+def decode(data):
+    """decode(data) -> parsed JSON of a bytes body"""
+
+    return _decoder(data)
+
+
+def _walk(document, prefix):
+    """_walk(document, prefix) -> iterator of the values under prefix"""
+
+    nodes = [document]
+
+    for key in prefix.split('.') if prefix else []:
+        children = []
+        for node in nodes:
+            if key == 'item' and isinstance(node, list):
+                children.extend(node)
+            elif isinstance(node, dict) and key in node:
+                children.append(node[key])
+        nodes = children
+
+    return iter(nodes)
+
+
+def iter_items(stream, prefix):
+    """iter_items(stream, prefix) -> iterator of the values under prefix"""
+
+    if ijson is not None:
+        return ijson.items(stream, prefix, use_float=True)
+
+    return _walk(decode(stream.read()), prefix)
+
+
+def iter_kvitems(stream, prefix=''):
+    """iter_kvitems(stream, prefix='') -> iterator of (key, value) of the
+    object under prefix"""
+
+    if ijson is not None:
+        return ijson.kvitems(stream, prefix, use_float=True)
+
+    def pairs():
+        for value in _walk(decode(stream.read()), prefix):
+            if isinstance(value, dict):
+                for pair in value.items():
+                    yield pair
+
+    return pairs()
@@ -0,0 +1,370 @@
+""" Declarative endpoint registry for the Bungie.net API module """
+
+import re
+import urllib.parse
+
+from . import api
+from . import scheduler
+
+# Every endpoint the package calls is one Endpoint in ENDPOINTS, keyed by
+# its Bungie.net operation name: the path template below /Platform, the
+# query parameters it takes (and the values sent when they are not given),
+# how long the response cache keeps it, whether it needs an OAuth token and
+# how it pages.  The api.py wrappers and AsyncBungieClient only map their
+# arguments onto it; prepare() builds the URL from the precompiled template
+# for every client, and call() sends it through callBungieAPI() (or
+# callOauthBungieAPI() with a token) of the default api.BungieClient, so the
+# cache, scheduler, single-flight and metrics apply to all of them:
+#
+#   envelope = call('GetProfile', membershipType='2'
+#                   , destinyMembershipId=member_id, components='100,200')
+#   for member in iterate('GetMembersOfGroup', groupId=clan_id):
+#       ...
+#
+# Adding an endpoint is adding a line to ENDPOINTS.  Path values are
+# percent-encoded (already encoded values are left alone); None query values
+# are left out, True is sent as "true".
+
+# ttl of responses that never change
+
+PERMANENT = float('inf')
+
+# an auth of REQUIRED refuses to call without a token; OPTIONAL endpoints
+# return more (private components) with one
+
+OPTIONAL = 'optional'
+REQUIRED = 'required'
+
+# pagination styles: PAGE counts pages from 0 in ?page= and ends on a short
+# or empty page of ?count= items; CURRENT_PAGE counts from 1 in
+# ?currentpage= and ends when hasMore is false
+
+PAGE = 'page'
+CURRENT_PAGE = 'currentpage'
+
+DEFAULT_WORKERS = 16
+
+_PARAMETER = re.compile(r'\{(\w+)\}')
+
+# sub-delimiters stay readable, and % keeps encoded values as they are
+
+_PATH_SAFE = "%:@!$&'()*+,;="
+
+
+def _plain(value):
+    """_plain(value) -> whether value needs no percent-encoding"""
+
+    # ids and membership types; isalnum() and isdigit() alone are also true
+    # for non-ASCII letters and digits, which must be encoded
+
+    return value.isascii() and (value.isalnum()
+                                or value.lstrip('-').isdigit())
+
+
+class Endpoint(object):
+    """Endpoint(name, path, query=(), defaults=None, ttl=None, auth=None
+    , pagination=None, items=None)
+
+    path is relative to /Platform, with {parameter} placeholders; items is
+    the dotted path of the list a paginated Response holds.
+    """
+
+    __slots__ = ('name', 'path', 'query', 'defaults', 'ttl', 'auth'
+                 , 'pagination', 'items', 'parameters', '_parts')
+
+    def __init__(self, name, path, query=(), defaults=None, ttl=None
+                 , auth=None, pagination=None, items=None):
+
+        self.name = name
+        self.path = path
+        self.query = tuple(query)
+        self.defaults = dict(defaults or {})
+        self.ttl = ttl
+        self.auth = auth
+        self.pagination = pagination
+        self.items = tuple(items.split('.')) if items else ()
+
+        # literal, parameter, literal, ... parameter, literal
+
+        self._parts = _PARAMETER.split(path)
+        self.parameters = tuple(self._parts[1::2])
+
+    def __repr__(self):
+        return 'Endpoint(%r, %r)' % (self.name, self.path)
+
+    def method(self, params):
+        """method(params) -> callBungieAPI() method for params"""
+
+        parts = list(self._parts)
+
+        for index in range(1, len(parts), 2):
+            value = params.get(parts[index])
+            if value is None:
+                raise TypeError('%s needs the %r path parameter'
+                                % (self.name, parts[index]))
+            value = str(value)
+            if not _plain(value):
+                value = urllib.parse.quote(value, safe=_PATH_SAFE)
+            parts[index] = value
+
+        query = []
+        for name in self.query:
+            value = params.get(name)
+            if value is None:
+                value = self.defaults.get(name)
+            if value is None:
+                continue
+            if value is True:
+                value = 'true'
+            value = str(value)
+            if not _plain(value):
+                value = urllib.parse.quote(value, safe=',')
+            query.append(name + '=' + value)
+
+        if query:
+            parts.append('?' + '&'.join(query))
+
+        return ''.join(parts)
+
+    def pattern(self):
+        """pattern() -> regular expression matching the endpoint's URLs"""
+
+        return (re.escape('/Platform') + ''.join(
+            re.escape(part) if index % 2 == 0 else '[^/?]+'
+            for index, part in enumerate(self._parts)) + r'(\?|$)')
+
+
+ENDPOINTS = dict((endpoint.name, endpoint) for endpoint in [
+
+    # Destiny 2
+
+    Endpoint('GetProfile'
+             , '/Destiny2/{membershipType}/Profile/{destinyMembershipId}/'
+             , ('components',), ttl=15, auth=OPTIONAL),
+    Endpoint('GetActivityHistory'
+             , '/Destiny2/{membershipType}/Account/{destinyMembershipId}'
+             '/Character/{characterId}/Stats/Activities/'
+             , ('mode', 'count', 'page'), {'mode': 'None'}
+             , pagination=PAGE, items='activities'),
+    Endpoint('GetClanLeaderboards'
+             , '/Destiny2/Stats/Leaderboards/Clans/{groupId}/'
+             , ('modes', 'maxtop', 'statId'), {'maxtop': 5}, ttl=60),
+    Endpoint('SearchDestinyPlayer'
+             , '/Destiny2/SearchDestinyPlayer/{membershipType}'
+             '/{displayName}/', ttl=300),
+    Endpoint('GetMembershipsById'
+             , '/User/GetMembershipsById/{membershipId}/{membershipType}/'
+             , ttl=300),
+    Endpoint('GetMembershipsForCurrentUser'
+             , '/User/GetMembershipsForCurrentUser/', auth=REQUIRED),
+    Endpoint('GetMembersOfGroup', '/GroupV2/{groupId}/Members/'
+             , ('currentpage',), {'currentpage': 1}
+             , pagination=CURRENT_PAGE, items='results'),
+    Endpoint('GetDestinyManifest', '/Destiny2/Manifest/', ttl=3600),
+    Endpoint('GetDestinyEntityDefinition'
+             , '/Destiny2/Manifest/{entityType}/{hashIdentifier}/'
+             , ttl=3600),
+    Endpoint('GetPostGameCarnageReport'
+             , '/Destiny2/Stats/PostGameCarnageReport/{activityId}/'
+             , ('definitions',), ttl=PERMANENT),
+
+    # Destiny 1 era endpoints, called below /Platform/Destiny2 like
+    # call_bungie_api() always did
+
+    Endpoint('GetAccountSummary'
+             , '/Destiny2/{membershipType}/Account/{destinyMembershipId}'
+             '/Summary/', ('definitions',)),
+    Endpoint('GetAccountItems'
+             , '/Destiny2/{membershipType}/Account/{destinyMembershipId}'
+             '/items/', ('definitions',)),
+    Endpoint('GetAdvisors'
+             , '/Destiny2/{membershipType}/Account/{destinyMembershipId}'
+             '/Advisors/', ('definitions',)),
+    Endpoint('GetAdvisorsV2', '/Destiny2/Advisors/V2/', ('definitions',)),
+    Endpoint('GetAdvisorsV2ForCharacter'
+             , '/Destiny2/{membershipType}/Account/{destinyMembershipId}'
+             '/Character/{characterId}/Advisors/V2/', ('definitions',)),
+    Endpoint('GetTriumphs'
+             , '/Destiny2/{membershipType}/Account/{destinyMembershipId}'
+             '/Triumphs/', ('definitions',)),
+    Endpoint('GetCharacter'
+             , '/Destiny2/{membershipType}/Account/{destinyMembershipId}'
+             '/Character/{characterId}/', ('definitions',)),
+    Endpoint('GetCharacterActivities'
+             , '/Destiny2/{membershipType}/Account/{destinyMembershipId}'
+             '/Character/{characterId}/Activities/', ('definitions',)),
+    Endpoint('GetCharacterInventory'
+             , '/Destiny2/{membershipType}/Account/{destinyMembershipId}'
+             '/Character/{characterId}/Inventory/', ('definitions',)),
+    Endpoint('GetCharacterInventorySummary'
+             , '/Destiny2/{membershipType}/Account/{destinyMembershipId}'
+             '/Character/{characterId}/Inventory/Summary/'
+             , ('definitions',)),
+    Endpoint('GetItemDetails'
+             , '/Destiny2/{membershipType}/Account/{destinyMembershipId}'
+             '/Character/{characterId}/Inventory/{itemInstanceId}/'
+             , ('definitions',)),
+    Endpoint('GetNoninstancedItemDetails'
+             , '/Destiny2/{membershipType}/Account/{destinyMembershipId}'
+             '/Character/{characterId}/ItemReference/{itemHash}/'
+             , ('definitions',)),
+    Endpoint('GetCharacterProgression'
+             , '/Destiny2/{membershipType}/Account/{destinyMembershipId}'
+             '/Character/{characterId}/Progression/', ('definitions',)),
+    Endpoint('GetActivityHistoryStats'
+             , '/Destiny2/Stats/ActivityHistory/{membershipType}'
+             '/{destinyMembershipId}/{characterId}/'
+             , ('definitions', 'mode', 'count', 'page'), {'mode': 'None'}
+             , pagination=PAGE, items='data.activities'),
+    Endpoint('GetAggregateActivityStats'
+             , '/Destiny2/Stats/AggregateActivityStats/{membershipType}'
+             '/{destinyMembershipId}/{characterId}/', ('definitions',)),
+    Endpoint('GetCharacterStats'
+             , '/Destiny2/Stats/{membershipType}/{destinyMembershipId}'
+             '/{characterId}/'
+             , ('modes', 'periodType', 'groups', 'monthstart', 'monthend'
+                , 'daystart', 'dayend'), {'modes': 'None'}),
+    Endpoint('GetAccountStats'
+             , '/Destiny2/Stats/Account/{membershipType}'
+             '/{destinyMembershipId}/', ('groups',)),
+    Endpoint('GetUniqueWeaponHistory'
+             , '/Destiny2/Stats/UniqueWeapons/{membershipType}'
+             '/{destinyMembershipId}/{characterId}/', ('definitions',)),
+    Endpoint('GetMembershipIdByDisplayName'
+             , '/Destiny2/{membershipType}/Stats/GetMembershipIdByDisplayName'
+             '/{displayName}/', ttl=300),
+    Endpoint('GetExplorerItems', '/Destiny2/Explorer/Items/'
+             , ('count', 'page'), {'count': 10, 'page': 0}),
+    Endpoint('GetExplorerTalentNodeSteps'
+             , '/Destiny2/Explorer/TalentNodeSteps/'
+             , ('count', 'page'), {'count': 10, 'page': 0}),
+    Endpoint('GetAccountGrimoire'
+             , '/Destiny2/Vanguard/Grimoire/{membershipType}'
+             '/{destinyMembershipId}/', ('definitions', 'flavour')
+             , {'definitions': True, 'flavour': True}),
+    Endpoint('GetGrimoireDefinition', '/Destiny2/Vanguard/Grimoire/Definition/'
+             , ttl=3600),
+])
+
+
+def endpoint(name):
+    """endpoint(name) -> Endpoint, raising KeyError for unknown names"""
+
+    return ENDPOINTS[name]
+
+
+def method(name, **params):
+    """method(name, **params) -> callBungieAPI() method of the call"""
+
+    return ENDPOINTS[name].method(params)
+
+
+def prepare(name, params, token=None):
+    """prepare(name, params, token=None) -> callBungieAPI() method of the call
+
+    The dispatch shared by call(), api.BungieClient.call() and
+    AsyncBungieClient.call(); raises ValueError when an endpoint that needs
+    an OAuth token is called without one.
+    """
+
+    target = ENDPOINTS[name]
+    call_method = target.method(params)
+
+    if api.DEBUG:
+        print("DEBUG: " + name + "(" + call_method + ")")
+
+    if not token and target.auth == REQUIRED:
+        raise ValueError(name + ' needs an OAuth token')
+
+    return call_method
+
+
+def call(name, token=None, fields=None, **params):
+    """call(name, token=None, fields=None, **params) -> envelope
+
+    token is an access token or an oauth.OAuthSession; fields projects the
+    result (see projection.Projection).  Calls go through the default
+    api.BungieClient.
+    """
+
+    return api.get_client().call(name, token=token, fields=fields, **params)
+
+
+def call_many(name, params, workers=DEFAULT_WORKERS, token=None
+              , fields=None):
+    """call_many(name, params, workers=16, token=None, fields=None) ->
+    list of envelopes, in the order of params
+
+    params is a sequence of parameter dicts, called concurrently.
+    """
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    params = list(params)
+
+    if not params:
+        return []
+
+    def call_one(each):
+        return call(name, token=token, fields=fields, **each)
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(params))) \
+            as executor:
+        futures = [scheduler.submit(executor, call_one, each)
+                   for each in params]
+        return [future.result() for future in futures]
+
+
+def page_items(target, envelope):
+    """page_items(target, envelope) -> list of the items of one page,
+    raising on API errors"""
+
+    if envelope.get('ErrorCode', 1) != 1:
+        raise api.BungieAPIError.from_envelope(envelope)
+
+    items = envelope.get('Response') or {}
+    for key in target.items:
+        items = items.get(key) or {}
+
+    return items or []
+
+
+def iterate(name, token=None, **params):
+    """iterate(name, token=None, **params) -> iterator of the items of
+    every page of a paginated endpoint"""
+
+    target = ENDPOINTS[name]
+
+    if target.pagination == CURRENT_PAGE:
+        page = int(params.pop('currentpage', None) or 1)
+        while True:
+            envelope = call(name, token=token, currentpage=page, **params)
+            yield from page_items(target, envelope)
+            if not (envelope.get('Response') or {}).get('hasMore'):
+                return
+            page += 1
+
+    elif target.pagination == PAGE:
+        page = int(params.pop('page', None) or 0)
+        count = params.get('count')
+        while True:
+            items = page_items(target, call(name, token=token, page=page
+                                            , **params))
+            yield from items
+            if not items or (count is not None and len(items) < int(count)):
+                return
+            page += 1
+
+    else:
+        raise ValueError(name + ' is not paginated')
+
+
+def cache_policies():
+    """cache_policies() -> cache.ResponseCache policies of the endpoints
+    with a ttl"""
+
+    from . import cache
+
+    return [(target.pattern(), cache.FOREVER if target.ttl == PERMANENT
+             else target.ttl)
+            for target in ENDPOINTS.values() if target.ttl is not None]
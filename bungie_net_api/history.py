@@ -0,0 +1,246 @@
+""" Incremental activity history sync for the Bungie.net API module """
+
+import json
+import sqlite3
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from . import decoders
+from . import pagination
+from . import pgcr
+from . import scheduler
+
+# Re-paging a character's whole activity history every night costs one
+# request per 250 activities, almost all of them already known.  HistoryStore
+# keeps the activities seen so far in SQLite together with a high-water mark,
+# the newest activity's instanceId and period, per (membership, character,
+# mode).  sync_history() pages from the newest activity only until it reaches
+# that mark, in small pages, and stores what is new:
+#
+#   store = HistoryStore('history.sqlite3')
+#   new_ids = sync_history(store, member_id, '2', character_id, mode='5'
+#                          , pgcr_store=PGCRStore('pgcr.sqlite3'))
+#
+# The mark moves only once every new activity is committed, so an
+# interrupted sync is simply repeated; activities are stored idempotently.
+# sync_characters() runs many characters through a small thread pool.  The
+# workers share the store's connection, so sync_history() writes each batch
+# of commit_every activities in one transaction under the store's lock; a
+# worker never commits (or leaves open) another worker's writes.
+
+DEFAULT_WORKERS = 4
+DEFAULT_COMMIT_EVERY = 500
+
+# page size once a mark exists: a nightly sync usually finds a handful of
+# new activities, all on the first small page.
+
+INCREMENTAL_PAGE_SIZE = 25
+
+
+def _mode_key(mode):
+    """_mode_key(mode) -> the mode as stored, 'None' for all modes"""
+
+    return str(mode)
+
+
+class HistoryStore(object):
+    """HistoryStore(path)"""
+
+    def __init__(self, path):
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS marks (
+                membership_id TEXT NOT NULL,
+                character_id TEXT NOT NULL,
+                mode TEXT NOT NULL,
+                instance_id INTEGER NOT NULL,
+                period TEXT NOT NULL,
+                PRIMARY KEY (membership_id, character_id, mode))
+                WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS activities (
+                character_id TEXT NOT NULL,
+                instance_id INTEGER NOT NULL,
+                membership_id TEXT NOT NULL,
+                period TEXT NOT NULL,
+                activity BLOB NOT NULL,
+                PRIMARY KEY (character_id, instance_id));""")
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM activities").fetchone()[0]
+
+    def mark(self, membership_id, character_id, mode=None):
+        """mark(membership_id, character_id, mode=None) -> (instance_id,
+        period) of the newest synced activity, or None"""
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT instance_id, period FROM marks WHERE membership_id = ?"
+                " AND character_id = ? AND mode = ?"
+                , (str(membership_id), str(character_id), _mode_key(mode))
+            ).fetchone()
+
+        return tuple(row) if row is not None else None
+
+    def set_mark(self, membership_id, character_id, mode, instance_id, period
+                 , commit=True):
+        """set_mark(membership_id, character_id, mode, instance_id, period
+        , commit=True)"""
+
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO marks"
+                             " VALUES (?, ?, ?, ?, ?)"
+                             , (str(membership_id), str(character_id)
+                                , _mode_key(mode), int(instance_id), period))
+            if commit:
+                self._db.commit()
+
+    def put(self, membership_id, character_id, activity, commit=True):
+        """put(membership_id, character_id, activity, commit=True)"""
+
+        row = _row(membership_id, character_id, activity)
+
+        with self._lock:
+            self._db.execute("INSERT OR IGNORE INTO activities"
+                             " VALUES (?, ?, ?, ?, ?)", row)
+            if commit:
+                self._db.commit()
+
+    def _put_rows(self, rows):
+        """_put_rows(rows)
+
+        Stores rows made by _row() in one transaction of their own.
+        """
+
+        with self._lock:
+            with self._db:
+                self._db.executemany("INSERT OR IGNORE INTO activities"
+                                     " VALUES (?, ?, ?, ?, ?)", rows)
+
+    def commit(self):
+        """commit()"""
+
+        with self._lock:
+            self._db.commit()
+
+    def activities(self, character_id, since=None):
+        """activities(character_id, since=None) -> iterator of activities,
+        newest first, optionally only those at or after period since"""
+
+        query = "SELECT activity FROM activities WHERE character_id = ?"
+        parameters = [str(character_id)]
+
+        if since is not None:
+            query += " AND period >= ?"
+            parameters.append(since)
+
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY period DESC"
+                                    , parameters).fetchall()
+
+        return (decoders.decode(zlib.decompress(row[0])) for row in rows)
+
+    def close(self):
+        """close()"""
+
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+
+
+def _row(membership_id, character_id, activity):
+    """_row(membership_id, character_id, activity) -> activities row"""
+
+    return (str(character_id), int(activity['activityDetails']['instanceId'])
+            , str(membership_id), activity['period']
+            , zlib.compress(json.dumps(activity, separators=(',', ':'))
+                            .encode('utf-8')))
+
+
+def sync_history(store, destiny_membership_id=None, membership_type=None
+                 , character_id=None, mode=None, pgcr_store=None
+                 , commit_every=DEFAULT_COMMIT_EVERY):
+    """sync_history(store, destiny_membership_id, membership_type
+    , character_id, mode=None, pgcr_store=None) -> list of new activity ids
+
+    With pgcr_store the reports of the new activities are fetched into it
+    as well (see pgcr.fetch_pgcrs()).
+    """
+
+    mark = store.mark(destiny_membership_id, character_id, mode)
+
+    if mark is None:
+        mark_id, until = None, None
+        count, prefetch = pagination.MAX_PAGE_SIZE, True
+    else:
+        mark_id, until = mark
+        count, prefetch = INCREMENTAL_PAGE_SIZE, False
+
+    activities = pagination.iter_activity_history(
+        destiny_membership_id, membership_type, character_id, mode=mode
+        , count=count, until=until, prefetch=prefetch)
+
+    new_ids = []
+    newest = None
+    batch = []
+
+    try:
+        for activity in activities:
+            instance_id = int(activity['activityDetails']['instanceId'])
+            if instance_id == mark_id:
+                break
+            if newest is None:
+                newest = (instance_id, activity['period'])
+            batch.append(_row(destiny_membership_id, character_id
+                              , activity))
+            new_ids.append(instance_id)
+            if len(batch) == commit_every:
+                store._put_rows(batch)
+                batch = []
+    finally:
+        activities.close()
+
+    if newest is not None:
+        store._put_rows(batch)
+        store.set_mark(destiny_membership_id, character_id, mode, *newest)
+
+    if pgcr_store is not None and new_ids:
+        for _ in pgcr.fetch_pgcrs(new_ids, pgcr_store, skip_errors=True):
+            pass
+
+    return new_ids
+
+
+def sync_characters(store, characters, mode=None, pgcr_store=None
+                    , workers=DEFAULT_WORKERS):
+    """sync_characters(store, characters, mode=None, pgcr_store=None
+    , workers=4) -> {character_id: list of new activity ids}
+
+    characters is an iterable of (destiny_membership_id, membership_type,
+    character_id).  Reports of the new activities are fetched once all
+    characters are synced, so shared activities are fetched only once.
+    """
+
+    def sync(character):
+        membership_id, membership_type, character_id = character
+        return character_id, sync_history(store, membership_id
+                                          , membership_type, character_id
+                                          , mode=mode)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [scheduler.submit(executor, sync, character)
+                   for character in characters]
+        synced = dict(future.result() for future in futures)
+
+    if pgcr_store is not None:
+        for _ in pgcr.fetch_pgcrs((instance_id for new_ids in synced.values()
+                                   for instance_id in new_ids)
+                                  , pgcr_store, skip_errors=True):
+            pass
+
+    return synced
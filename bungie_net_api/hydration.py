@@ -0,0 +1,218 @@
+""" Definition hydration for the Bungie.net API module """
+
+from concurrent.futures import ThreadPoolExecutor
+
+from . import api
+from . import scheduler
+from .manifest import normalize_hash
+
+# Responses refer to items, stats, perks, buckets, ... only by definition
+# hash, and rendering an inventory one get_item_by_hash() call at a time
+# costs hundreds of sequential round-trips.  hydrate() walks a response once,
+# collects every distinct hash per entity type and resolves the whole set in
+# one pass: from the local manifest (api.use_manifest()) where possible, the
+# rest through concurrent get_manifest_item() calls, each hash fetched once.
+# The definitions are attached next to the data, the way the old
+# ?definitions=true parameter did:
+#
+#   profile = hydrate(api.getProfile(member_id, '2', 'CharacterEquipment'))
+#   response = profile['Response']
+#   items = response['definitions']['DestinyInventoryItemDefinition']
+#   for equipment in response['characterEquipment']['data'].values():
+#       for item in equipment['items']:
+#           print(items[item['itemHash']]['displayProperties']['name'])
+#
+# The definitions are keyed by the unsigned int hash.  A document that was
+# hydrated before is walked without its definitions.
+
+DEFAULT_WORKERS = 16
+
+# field name: entity type of the hash (or list of hashes) it holds
+
+HASH_FIELDS = {
+    'itemHash': 'DestinyInventoryItemDefinition',
+    'plugHash': 'DestinyInventoryItemDefinition',
+    'plugItemHash': 'DestinyInventoryItemDefinition',
+    'emblemHash': 'DestinyInventoryItemDefinition',
+    'statHash': 'DestinyStatDefinition',
+    'perkHash': 'DestinySandboxPerkDefinition',
+    'bucketHash': 'DestinyInventoryBucketDefinition',
+    'bucketTypeHash': 'DestinyInventoryBucketDefinition',
+    'classHash': 'DestinyClassDefinition',
+    'raceHash': 'DestinyRaceDefinition',
+    'genderHash': 'DestinyGenderDefinition',
+    'damageTypeHash': 'DestinyDamageTypeDefinition',
+    'progressionHash': 'DestinyProgressionDefinition',
+    'objectiveHash': 'DestinyObjectiveDefinition',
+    'recordHash': 'DestinyRecordDefinition',
+    'collectibleHash': 'DestinyCollectibleDefinition',
+    'activityHash': 'DestinyActivityDefinition',
+    'directorActivityHash': 'DestinyActivityDefinition',
+    'activityModeHash': 'DestinyActivityModeDefinition',
+    'seasonHash': 'DestinySeasonDefinition',
+    'seasonHashes': 'DestinySeasonDefinition',
+    'itemCategoryHashes': 'DestinyItemCategoryDefinition',
+}
+
+
+def collect_hashes(document, fields=HASH_FIELDS):
+    """collect_hashes(document, fields=HASH_FIELDS) -> {entity type: set of
+    hashes}"""
+
+    hashes = {}
+    stack = [document]
+
+    while stack:
+        node = stack.pop()
+
+        if isinstance(node, dict):
+            for key, value in node.items():
+                entity_type = fields.get(key)
+                if entity_type is None:
+                    if key != 'definitions' and isinstance(value
+                                                           , (dict, list)):
+                        stack.append(value)
+                    continue
+                values = value if isinstance(value, list) else (value,)
+                for hash_identifier in values:
+                    # 0 (and missing values) mean "none"
+                    if hash_identifier:
+                        hashes.setdefault(entity_type, set()).add(
+                            normalize_hash(hash_identifier))
+        elif isinstance(node, list):
+            stack.extend(node)
+
+    return hashes
+
+
+def _fetch_definition(entity_type, hash_identifier):
+    """_fetch_definition(entity_type, hash_identifier) -> definition or
+    None"""
+
+    envelope = api.get_manifest_item(entity_type, str(hash_identifier))
+
+    if envelope.get('ErrorCode', 1) != 1:
+        return None
+
+    return envelope.get('Response')
+
+
+def _local(manifest, hashes):
+    """_local(manifest, hashes) -> (definitions, {entity type: missing
+    hashes})"""
+
+    definitions = {}
+    missing = {}
+
+    for entity_type, wanted in hashes.items():
+        found = definitions.setdefault(entity_type, {})
+        for hash_identifier in wanted:
+            definition = None
+            if manifest is not None:
+                definition = manifest.get(entity_type, hash_identifier)
+            if definition is None:
+                missing.setdefault(entity_type, []).append(hash_identifier)
+            else:
+                found[hash_identifier] = definition
+
+    return definitions, missing
+
+
+def resolve(hashes, manifest=None, workers=DEFAULT_WORKERS):
+    """resolve(hashes, manifest=None, workers=16) -> {entity type: {hash:
+    definition}}
+
+    hashes is a collect_hashes() result; manifest defaults to the one
+    installed with api.use_manifest().  Hashes that resolve to nothing are
+    left out.
+    """
+
+    if manifest is None:
+        manifest = api.LOCAL_MANIFEST
+
+    definitions, missing = _local(manifest, hashes)
+
+    wanted = [(entity_type, hash_identifier)
+              for entity_type, hash_identifiers in missing.items()
+              for hash_identifier in hash_identifiers]
+
+    if wanted:
+        if api.DEBUG:
+            print("DEBUG: resolve() fetching", len(wanted), "definitions")
+        with ThreadPoolExecutor(max_workers=min(workers, len(wanted))) \
+                as executor:
+            fetched = [scheduler.submit(executor, _fetch_definition, *key)
+                       for key in wanted]
+            for (entity_type, hash_identifier), future in zip(wanted
+                                                             , fetched):
+                definition = future.result()
+                if definition is not None:
+                    definitions[entity_type][hash_identifier] = definition
+
+    return definitions
+
+
+async def resolve_async(hashes, client, manifest=None):
+    """resolve_async(hashes, client, manifest=None) -> like resolve(),
+    fetching through an AsyncBungieClient"""
+
+    import asyncio
+
+    if manifest is None:
+        manifest = api.LOCAL_MANIFEST
+
+    definitions, missing = _local(manifest, hashes)
+
+    wanted = [(entity_type, hash_identifier)
+              for entity_type, hash_identifiers in missing.items()
+              for hash_identifier in hash_identifiers]
+
+    envelopes = await asyncio.gather(*[
+        client.get_manifest_item(entity_type, str(hash_identifier))
+        for entity_type, hash_identifier in wanted])
+
+    for (entity_type, hash_identifier), envelope in zip(wanted, envelopes):
+        if envelope.get('ErrorCode', 1) == 1 and envelope.get('Response'):
+            definitions[entity_type][hash_identifier] = envelope['Response']
+
+    return definitions
+
+
+def _attach(document, definitions):
+    """_attach(document, definitions) -> shallow copy of document with
+    definitions"""
+
+    # envelopes carry them in their Response, like ?definitions=true.  The
+    # document can be the shared result of a coalesced call or a cache hit,
+    # so only copies of the two dicts on the way are changed.
+
+    document = dict(document)
+    target = document
+    if isinstance(document.get('Response'), dict):
+        target = document['Response'] = dict(document['Response'])
+
+    target['definitions'] = definitions
+
+    return document
+
+
+def hydrate(document, manifest=None, fields=HASH_FIELDS
+            , workers=DEFAULT_WORKERS):
+    """hydrate(document, manifest=None, fields=HASH_FIELDS, workers=16)
+    -> document, with ['definitions'] (or ['Response']['definitions'])
+    holding every definition it refers to
+
+    The document is not changed: a shallow copy of it (and of its Response)
+    carries the definitions.
+    """
+
+    return _attach(document, resolve(collect_hashes(document, fields)
+                                     , manifest, workers))
+
+
+async def hydrate_async(document, client, manifest=None, fields=HASH_FIELDS):
+    """hydrate_async(document, client, manifest=None, fields=HASH_FIELDS)
+    -> like hydrate(), fetching through an AsyncBungieClient"""
+
+    return _attach(document, await resolve_async(
+        collect_hashes(document, fields), client, manifest))
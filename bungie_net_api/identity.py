@@ -0,0 +1,406 @@
+""" Player identity resolution cache for the Bungie.net API module """
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from . import api
+from . import scheduler
+from . import singleflight
+
+# Display names and membership ids map to each other for years, yet a bot
+# looks them up with searchDestinyPlayer() / getMembershipsById() on every
+# command.  IdentityResolver answers from a bounded LRU, backed by an
+# optional SQLite file that survives restarts, and remembers names and ids
+# that do not exist (for a shorter negative_ttl) so typos and deleted
+# accounts do not cost a request each time either:
+#
+#   resolver = IdentityResolver('/var/cache/identities.sqlite3')
+#   cards = resolver.search('Guardian#1234')      # [] for nobody
+#   found = resolver.search_many(names)           # {name: cards}
+#
+# Once an entry is past its ttl it is still answered from, while a
+# background refresh replaces it, so only names never seen before wait for
+# the network.  Lookups of the same name share one request, within a batch
+# and across threads; a batch resolves its misses concurrently.
+
+DEFAULT_MAX_ENTRIES = 16384
+DEFAULT_TTL = 24 * 3600
+DEFAULT_NEGATIVE_TTL = 600
+DEFAULT_WORKERS = 16
+
+# BungieMembershipType.All
+
+ALL = '-1'
+
+# ErrorStatus of envelopes saying the player or account does not exist
+
+NOT_FOUND_STATUSES = frozenset(['UserCannotResolveCentralAccount'
+                                , 'UserCannotFindRequestedUser'
+                                , 'DestinyAccountNotFound'])
+
+
+def normalize_name(display_name):
+    """normalize_name(display_name) -> cache key of a display name
+
+    Bungie names match regardless of case.
+    """
+
+    return ' '.join(display_name.split()).casefold()
+
+
+def _key(kind, membership_type, value):
+    """_key(kind, membership_type, value) -> cache key"""
+
+    return kind + '/' + membership_type + '/' + value
+
+
+class IdentityEntry(object):
+    """IdentityEntry(value, expires)
+
+    value is None for a player or account that does not exist.
+    """
+
+    __slots__ = ('value', 'expires')
+
+    def __init__(self, value, expires):
+        self.value = value
+        self.expires = expires
+
+    def fresh(self, now):
+        """fresh(now)"""
+
+        return now < self.expires
+
+
+class IdentityResolver(object):
+    """IdentityResolver(path=None, max_entries=16384, ttl=86400
+    , negative_ttl=600, workers=16, serve_stale=True)
+
+    path is an optional SQLite file for the persistent tier.  Without
+    serve_stale, expired entries are fetched again before answering.
+    """
+
+    def __init__(self, path=None, max_entries=DEFAULT_MAX_ENTRIES
+                 , ttl=DEFAULT_TTL, negative_ttl=DEFAULT_NEGATIVE_TTL
+                 , workers=DEFAULT_WORKERS, serve_stale=True):
+
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.workers = workers
+        self.serve_stale = serve_stale
+
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.stale_hits = 0
+        self.evictions = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._flight = singleflight.SingleFlight()
+        self._refreshing = set()
+        self._executor = None
+        self._db = None
+
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            # a cache: losing the newest entries to a power cut is fine,
+            # waiting for a sync on every insert is not
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS identities (
+                    key TEXT PRIMARY KEY,
+                    value TEXT,
+                    expires REAL NOT NULL)""")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """close()"""
+
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+                self._db = None
+
+    def stats(self):
+        """stats() -> dict of counters"""
+
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses
+                    , 'negative_hits': self.negative_hits
+                    , 'stale_hits': self.stale_hits
+                    , 'evictions': self.evictions
+                    , 'entries': len(self._entries)}
+
+    def _pool(self):
+        """_pool() -> the thread pool, started on first use"""
+
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    from concurrent.futures import ThreadPoolExecutor
+
+                    self._executor = ThreadPoolExecutor(
+                        self.workers, thread_name_prefix='identity')
+
+        return self._executor
+
+    def _get(self, key):
+        """_get(key) -> IdentityEntry or None"""
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+            if self._db is None:
+                return None
+
+            row = self._db.execute("SELECT value, expires FROM identities"
+                                   " WHERE key = ?", (key,)).fetchone()
+
+        if row is None:
+            return None
+
+        entry = IdentityEntry(None if row[0] is None else json.loads(row[0])
+                              , row[1])
+        self._remember(key, entry)
+
+        return entry
+
+    def _put(self, key, value):
+        """_put(key, value) -> value, remembered for ttl (or negative_ttl
+        when None)"""
+
+        entry = IdentityEntry(value, time.time() + (
+            self.negative_ttl if value is None else self.ttl))
+        self._remember(key, entry)
+
+        if self._db is not None:
+            with self._lock:
+                if self._db is not None:
+                    with self._db:
+                        self._db.execute(
+                            "INSERT OR REPLACE INTO identities"
+                            " VALUES (?, ?, ?)"
+                            , (key, None if value is None
+                               else json.dumps(value), entry.expires))
+
+        return value
+
+    def _remember(self, key, entry):
+        """_remember(key, entry)"""
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _fill(self, key, fetch, *args):
+        """_fill(key, fetch, *args) -> fetch(*args), remembered"""
+
+        return self._put(key, fetch(*args))
+
+    def _lookup(self, key, fetch, *args):
+        """_lookup(key, fetch, *args) -> value, from the cache or fetch(*args)
+        """
+
+        entry = self._get(key)
+        now = time.time()
+
+        if entry is not None and (entry.fresh(now) or self.serve_stale):
+            with self._lock:
+                self.hits += 1
+                if entry.value is None:
+                    self.negative_hits += 1
+                if not entry.fresh(now):
+                    self.stale_hits += 1
+            if not entry.fresh(now):
+                self._refresh_later(key, fetch, *args)
+            return entry.value
+
+        with self._lock:
+            self.misses += 1
+
+        return self._flight.do(key, self._fill, key, fetch, *args)
+
+    def _refresh_later(self, key, fetch, *args):
+        """_refresh_later(key, fetch, *args)
+
+        Fetches a stale entry again in the background, once at a time.
+        """
+
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                with scheduler.background():
+                    self._flight.do(key, self._fill, key, fetch, *args)
+            except Exception as error:
+                # the stale entry keeps serving until a refresh succeeds
+                if api.DEBUG:
+                    print("DEBUG: IdentityResolver refresh of", key
+                          , "failed:", error)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._pool().submit(refresh)
+
+    def _many(self, requests, skip_errors):
+        """_many(requests, skip_errors) -> {name: value}
+
+        requests are (name, key, fetch, args); names sharing a key share
+        one lookup, and lookups that miss run concurrently.
+        """
+
+        by_key = OrderedDict()
+        for name, key, fetch, args in requests:
+            by_key.setdefault(key, (fetch, args, []))[2].append(name)
+
+        results = {}
+        pending = []
+
+        for key, (fetch, args, names) in by_key.items():
+            entry = self._get(key)
+            if entry is not None and (entry.fresh(time.time())
+                                      or self.serve_stale):
+                value = self._lookup(key, fetch, *args)
+                results.update((name, value) for name in names)
+            else:
+                pending.append((names, scheduler.submit(
+                    self._pool(), self._lookup, key, fetch, *args)))
+
+        for names, future in pending:
+            try:
+                value = future.result()
+            except Exception:
+                if not skip_errors:
+                    raise
+                continue
+            results.update((name, value) for name in names)
+
+        return results
+
+    def search(self, display_name, membership_type=ALL):
+        """search(display_name, membership_type='-1') -> list of user info
+        cards, [] when no player has that name"""
+
+        membership_type = str(membership_type)
+
+        return self._lookup(_key('search', membership_type
+                                 , normalize_name(display_name))
+                            , _search, display_name, membership_type) or []
+
+    def search_many(self, display_names, membership_type=ALL
+                    , skip_errors=False):
+        """search_many(display_names, membership_type='-1'
+        , skip_errors=False) -> {display name: list of user info cards}
+
+        A failed lookup raises, or is left out with skip_errors.
+        """
+
+        membership_type = str(membership_type)
+
+        results = self._many([(name, _key('search', membership_type
+                                          , normalize_name(name))
+                               , _search, (name, membership_type))
+                              for name in display_names], skip_errors)
+
+        return dict((name, cards or []) for name, cards in results.items())
+
+    def memberships(self, membership_id, membership_type=ALL):
+        """memberships(membership_id, membership_type='-1') ->
+        getMembershipsById() Response, None when there is no such account"""
+
+        membership_id = str(membership_id)
+        membership_type = str(membership_type)
+
+        return self._lookup(_key('memberships', membership_type
+                                 , membership_id)
+                            , _memberships, membership_id, membership_type)
+
+    def memberships_many(self, membership_ids, membership_type=ALL
+                         , skip_errors=False):
+        """memberships_many(membership_ids, membership_type='-1'
+        , skip_errors=False) -> {membership id: Response or None}"""
+
+        membership_type = str(membership_type)
+
+        return self._many([(str(membership_id)
+                            , _key('memberships', membership_type
+                                   , str(membership_id))
+                            , _memberships
+                            , (str(membership_id), membership_type))
+                           for membership_id in membership_ids]
+                          , skip_errors)
+
+    def forget(self, display_name=None, membership_id=None
+               , membership_type=ALL):
+        """forget(display_name=None, membership_id=None, membership_type='-1')
+
+        Drops the entries of a name or id, e.g. after a rename.
+        """
+
+        keys = []
+        if display_name is not None:
+            keys.append(_key('search', str(membership_type)
+                             , normalize_name(display_name)))
+        if membership_id is not None:
+            keys.append(_key('memberships', str(membership_type)
+                             , str(membership_id)))
+
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+                if self._db is not None:
+                    with self._db:
+                        self._db.execute("DELETE FROM identities"
+                                         " WHERE key = ?", (key,))
+
+
+def _response(envelope):
+    """_response(envelope) -> Response, or None for a player that does not
+    exist"""
+
+    if envelope.get('ErrorCode', 1) == 1:
+        return envelope.get('Response') or None
+
+    if envelope.get('ErrorStatus') in NOT_FOUND_STATUSES:
+        return None
+
+    raise api.BungieAPIError.from_envelope(envelope)
+
+
+def _search(display_name, membership_type):
+    """_search(display_name, membership_type) -> user info cards or None"""
+
+    return _response(api.searchDestinyPlayer(display_name, membership_type))
+
+
+def _memberships(membership_id, membership_type):
+    """_memberships(membership_id, membership_type) -> Response or None"""
+
+    return _response(api.getMembershipsById(membership_id, membership_type))
@@ -0,0 +1,432 @@
+""" Request instrumentation and metrics for the Bungie.net API module """
+
+import bisect
+import threading
+import time
+import urllib.error
+import urllib.parse
+
+from .scheduler import THROTTLE_ERROR_CODES
+
+# Every HTTP attempt made for an API call (retries included, cache hits
+# excluded) can be observed through hooks.  add_hook() registers an on_start
+# and/or on_end callback; both receive a RequestEvent, which on_end sees
+# completed with the status, the Bungie ErrorCode and ThrottleSeconds, the
+# bytes received and the time spent in each phase:
+#
+#   dns, connect, tls  only when a new connection was opened
+#   first_byte         from sending the request to its response headers
+#   read               reading the body
+#   decode             parsing the JSON (or projecting it)
+#
+# MetricsRegistry is such a hook, keeping per-endpoint histograms and
+# counters that to_prometheus() renders in the Prometheus text format:
+#
+#   registry = MetricsRegistry()
+#   api.use_metrics(registry)
+#   ...
+#   print(registry.to_prometheus())
+#
+# With no hooks registered nothing is recorded beyond the transport's own
+# timestamps.
+
+PHASES = ('dns', 'connect', 'tls', 'first_byte', 'read', 'decode')
+
+# Prometheus' default buckets, in seconds
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0
+                   , 10.0)
+
+_hooks = []
+_hooks_lock = threading.Lock()
+
+# {segment count: path templates of endpoints.ENDPOINTS}, built on first use
+
+_templates = None
+
+
+def _path_templates():
+    """_path_templates() -> {segment count: list of tuples of path segments,
+    None for a path parameter}
+
+    Templates with fewer parameters come first, so Inventory/Summary/ is not
+    taken for Inventory/{itemInstanceId}/.
+    """
+
+    global _templates
+
+    if _templates is None:
+        from . import endpoints
+
+        templates = {}
+        for target in endpoints.ENDPOINTS.values():
+            segments = tuple(None if segment.startswith('{') else segment
+                             for segment in ('/Platform' + target.path)
+                             .split('/'))
+            templates.setdefault(len(segments), []).append(segments)
+
+        for candidates in templates.values():
+            candidates.sort(key=lambda segments: segments.count(None))
+
+        _templates = templates
+
+    return _templates
+
+
+def _masked(part):
+    """_masked(part) -> {id} or {name}"""
+
+    return '{id}' if part.lstrip('-').isdigit() else '{name}'
+
+
+def endpoint_name(url):
+    """endpoint_name(url) -> the URL path with ids replaced by {id}
+
+    e.g. /Platform/Destiny2/{id}/Profile/{id}/ for any profile request.
+    Every path parameter of a registered endpoint is masked, so display
+    names (as {name}) never become label values.
+    """
+
+    parts = urllib.parse.urlsplit(url).path.split('/')
+
+    for segments in _path_templates().get(len(parts), ()):
+        if all(segment is None or segment == part
+               for segment, part in zip(segments, parts)):
+            return '/'.join(part if segment is not None else _masked(part)
+                            for segment, part in zip(segments, parts))
+
+    # not a registered endpoint: mask what looks like an id
+
+    return '/'.join('{id}' if part.lstrip('-').isdigit() else part
+                    for part in parts)
+
+
+class RequestEvent(object):
+    """RequestEvent(url, method='GET')"""
+
+    __slots__ = ('url', 'method', 'started', 'duration', 'status'
+                 , 'error_code', 'throttle_seconds', 'bytes_received'
+                 , 'timings', 'error', '_clock')
+
+    def __init__(self, url, method='GET'):
+        self.url = url
+        self.method = method
+        self.started = time.time()
+        self.duration = None
+        self.status = None
+        self.error_code = None
+        self.throttle_seconds = None
+        self.bytes_received = None
+        self.timings = {}
+        self.error = None
+        self._clock = time.perf_counter()
+
+    @property
+    def endpoint(self):
+        """the endpoint_name() of the url"""
+
+        return endpoint_name(self.url)
+
+    @property
+    def throttled(self):
+        """whether the server asked the client to slow down"""
+
+        return (self.status == 429 or bool(self.throttle_seconds)
+                or self.error_code in THROTTLE_ERROR_CODES)
+
+    def __repr__(self):
+        return 'RequestEvent(%r, status=%r, error_code=%r, duration=%r)' % (
+            self.url, self.status, self.error_code, self.duration)
+
+
+def add_hook(on_start=None, on_end=None):
+    """add_hook(on_start=None, on_end=None) -> hook for remove_hook()"""
+
+    hook = (on_start, on_end)
+
+    with _hooks_lock:
+        _hooks.append(hook)
+
+    return hook
+
+
+def remove_hook(hook):
+    """remove_hook(hook)"""
+
+    with _hooks_lock:
+        if hook in _hooks:
+            _hooks.remove(hook)
+
+
+def _call(callback, event):
+    """_call(callback, event)"""
+
+    # a failing hook must not fail the request it observes
+
+    try:
+        callback(event)
+    except Exception as error:
+        from . import api
+        if api.DEBUG:
+            print("DEBUG: instrumentation hook failed:", repr(error))
+
+
+def start(url, method='GET'):
+    """start(url, method='GET') -> RequestEvent, or None without hooks"""
+
+    if not _hooks:
+        return None
+
+    event = RequestEvent(url, method)
+
+    for on_start, _ in list(_hooks):
+        if on_start is not None:
+            _call(on_start, event)
+
+    return event
+
+
+def timed_decode(event, decode, *args):
+    """timed_decode(event, decode, *args) -> decode(*args), timed into
+    event"""
+
+    if event is None:
+        return decode(*args)
+
+    decode_start = time.perf_counter()
+    try:
+        return decode(*args)
+    finally:
+        event.timings['decode'] = time.perf_counter() - decode_start
+
+
+def finish(event, response=None, envelope=None, error=None):
+    """finish(event, response=None, envelope=None, error=None)"""
+
+    if event is None:
+        return
+
+    event.duration = time.perf_counter() - event._clock
+
+    if response is not None:
+        event.status = response.status
+        event.bytes_received = response.size
+        event.timings.update(response.timings or ())
+    elif isinstance(error, urllib.error.HTTPError):
+        event.status = error.code
+
+    if isinstance(envelope, dict):
+        event.error_code = envelope.get('ErrorCode')
+        event.throttle_seconds = envelope.get('ThrottleSeconds')
+
+    event.error = error
+
+    for _, on_end in list(_hooks):
+        if on_end is not None:
+            _call(on_end, event)
+
+
+class Histogram(object):
+    """Histogram(buckets=DEFAULT_BUCKETS)"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """observe(value)"""
+
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """cumulative() -> [(upper bound, count)], ending with +Inf"""
+
+        total = 0
+        result = []
+
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+
+        return result
+
+    def quantile(self, q):
+        """quantile(q) -> upper bound of the bucket holding quantile q"""
+
+        if not self.count:
+            return None
+
+        for bound, total in self.cumulative():
+            if total >= q * self.count:
+                return bound
+
+
+def _labels(pairs):
+    """_labels(pairs) -> Prometheus label set"""
+
+    return '{' + ','.join('%s="%s"' % (name, str(value).replace('\\', '\\\\')
+                                       .replace('"', '\\"')
+                                       .replace('\n', '\\n'))
+                          for name, value in pairs) + '}'
+
+
+def _number(value):
+    """_number(value) -> Prometheus sample value"""
+
+    if value == float('inf'):
+        return '+Inf'
+
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry(object):
+    """MetricsRegistry(buckets=DEFAULT_BUCKETS, prefix='bungie_net_api')
+
+    In-process request metrics, fed by observe() as an on_end hook.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, prefix='bungie_net_api'):
+        self.buckets = tuple(buckets)
+        self.prefix = prefix
+
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """reset()"""
+
+        with self._lock:
+            self._durations = {}
+            self._phases = {}
+            self._requests = {}
+            self._throttled = {}
+            self._bytes = {}
+            self._errors = {}
+
+    def _histogram(self, table, key):
+        """_histogram(table, key) -> Histogram, created on first use"""
+
+        histogram = table.get(key)
+
+        if histogram is None:
+            histogram = table[key] = Histogram(self.buckets)
+
+        return histogram
+
+    def observe(self, event):
+        """observe(event)"""
+
+        endpoint = event.endpoint
+
+        with self._lock:
+            self._histogram(self._durations, endpoint).observe(event.duration)
+
+            for phase in PHASES:
+                seconds = event.timings.get(phase)
+                if seconds is not None:
+                    self._histogram(self._phases, (endpoint, phase)).observe(
+                        seconds)
+
+            key = (endpoint, event.status, event.error_code)
+            self._requests[key] = self._requests.get(key, 0) + 1
+
+            if event.throttled:
+                self._throttled[endpoint] = self._throttled.get(endpoint
+                                                                , 0) + 1
+
+            if event.bytes_received:
+                self._bytes[endpoint] = (self._bytes.get(endpoint, 0)
+                                         + event.bytes_received)
+
+            if event.error is not None:
+                key = (endpoint, type(event.error).__name__)
+                self._errors[key] = self._errors.get(key, 0) + 1
+
+    def histogram(self, endpoint, phase=None):
+        """histogram(endpoint, phase=None) -> Histogram of request durations,
+        or of one phase, or None"""
+
+        with self._lock:
+            if phase is None:
+                return self._durations.get(endpoint)
+            return self._phases.get((endpoint, phase))
+
+    def endpoints(self):
+        """endpoints() -> the endpoints observed so far"""
+
+        with self._lock:
+            return sorted(self._durations)
+
+    def to_prometheus(self):
+        """to_prometheus() -> metrics in the Prometheus text format"""
+
+        lines = []
+        prefix = self.prefix
+
+        def header(name, kind, help_text):
+            lines.append('# HELP %s_%s %s' % (prefix, name, help_text))
+            lines.append('# TYPE %s_%s %s' % (prefix, name, kind))
+
+        def histogram(name, labels, values):
+            for bound, total in values.cumulative():
+                lines.append('%s_%s_bucket%s %d' % (
+                    prefix, name, _labels(labels + [('le', _number(bound))])
+                    , total))
+            lines.append('%s_%s_sum%s %s' % (prefix, name, _labels(labels)
+                                             , _number(values.sum)))
+            lines.append('%s_%s_count%s %d' % (prefix, name, _labels(labels)
+                                               , values.count))
+
+        def counter(name, labels, value):
+            lines.append('%s_%s%s %d' % (prefix, name, _labels(labels), value))
+
+        with self._lock:
+            header('request_duration_seconds', 'histogram'
+                   , 'Time per HTTP request, from send to decoded body.')
+            for endpoint, values in sorted(self._durations.items()):
+                histogram('request_duration_seconds'
+                          , [('endpoint', endpoint)], values)
+
+            header('request_phase_seconds', 'histogram'
+                   , 'Time per request phase: dns, connect, tls, first_byte,'
+                   ' read, decode.')
+            for (endpoint, phase), values in sorted(self._phases.items()):
+                histogram('request_phase_seconds'
+                          , [('endpoint', endpoint), ('phase', phase)]
+                          , values)
+
+            header('requests_total', 'counter'
+                   , 'Requests by HTTP status and Bungie ErrorCode.')
+            for (endpoint, status, error_code), value in sorted(
+                    self._requests.items(), key=lambda item: tuple(
+                        str(part) for part in item[0])):
+                counter('requests_total', [('endpoint', endpoint)
+                                           , ('status', status or '')
+                                           , ('error_code'
+                                              , '' if error_code is None
+                                              else error_code)], value)
+
+            header('throttled_total', 'counter'
+                   , 'Requests the server answered with throttling.')
+            for endpoint, value in sorted(self._throttled.items()):
+                counter('throttled_total', [('endpoint', endpoint)], value)
+
+            header('response_bytes_total', 'counter'
+                   , 'Response body bytes received, before decompression.')
+            for endpoint, value in sorted(self._bytes.items()):
+                counter('response_bytes_total', [('endpoint', endpoint)]
+                        , value)
+
+            header('request_errors_total', 'counter'
+                   , 'Requests that raised, by exception type.')
+            for (endpoint, error), value in sorted(self._errors.items()):
+                counter('request_errors_total', [('endpoint', endpoint)
+                                                 , ('error', error)], value)
+
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,295 @@
+""" Clan leaderboard aggregation for the Bungie.net API module """
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import api
+from . import scheduler
+
+# getClanLeaderboards() answers with the raw boards of one request, and
+# rebuilding a clan's standings from it on every page view costs a call per
+# mode each time.  ClanLeaderboards fetches every requested mode (and stat)
+# concurrently and keeps a ranking index per board, a (mode, statId) pair,
+# that top() and rank_of() answer from without a request or a lock:
+#
+#   boards = ClanLeaderboards(clan_id, ['allPvP', 'pvecomp_gambit'])
+#   boards.refresh()
+#   boards.start(300)
+#   for standing in boards.top('allPvP', 'lbKills', 10):
+#       print(standing.rank, standing.display_name, standing.value)
+#   standing = boards.rank_of('allPvP', 'lbKills', membership_id)
+#
+# Boards are keyed by the mode names of the response (allPvP rather than 5).
+# A refresh only rebuilds the boards whose entries changed and swaps them in
+# one at a time; a board whose request failed keeps its last index.  The
+# scheduled refreshes run as scheduler.background() work.
+
+DEFAULT_MAX_TOP = 100
+DEFAULT_WORKERS = 8
+
+
+class Standing(object):
+    """Standing(rank, value, display_value, membership_id, membership_type
+    , character_id, display_name, character_class)"""
+
+    __slots__ = ('rank', 'value', 'display_value', 'membership_id'
+                 , 'membership_type', 'character_id', 'display_name'
+                 , 'character_class')
+
+    def __init__(self, rank, value, display_value, membership_id
+                 , membership_type, character_id, display_name
+                 , character_class):
+
+        self.rank = rank
+        self.value = value
+        self.display_value = display_value
+        self.membership_id = membership_id
+        self.membership_type = membership_type
+        self.character_id = character_id
+        self.display_name = display_name
+        self.character_class = character_class
+
+    @classmethod
+    def from_entry(cls, entry):
+        """from_entry(entry) -> Standing of a leaderboard entry"""
+
+        player = entry.get('player') or {}
+        info = player.get('destinyUserInfo') or {}
+        basic = (entry.get('value') or {}).get('basic') or {}
+
+        return cls(entry.get('rank'), basic.get('value')
+                   , basic.get('displayValue'), str(info.get('membershipId'))
+                   , info.get('membershipType'), entry.get('characterId')
+                   , info.get('bungieGlobalDisplayName')
+                   or info.get('displayName'), player.get('characterClass'))
+
+    def __repr__(self):
+        return 'Standing(%r, %r, %r)' % (self.rank, self.display_name
+                                         , self.value)
+
+
+class Board(object):
+    """Board(mode, stat_id, standings)
+
+    The standings of one leaderboard, in rank order, indexed by member.
+    """
+
+    __slots__ = ('mode', 'stat_id', 'standings', 'updated', '_by_member'
+                 , '_signature')
+
+    def __init__(self, mode, stat_id, standings):
+        self.mode = mode
+        self.stat_id = stat_id
+        self.standings = sorted(standings, key=lambda standing: (
+            standing.rank is None, standing.rank))
+        self.updated = time.time()
+
+        # a member listed with several characters ranks by the best one
+
+        self._by_member = {}
+        for standing in self.standings:
+            self._by_member.setdefault(standing.membership_id, standing)
+
+        self._signature = tuple((standing.rank, standing.value
+                                 , standing.membership_id
+                                 , standing.character_id)
+                                for standing in self.standings)
+
+    def __len__(self):
+        return len(self.standings)
+
+    def top(self, count=10):
+        """top(count=10) -> the first count standings"""
+
+        return self.standings[:count]
+
+    def rank_of(self, membership_id):
+        """rank_of(membership_id) -> the member's best Standing, or None"""
+
+        return self._by_member.get(str(membership_id))
+
+    def same_as(self, other):
+        """same_as(other) -> whether other holds the same standings"""
+
+        return other is not None and self._signature == other._signature
+
+
+def boards_from_response(response):
+    """boards_from_response(response) -> {(mode, statId): Board} of a
+    getClanLeaderboards() Response"""
+
+    boards = {}
+
+    for mode, stats in (response or {}).items():
+        for stat_id, board in (stats or {}).items():
+            boards[(mode, stat_id)] = Board(
+                mode, stat_id, [Standing.from_entry(entry)
+                                for entry in board.get('entries') or []])
+
+    return boards
+
+
+class ClanLeaderboards(object):
+    """ClanLeaderboards(clan_id, modes, stat_ids=None, max_top=100
+    , workers=8)
+
+    modes are mode names or numbers; without stat_ids every stat of each
+    mode is fetched in one request per mode, otherwise one request per mode
+    and stat.
+    """
+
+    def __init__(self, clan_id, modes, stat_ids=None
+                 , max_top=DEFAULT_MAX_TOP, workers=DEFAULT_WORKERS):
+
+        if isinstance(modes, str):
+            modes = modes.split(',')
+        if isinstance(stat_ids, str):
+            stat_ids = stat_ids.split(',')
+
+        self.clan_id = str(clan_id)
+        self.modes = [str(mode) for mode in modes]
+        self.stat_ids = list(stat_ids) if stat_ids else None
+        self.max_top = max_top
+        self.workers = workers
+
+        self.errors = {}
+        self.refreshed = None
+
+        self._boards = {}
+        self._refresh_lock = threading.Lock()
+        self._stopped = None
+        self._thread = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def requests(self):
+        """requests() -> list of (mode, stat_id or None) to fetch"""
+
+        return [(mode, stat_id) for mode in self.modes
+                for stat_id in (self.stat_ids or (None,))]
+
+    def _fetch(self, mode, stat_id):
+        """_fetch(mode, stat_id) -> {(mode, statId): Board}"""
+
+        envelope = api.getClanLeaderboards(self.clan_id, mode
+                                           , str(self.max_top), stat_id)
+
+        if envelope.get('ErrorCode', 1) != 1:
+            raise api.BungieAPIError.from_envelope(envelope)
+
+        return boards_from_response(envelope.get('Response'))
+
+    def refresh(self):
+        """refresh() -> number of boards that changed
+
+        Fetches every board concurrently.  Failed requests are recorded in
+        errors, keyed by (mode, stat_id), and leave their boards as they
+        were.
+        """
+
+        with self._refresh_lock:
+            requests = self.requests()
+            errors = {}
+            changed = 0
+
+            with ThreadPoolExecutor(max_workers=min(self.workers
+                                                    , len(requests))) \
+                    as executor:
+                futures = [(request, scheduler.submit(
+                    executor, self._fetch, *request))
+                           for request in requests]
+
+                for request, future in futures:
+                    try:
+                        fetched = future.result()
+                    except Exception as error:
+                        errors[request] = str(error)
+                        continue
+
+                    for key, board in fetched.items():
+                        if not board.same_as(self._boards.get(key)):
+                            self._boards[key] = board
+                            changed += 1
+
+            self.errors = errors
+            self.refreshed = time.time()
+
+            if api.DEBUG:
+                print("DEBUG: ClanLeaderboards.refresh(", self.clan_id, ")"
+                      , changed, "boards changed,", len(errors), "errors")
+
+            return changed
+
+    def boards(self):
+        """boards() -> {(mode, statId): Board}"""
+
+        return dict(self._boards)
+
+    def board(self, mode, stat_id):
+        """board(mode, stat_id) -> Board, or None before it was fetched"""
+
+        return self._boards.get((mode, stat_id))
+
+    def top(self, mode, stat_id, count=10):
+        """top(mode, stat_id, count=10) -> list of Standing"""
+
+        board = self._boards.get((mode, stat_id))
+
+        return board.top(count) if board is not None else []
+
+    def rank_of(self, mode, stat_id, membership_id):
+        """rank_of(mode, stat_id, membership_id) -> Standing or None"""
+
+        board = self._boards.get((mode, stat_id))
+
+        return board.rank_of(membership_id) if board is not None else None
+
+    def standings_of(self, membership_id):
+        """standings_of(membership_id) -> {(mode, statId): Standing} of every
+        board the member is on"""
+
+        standings = {}
+
+        for key, board in list(self._boards.items()):
+            standing = board.rank_of(membership_id)
+            if standing is not None:
+                standings[key] = standing
+
+        return standings
+
+    def start(self, interval):
+        """start(interval)
+
+        Refreshes every interval seconds in a daemon thread, until stop().
+        """
+
+        self.stop()
+
+        stopped = self._stopped = threading.Event()
+
+        def run():
+            with scheduler.background():
+                while not stopped.wait(interval):
+                    try:
+                        self.refresh()
+                    except Exception as error:
+                        if api.DEBUG:
+                            print("DEBUG: ClanLeaderboards refresh failed:"
+                                  , error)
+
+        self._thread = threading.Thread(
+            target=run, name='leaderboards-' + self.clan_id, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """stop()"""
+
+        if self._stopped is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._stopped = self._thread = None
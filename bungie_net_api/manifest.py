@@ -0,0 +1,216 @@
+""" Local Destiny 2 manifest database for the Bungie.net API module """
+
+import json
+import os
+import os.path
+import shutil
+import sqlite3
+import threading
+import zipfile
+
+from . import api
+from . import decoders
+from . import transport
+
+# The Destiny 2 definitions (items, stats, perks, activities, ...) only change
+# between game patches.  Manifest downloads the definition tables named in
+# get_manifest() once, keeps them in a local SQLite database and answers
+# lookups by (entity_type, hash) from an in-process index.  The tables are
+# downloaded again only when Bungie publishes a new manifest version.
+#
+#   manifest = Manifest()
+#   manifest.sync()
+#   api.use_manifest(manifest)       # get_item_by_hash() now stays local
+#
+# download_world_content() fetches Bungie's own SQLite build of the
+# definitions (the mobile world content database) for tools that read it
+# directly; the archive is streamed to disk rather than held in memory.
+
+MANIFEST_FILE_NAME = '.bungie_net_api_manifest.sqlite3'
+
+MANIFEST_FILE = (os.path.join(os.path.expanduser("~"), MANIFEST_FILE_NAME))
+
+DEFAULT_LANGUAGE = 'en'
+
+
+def normalize_hash(hash_identifier):
+    """normalize_hash(hash_identifier) -> unsigned 32 bit int"""
+
+    # definition hashes are unsigned 32 bit ints, but some endpoints (and the
+    # mobile SQLite manifest) hand them out as signed values.
+
+    return int(hash_identifier) & 0xFFFFFFFF
+
+
+class Manifest(object):
+    """Manifest(path=MANIFEST_FILE, language='en', entity_types=None)
+
+    entity_types limits the tables that are downloaded, e.g.
+    ['DestinyInventoryItemDefinition', 'DestinyStatDefinition']; by default
+    every table in the manifest is stored.
+    """
+
+    def __init__(self, path=MANIFEST_FILE, language=DEFAULT_LANGUAGE
+                 , entity_types=None):
+
+        self.path = path
+        self.language = language
+        self.entity_types = entity_types
+
+        self._lock = threading.RLock()
+        self._indexes = {}
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT);
+            CREATE TABLE IF NOT EXISTS definitions (
+                entity_type TEXT NOT NULL,
+                hash INTEGER NOT NULL,
+                json TEXT NOT NULL,
+                PRIMARY KEY (entity_type, hash)) WITHOUT ROWID;
+        """)
+
+    @property
+    def version(self):
+        """content version of the stored tables, None before the first sync"""
+
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = ?"
+                                   , ('version',)).fetchone()
+
+        return row[0] if row else None
+
+    def sync(self, force=False):
+        """sync(force=False) -> True if the tables were downloaded
+
+        Compares the stored version against get_manifest() and downloads the
+        definition tables again only when it changed (or when force is set).
+        Raises ValueError when entity_types names a table the manifest does
+        not have.
+        """
+
+        manifest = api.get_manifest()['Response']
+        version = manifest['version']
+
+        paths = manifest['jsonWorldComponentContentPaths'][self.language]
+        entity_types = self.entity_types or sorted(paths)
+
+        unknown = [entity_type for entity_type in entity_types
+                   if entity_type not in paths]
+        if unknown:
+            raise ValueError('unknown entity type: ' + ', '.join(unknown))
+
+        if version == self.version and not force:
+            return False
+
+        if api.DEBUG:
+            print("DEBUG: Manifest.sync(" + version + ")")
+
+        # each table is streamed from the network straight into SQLite
+        # instead of being decoded into one large dict first
+
+        with self._lock:
+            with self._db:
+                self._db.execute("DELETE FROM definitions")
+                for entity_type in entity_types:
+                    with transport.get_transport().open(
+                            api.BUNGIE_NET_ROOT + paths[entity_type]) as body:
+                        self._db.executemany(
+                            "INSERT INTO definitions VALUES (?, ?, ?)"
+                            , ((entity_type, normalize_hash(hash_identifier)
+                                , json.dumps(definition
+                                             , separators=(',', ':')))
+                               for hash_identifier, definition
+                               in decoders.iter_kvitems(body)))
+                self._db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)"
+                                 , ('version', version))
+            self._indexes.clear()
+
+        return True
+
+    def _index(self, entity_type):
+        """_index(entity_type) -> {hash: json bytes}"""
+
+        index = self._indexes.get(entity_type)
+
+        if index is None:
+            with self._lock:
+                index = self._indexes.get(entity_type)
+                if index is None:
+                    index = dict(self._db.execute(
+                        "SELECT hash, CAST(json AS BLOB) FROM definitions"
+                        " WHERE entity_type = ?", (entity_type,)))
+                    self._indexes[entity_type] = index
+
+        return index
+
+    def get(self, entity_type, hash_identifier):
+        """get(entity_type, hash_identifier) -> definition dict or None"""
+
+        raw = self._index(entity_type).get(normalize_hash(hash_identifier))
+
+        if raw is None:
+            return None
+
+        return decoders.decode(raw)
+
+    def stored_entity_types(self):
+        """stored_entity_types() -> list of entity types in the database"""
+
+        with self._lock:
+            return [row[0] for row in self._db.execute(
+                "SELECT DISTINCT entity_type FROM definitions")]
+
+    def iter_raw(self, entity_type):
+        """iter_raw(entity_type) -> iterator of (hash, json bytes)"""
+
+        return iter(self._index(entity_type).items())
+
+    def __contains__(self, key):
+        entity_type, hash_identifier = key
+        return normalize_hash(hash_identifier) in self._index(entity_type)
+
+    def close(self):
+        """close()"""
+
+        with self._lock:
+            self._indexes.clear()
+            self._db.close()
+
+
+def download_world_content(directory, language=DEFAULT_LANGUAGE):
+    """download_world_content(directory, language='en') -> path of the
+    world content SQLite database
+
+    Streams the zip archive named in get_manifest() to directory and
+    extracts the database from it.  Nothing is downloaded when the current
+    version is already there.
+    """
+
+    manifest = api.get_manifest()['Response']
+    content_path = manifest['mobileWorldContentPaths'][language]
+
+    database = os.path.join(directory, os.path.basename(content_path))
+
+    if os.path.exists(database):
+        return database
+
+    archive = database + '.zip'
+
+    if api.DEBUG:
+        print("DEBUG: download_world_content(" + content_path + ")")
+
+    transport.get_transport().download(api.BUNGIE_NET_ROOT + content_path
+                                       , archive)
+
+    try:
+        with zipfile.ZipFile(archive) as zipped, \
+                zipped.open(zipped.namelist()[0]) as source, \
+                open(database + '.part', 'wb') as target:
+            shutil.copyfileobj(source, target, transport.CHUNK_SIZE)
+        os.replace(database + '.part', database)
+    finally:
+        os.remove(archive)
+
+    return database
@@ -0,0 +1,244 @@
+""" Memory-mapped manifest definition store for the Bungie.net API module """
+
+import array
+import bisect
+import mmap
+import os
+import os.path
+import struct
+import sys
+import threading
+
+from . import decoders
+from .manifest import normalize_hash
+
+# A Manifest keeps definitions in SQLite and builds per-process dict
+# indexes, which is fine for one process but costs every worker its own copy.
+# export_manifest() writes each definition table of a synced Manifest to a
+# flat file that worker processes memory-map read-only, so the page cache
+# holds a single shared copy:
+#
+#   header   magic, byte order, count
+#   hashes   count unsigned 32 bit hashes, sorted
+#   offsets  count + 1 unsigned 64 bit offsets into the blob section
+#   blobs    the compact JSON of each definition
+#
+# A lookup binary searches the hash column in place and decodes only the
+# blob it finds.
+#
+#   export_manifest(manifest, '/var/lib/destiny/manifest')   # once
+#   api.use_manifest(MappedManifest('/var/lib/destiny/manifest'))  # workers
+
+STORE_MAGIC = b'BNDEFS01'
+STORE_SUFFIX = '.defs'
+VERSION_FILE_NAME = 'VERSION'
+
+_HEADER = struct.Struct('<8sII')
+_BYTE_ORDER = {'little': 1, 'big': 2}[sys.byteorder]
+
+
+def write_store(path, definitions):
+    """write_store(path, definitions)
+
+    definitions is an iterable of (hash, json bytes) pairs.  The file is
+    written next to path and renamed into place, so processes that still map
+    the previous file keep a consistent view.
+    """
+
+    entries = sorted((normalize_hash(hash_identifier), blob)
+                     for hash_identifier, blob in definitions)
+
+    hashes = array.array('I', (hash_identifier
+                               for hash_identifier, _ in entries))
+    offsets = array.array('Q', [0])
+    for _, blob in entries:
+        offsets.append(offsets[-1] + len(blob))
+
+    temp_path = path + '.tmp'
+
+    with open(temp_path, 'wb') as store:
+        store.write(_HEADER.pack(STORE_MAGIC, _BYTE_ORDER, len(entries)))
+        hashes.tofile(store)
+        if len(entries) % 2:
+            store.write(b'\0' * 4)
+        offsets.tofile(store)
+        for _, blob in entries:
+            store.write(blob)
+
+    os.replace(temp_path, path)
+
+
+class MappedDefinitions(object):
+    """MappedDefinitions(path)
+
+    Read-only, memory-mapped view of one definition table written by
+    write_store().
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(path, 'rb') as store:
+            self._mmap = mmap.mmap(store.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, byte_order, count = _HEADER.unpack_from(self._mmap, 0)
+
+        if magic != STORE_MAGIC:
+            raise ValueError(path + ' is not a definition store')
+        if byte_order != _BYTE_ORDER:
+            raise ValueError(path + ' was written with a different byte order')
+
+        view = memoryview(self._mmap)
+        hashes_start = _HEADER.size
+        offsets_start = hashes_start + 4 * (count + count % 2)
+        self._blobs_start = offsets_start + 8 * (count + 1)
+
+        self._count = count
+        self._hashes = view[hashes_start:hashes_start + 4 * count].cast('I')
+        self._offsets = view[offsets_start:self._blobs_start].cast('Q')
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        return iter(self._hashes)
+
+    def __contains__(self, hash_identifier):
+        return self._find(normalize_hash(hash_identifier)) is not None
+
+    def _find(self, hash_identifier):
+        """_find(hash_identifier) -> index or None"""
+
+        index = bisect.bisect_left(self._hashes, hash_identifier)
+
+        if index < self._count and self._hashes[index] == hash_identifier:
+            return index
+
+        return None
+
+    def raw(self, hash_identifier):
+        """raw(hash_identifier) -> json bytes or None"""
+
+        index = self._find(normalize_hash(hash_identifier))
+
+        if index is None:
+            return None
+
+        start = self._blobs_start + self._offsets[index]
+        end = self._blobs_start + self._offsets[index + 1]
+
+        return self._mmap[start:end]
+
+    def get(self, hash_identifier):
+        """get(hash_identifier) -> definition dict or None"""
+
+        blob = self.raw(hash_identifier)
+
+        if blob is None:
+            return None
+
+        return decoders.decode(blob)
+
+    def close(self):
+        """close()"""
+
+        self._hashes.release()
+        self._offsets.release()
+        self._mmap.close()
+
+
+class MappedManifest(object):
+    """MappedManifest(directory)
+
+    Same get(entity_type, hash) interface as manifest.Manifest, backed by the
+    .defs files that export_manifest() wrote into directory.  Tables are
+    mapped on first use.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+        self._lock = threading.Lock()
+        self._tables = {}
+
+    @property
+    def version(self):
+        """content version of the exported tables, None if unknown"""
+
+        try:
+            with open(os.path.join(self.directory, VERSION_FILE_NAME)) as vfile:
+                return vfile.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def table(self, entity_type):
+        """table(entity_type) -> MappedDefinitions or None"""
+
+        table = self._tables.get(entity_type)
+
+        if table is None:
+            with self._lock:
+                table = self._tables.get(entity_type)
+                if table is None:
+                    path = os.path.join(self.directory
+                                        , entity_type + STORE_SUFFIX)
+                    if not os.path.exists(path):
+                        return None
+                    table = MappedDefinitions(path)
+                    self._tables[entity_type] = table
+
+        return table
+
+    def get(self, entity_type, hash_identifier):
+        """get(entity_type, hash_identifier) -> definition dict or None"""
+
+        table = self.table(entity_type)
+
+        if table is None:
+            return None
+
+        return table.get(hash_identifier)
+
+    def __contains__(self, key):
+        entity_type, hash_identifier = key
+        table = self.table(entity_type)
+        return table is not None and hash_identifier in table
+
+    def reload(self):
+        """reload()
+
+        Drops the current mappings so the next lookup maps the files a new
+        export_manifest() put in place.  Call it between batches of lookups,
+        not while other threads are still reading.
+        """
+
+        with self._lock:
+            tables = list(self._tables.values())
+            self._tables.clear()
+
+        for table in tables:
+            table.close()
+
+    def close(self):
+        """close()"""
+
+        self.reload()
+
+
+def export_manifest(manifest, directory):
+    """export_manifest(manifest, directory)
+
+    Writes every table of a synced manifest.Manifest into directory as a
+    memory-mappable .defs file.
+    """
+
+    os.makedirs(directory, exist_ok=True)
+
+    for entity_type in manifest.stored_entity_types():
+        write_store(os.path.join(directory, entity_type + STORE_SUFFIX)
+                    , manifest.iter_raw(entity_type))
+
+    temp_path = os.path.join(directory, VERSION_FILE_NAME + '.tmp')
+    with open(temp_path, 'w') as vfile:
+        vfile.write((manifest.version or '') + '\n')
+    os.replace(temp_path, os.path.join(directory, VERSION_FILE_NAME))
@@ -0,0 +1,275 @@
+""" Compact models of Destiny 2 entities for the Bungie.net API module """
+
+from . import api
+
+# The API wrappers return the decoded JSON envelope as nested dicts.  For
+# callers that hold many results at once (activity history, PGCR entries)
+# the wrappers take as_models=True and return the classes below instead:
+# __slots__ objects carrying the commonly used fields, with each stat
+# reduced from {'statId': .., 'basic': {'value': .., 'displayValue': ..}}
+# to a single number in a values dict keyed by stat id.
+#
+#   for activity in getActivityHistory(member_id, '2', character_id
+#                                      , mode='5', as_models=True):
+#       print(activity.period, activity.values.get('kills'))
+#
+# The converters read the JSON directly; an error envelope raises
+# BungieAPIError.
+
+
+class Model(object):
+    """Model()
+
+    Base class of the models; subclasses list their fields in __slots__ and
+    assign every one of them in __init__.
+    """
+
+    __slots__ = ()
+
+    def as_dict(self):
+        """as_dict() -> {field: value}"""
+
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+    def __eq__(self, other):
+        return (type(self) is type(other)
+                and all(getattr(self, name) == getattr(other, name)
+                        for name in self.__slots__))
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '%s(%s)' % (type(self).__name__, ', '.join(
+            '%s=%r' % (name, getattr(self, name))
+            for name in self.__slots__[:3]))
+
+
+def stat_values(values):
+    """stat_values(values) -> {statId: basic value} of an API values dict"""
+
+    if not values:
+        return {}
+
+    return {stat_id: stat['basic']['value']
+            for stat_id, stat in values.items()}
+
+
+class Character(Model):
+    """Character(character_id, membership_id, membership_type, ...)"""
+
+    __slots__ = ('character_id', 'membership_id', 'membership_type'
+                 , 'class_type', 'race_type', 'gender_type', 'light'
+                 , 'date_last_played', 'minutes_played_total'
+                 , 'emblem_hash', 'emblem_path', 'stats')
+
+    def __init__(self, character_id=None, membership_id=None
+                 , membership_type=None, class_type=None, race_type=None
+                 , gender_type=None, light=None, date_last_played=None
+                 , minutes_played_total=None, emblem_hash=None
+                 , emblem_path=None, stats=None):
+        self.character_id = character_id
+        self.membership_id = membership_id
+        self.membership_type = membership_type
+        self.class_type = class_type
+        self.race_type = race_type
+        self.gender_type = gender_type
+        self.light = light
+        self.date_last_played = date_last_played
+        self.minutes_played_total = minutes_played_total
+        self.emblem_hash = emblem_hash
+        self.emblem_path = emblem_path
+        self.stats = stats
+
+    @classmethod
+    def from_json(cls, data):
+        """from_json(data) -> Character of a Characters component entry"""
+
+        get = data.get
+
+        return cls(get('characterId'), get('membershipId')
+                   , get('membershipType'), get('classType')
+                   , get('raceType'), get('genderType'), get('light')
+                   , get('dateLastPlayed'), get('minutesPlayedTotal')
+                   , get('emblemHash'), get('emblemPath')
+                   , dict(get('stats') or ()))
+
+
+class Profile(Model):
+    """Profile(membership_id, membership_type, display_name, ...)
+
+    characters maps character id to Character and is only filled when the
+    Characters (200) component was requested.
+    """
+
+    __slots__ = ('membership_id', 'membership_type', 'display_name'
+                 , 'date_last_played', 'character_ids', 'characters')
+
+    def __init__(self, membership_id=None, membership_type=None
+                 , display_name=None, date_last_played=None
+                 , character_ids=None, characters=None):
+        self.membership_id = membership_id
+        self.membership_type = membership_type
+        self.display_name = display_name
+        self.date_last_played = date_last_played
+        self.character_ids = character_ids
+        self.characters = characters
+
+    @classmethod
+    def from_json(cls, response):
+        """from_json(response) -> Profile of a getProfile() Response"""
+
+        profile = (response.get('profile') or {}).get('data') or {}
+        user_info = profile.get('userInfo') or {}
+        characters = (response.get('characters') or {}).get('data') or {}
+
+        character_ids = profile.get('characterIds')
+        if character_ids is None:
+            character_ids = list(characters)
+
+        return cls(user_info.get('membershipId')
+                   , user_info.get('membershipType')
+                   , user_info.get('displayName')
+                   , profile.get('dateLastPlayed'), tuple(character_ids)
+                   , dict((character_id, Character.from_json(character))
+                          for character_id, character
+                          in characters.items()))
+
+
+class Activity(Model):
+    """Activity(instance_id, period, mode, ...)"""
+
+    __slots__ = ('instance_id', 'period', 'mode', 'modes', 'reference_id'
+                 , 'director_activity_hash', 'membership_type', 'is_private'
+                 , 'values')
+
+    def __init__(self, instance_id=None, period=None, mode=None, modes=None
+                 , reference_id=None, director_activity_hash=None
+                 , membership_type=None, is_private=None, values=None):
+        self.instance_id = instance_id
+        self.period = period
+        self.mode = mode
+        self.modes = modes
+        self.reference_id = reference_id
+        self.director_activity_hash = director_activity_hash
+        self.membership_type = membership_type
+        self.is_private = is_private
+        self.values = values
+
+    @classmethod
+    def from_json(cls, data):
+        """from_json(data) -> Activity of an activity history entry"""
+
+        details = data.get('activityDetails') or {}
+        get = details.get
+
+        return cls(get('instanceId'), data.get('period'), get('mode')
+                   , tuple(get('modes') or ()), get('referenceId')
+                   , get('directorActivityHash'), get('membershipType')
+                   , get('isPrivate'), stat_values(data.get('values')))
+
+
+class PGCREntry(Model):
+    """PGCREntry(character_id, membership_id, membership_type, ...)"""
+
+    __slots__ = ('character_id', 'membership_id', 'membership_type'
+                 , 'display_name', 'class_hash', 'light_level', 'standing'
+                 , 'score', 'values', 'extended')
+
+    def __init__(self, character_id=None, membership_id=None
+                 , membership_type=None, display_name=None, class_hash=None
+                 , light_level=None, standing=None, score=None, values=None
+                 , extended=None):
+        self.character_id = character_id
+        self.membership_id = membership_id
+        self.membership_type = membership_type
+        self.display_name = display_name
+        self.class_hash = class_hash
+        self.light_level = light_level
+        self.standing = standing
+        self.score = score
+        self.values = values
+        self.extended = extended
+
+    @classmethod
+    def from_json(cls, data):
+        """from_json(data) -> PGCREntry of a PGCR entries element"""
+
+        player = data.get('player') or {}
+        user_info = player.get('destinyUserInfo') or {}
+        score = data.get('score')
+
+        return cls(data.get('characterId'), user_info.get('membershipId')
+                   , user_info.get('membershipType')
+                   , user_info.get('displayName'), player.get('classHash')
+                   , player.get('lightLevel'), data.get('standing')
+                   , score['basic']['value'] if score else None
+                   , stat_values(data.get('values'))
+                   , stat_values((data.get('extended') or {}).get('values')))
+
+
+class PGCR(Model):
+    """PGCR(instance_id, period, mode, ...)"""
+
+    __slots__ = ('instance_id', 'period', 'mode', 'modes', 'reference_id'
+                 , 'director_activity_hash', 'is_private'
+                 , 'starting_phase_index', 'entries')
+
+    def __init__(self, instance_id=None, period=None, mode=None, modes=None
+                 , reference_id=None, director_activity_hash=None
+                 , is_private=None, starting_phase_index=None, entries=None):
+        self.instance_id = instance_id
+        self.period = period
+        self.mode = mode
+        self.modes = modes
+        self.reference_id = reference_id
+        self.director_activity_hash = director_activity_hash
+        self.is_private = is_private
+        self.starting_phase_index = starting_phase_index
+        self.entries = entries
+
+    @classmethod
+    def from_json(cls, response):
+        """from_json(response) -> PGCR of a get_activity_stats() Response"""
+
+        details = response.get('activityDetails') or {}
+        get = details.get
+
+        return cls(get('instanceId'), response.get('period'), get('mode')
+                   , tuple(get('modes') or ()), get('referenceId')
+                   , get('directorActivityHash'), get('isPrivate')
+                   , response.get('startingPhaseIndex')
+                   , tuple(PGCREntry.from_json(entry)
+                           for entry in response.get('entries') or ()))
+
+
+def _response(envelope):
+    """_response(envelope) -> envelope['Response'], raising on API errors"""
+
+    if envelope.get('ErrorCode', 1) != 1:
+        raise api.BungieAPIError.from_envelope(envelope)
+
+    return envelope.get('Response') or {}
+
+
+def profile_from_envelope(envelope):
+    """profile_from_envelope(envelope) -> Profile"""
+
+    return Profile.from_json(_response(envelope))
+
+
+def activities_from_envelope(envelope):
+    """activities_from_envelope(envelope) -> list of Activity"""
+
+    from_json = Activity.from_json
+
+    return [from_json(activity)
+            for activity in _response(envelope).get('activities') or ()]
+
+
+def pgcr_from_envelope(envelope):
+    """pgcr_from_envelope(envelope) -> PGCR"""
+
+    return PGCR.from_json(_response(envelope))
@@ -0,0 +1,339 @@
+""" OAuth sessions for the Bungie.net API module """
+
+import threading
+import time
+import urllib.error
+
+from . import api
+
+# Calls on behalf of a user carry an OAuth access token, which expires an
+# hour after it was issued.  An OAuthSession owns the user's token pair: it
+# refreshes the access token against the token endpoint shortly before it
+# expires (and once more when the server refuses it anyway), and hands the
+# rotated pair to on_refresh so it can be persisted.  Calls go through the
+# shared, pooled transport like every other call:
+#
+#   def save(session):
+#       store[session.token.membership_id] = session.token.as_dict()
+#
+#   session = OAuthSession(store[membership_id], on_refresh=save)
+#   profile = api.getProfile(member_id, '2', '100', token=session)
+#
+# Sessions share no state: each takes its own lock, and only to refresh, so
+# thousands of them can be used from as many threads at once.  The token
+# endpoint and the client credentials come from the [oauth] settings
+# (token_url, client_id, client_secret) unless they are passed in.
+
+TOKEN_PATH = '/Platform/App/OAuth/token/'
+
+DEFAULT_REFRESH_MARGIN = 60.0
+
+# ErrorStatus of envelopes refused for a missing, expired or revoked token
+
+AUTH_ERROR_STATUSES = frozenset(['WebAuthRequired', 'AccessTokenHasExpired'
+                                 , 'AuthorizationRecordExpired'
+                                 , 'AuthorizationRecordRevoked'])
+
+
+class OAuthError(Exception):
+    """OAuthError(error, description=None)"""
+
+    def __init__(self, error, description=None):
+        super().__init__(error, description)
+        self.error = error
+        self.description = description
+
+    def __str__(self):
+        if self.description:
+            return '%s: %s' % (self.error, self.description)
+        return str(self.error)
+
+
+class Token(object):
+    """Token(access_token, refresh_token=None, expires_at=None
+    , refresh_expires_at=None, membership_id=None)
+
+    The expiry times are seconds since the epoch; None for unknown.
+    """
+
+    __slots__ = ('access_token', 'refresh_token', 'expires_at'
+                 , 'refresh_expires_at', 'membership_id')
+
+    def __init__(self, access_token, refresh_token=None, expires_at=None
+                 , refresh_expires_at=None, membership_id=None):
+
+        self.access_token = access_token
+        self.refresh_token = refresh_token
+        self.expires_at = expires_at
+        self.refresh_expires_at = refresh_expires_at
+        self.membership_id = membership_id
+
+    @classmethod
+    def from_response(cls, payload, now=None):
+        """from_response(payload, now=None) -> Token from a token endpoint
+        response"""
+
+        if now is None:
+            now = time.time()
+
+        def expiry(name):
+            seconds = payload.get(name)
+            return None if seconds is None else now + float(seconds)
+
+        return cls(payload['access_token'], payload.get('refresh_token')
+                   , expiry('expires_in'), expiry('refresh_expires_in')
+                   , payload.get('membership_id'))
+
+    @classmethod
+    def from_dict(cls, values):
+        """from_dict(values) -> Token from an as_dict() result"""
+
+        return cls(**dict((name, values.get(name)) for name in cls.__slots__))
+
+    def as_dict(self):
+        """as_dict() -> {name: value}, for persisting the token"""
+
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+    def expires_within(self, seconds, now=None):
+        """expires_within(seconds, now=None) -> bool"""
+
+        if self.expires_at is None:
+            return False
+
+        if now is None:
+            now = time.time()
+
+        return self.expires_at - now <= seconds
+
+
+def _token(token):
+    """_token(token) -> Token from a Token, an as_dict() or token endpoint
+    result, or a bare access token"""
+
+    if isinstance(token, Token):
+        return token
+    if isinstance(token, str):
+        return Token(token)
+    if 'expires_in' in token or 'refresh_expires_in' in token:
+        return Token.from_response(token)
+
+    return Token.from_dict(token)
+
+
+class OAuthSession(object):
+    """OAuthSession(token, client_id=None, client_secret=None, token_url=None
+    , refresh_margin=60, on_refresh=None)
+
+    token is a Token, an as_dict() or token endpoint result, or a bare
+    access token (which can not be refreshed).  on_refresh(session) is
+    called after every refresh, with the lock held.
+    """
+
+    __slots__ = ('client_id', 'client_secret', 'token_url', 'refresh_margin'
+                 , 'on_refresh', 'refreshes', '_state', '_lock')
+
+    def __init__(self, token, client_id=None, client_secret=None
+                 , token_url=None, refresh_margin=DEFAULT_REFRESH_MARGIN
+                 , on_refresh=None):
+
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.token_url = token_url
+        self.refresh_margin = refresh_margin
+        self.on_refresh = on_refresh
+        self.refreshes = 0
+
+        # (token, request headers), replaced as a whole on refresh so
+        # readers never take the lock
+
+        self._state = (_token(token), None)
+        self._lock = threading.Lock()
+
+    @property
+    def token(self):
+        """the current Token"""
+
+        return self._state[0]
+
+    def _current(self):
+        """_current() -> (token, headers), refreshed first when the token is
+        about to expire"""
+
+        token, headers = self._state
+
+        if (token.refresh_token is not None
+                and token.expires_within(self.refresh_margin)):
+            return self.refresh(token)
+
+        if headers is None:
+            with self._lock:
+                token, headers = self._state
+                if headers is None:
+                    headers = self._headers_for(token)
+                    self._state = token, headers
+
+        return token, headers
+
+    @staticmethod
+    def _headers_for(token):
+        """_headers_for(token) -> Authorization header carrying token
+
+        The API key is added by the client that sends the call.
+        """
+
+        return {'Authorization': 'Bearer ' + token.access_token}
+
+    def headers(self, client=None):
+        """headers(client=None) -> request headers carrying the access token
+        and the API key of client (default: api.get_client())"""
+
+        if client is None:
+            client = api.get_client()
+
+        return dict(self._current()[1], **client._headers())
+
+    def refresh(self, stale=None):
+        """refresh(stale=None) -> (token, headers)
+
+        Exchanges the refresh token for a new token pair.  With stale, a
+        Token, nothing is done when another thread already replaced it.
+        """
+
+        with self._lock:
+            token, headers = self._state
+
+            if stale is not None and token is not stale:
+                return token, headers
+
+            if token.refresh_token is None:
+                raise OAuthError('invalid_grant', 'no refresh token')
+
+            token = self._request_token(token)
+            headers = self._headers_for(token)
+            self._state = token, headers
+            self.refreshes += 1
+
+            if api.DEBUG:
+                print("DEBUG: refreshed the access token of"
+                      , token.membership_id)
+
+            if self.on_refresh is not None:
+                self.on_refresh(self)
+
+            return token, headers
+
+    def _request_token(self, token):
+        """_request_token(token) -> Token from the token endpoint"""
+
+        import base64
+        import urllib.parse
+
+        from . import decoders
+        from . import transport
+
+        api.ensure_configured()
+
+        form = {'grant_type': 'refresh_token'
+                , 'refresh_token': token.refresh_token}
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'
+                   , 'X-API-Key': api.get_settings().api_key}
+
+        settings = api.get_settings()
+        client_id = self.client_id or settings.get('client_id')
+        client_secret = self.client_secret or settings.get('client_secret')
+
+        # confidential clients authenticate, public ones name themselves
+
+        if client_secret:
+            headers['Authorization'] = 'Basic ' + base64.b64encode(
+                (str(client_id) + ':' + client_secret).encode('utf-8')
+            ).decode('ascii')
+        elif client_id:
+            form['client_id'] = str(client_id)
+
+        token_url = (self.token_url or settings.get('token_url')
+                     or api.BUNGIE_NET_ROOT + TOKEN_PATH)
+
+        try:
+            response = transport.get_transport().request(
+                token_url, headers=headers, method='POST'
+                , body=urllib.parse.urlencode(form).encode('ascii'))
+        except urllib.error.HTTPError as error:
+            try:
+                payload = decoders.decode(error.read())
+            except ValueError:
+                payload = {}
+            raise OAuthError(payload.get('error', 'HTTP %d' % error.code)
+                             , payload.get('error_description')) from None
+
+        return Token.from_response(decoders.decode(response.body))
+
+    def _refused(self, envelope):
+        """_refused(envelope) -> whether the envelope refuses the token"""
+
+        return (envelope.get('ErrorStatus') in AUTH_ERROR_STATUSES
+                and self._state[0].refresh_token is not None)
+
+    def call(self, method, fields=None, client=None):
+        """call(method, fields=None, client=None) -> callBungieAPI() as this
+        user
+
+        client is an api.BungieClient whose API key and transport are used
+        instead of the default ones.  A call refused for the token is retried
+        once with a refreshed one.
+        """
+
+        call_url = api.BUNGIE_NET_ROOT + '/Platform' + method
+        token, headers = self._current()
+
+        if client is None:
+            client = api.get_client()
+
+        def fetch(headers):
+            headers = dict(headers, **client._headers())
+            return client._fetch_json(call_url, headers, fields)
+
+        try:
+            envelope = fetch(headers)
+        except urllib.error.HTTPError as error:
+            if error.code != 401 or token.refresh_token is None:
+                raise
+        else:
+            if not self._refused(envelope):
+                return envelope
+
+        return fetch(self.refresh(token)[1])
+
+    async def call_async(self, client, method, fields=None):
+        """call_async(client, method, fields=None) -> call() through an
+        AsyncBungieClient
+
+        Refreshes run in a worker thread, off the event loop.
+        """
+
+        import asyncio
+
+        call_url = api.BUNGIE_NET_ROOT + '/Platform' + method
+        token, headers = self._state
+
+        if headers is None or (token.refresh_token is not None and
+                               token.expires_within(self.refresh_margin)):
+            token, headers = await asyncio.to_thread(self._current)
+
+        async def fetch(headers):
+            headers = dict(headers, **client._headers())
+            return await client._fetch_json(call_url, headers, fields)
+
+        try:
+            envelope = await fetch(headers)
+        except urllib.error.HTTPError as error:
+            if error.code != 401 or token.refresh_token is None:
+                raise
+        else:
+            if not self._refused(envelope):
+                return envelope
+
+        token, headers = await asyncio.to_thread(self.refresh, token)
+
+        return await fetch(headers)
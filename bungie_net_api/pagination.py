@@ -0,0 +1,108 @@
+""" Paginated iteration over activity history for the Bungie.net API module """
+
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from . import api
+from . import scheduler
+
+# getActivityHistory() returns one page of at most 250 activities.
+# iter_activity_history() walks every page for a character and mode,
+# newest first, yielding one activity at a time.  The next page is fetched
+# in the background while the current one is consumed, and only those two
+# pages are held in memory.
+#
+#   for activity in iter_activity_history(member_id, '2', character_id
+#                                         , mode='5', until=season_start):
+#       ...
+#
+# AsyncBungieClient.iter_activity_history() is the async iterator version.
+
+MAX_PAGE_SIZE = 250
+
+_PERIOD_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+
+def parse_period(period):
+    """parse_period(period) -> aware UTC datetime"""
+
+    return datetime.datetime.strptime(period, _PERIOD_FORMAT).replace(
+        tzinfo=datetime.timezone.utc)
+
+
+def as_utc(until):
+    """as_utc(until) -> aware UTC datetime or None"""
+
+    if until is None:
+        return None
+
+    if isinstance(until, str):
+        return parse_period(until)
+
+    if until.tzinfo is None:
+        return until.replace(tzinfo=datetime.timezone.utc)
+
+    return until
+
+
+def page_activities(page):
+    """page_activities(page) -> list of activities, raising on API errors"""
+
+    if page.get('ErrorCode', 1) != 1:
+        raise api.BungieAPIError.from_envelope(page)
+
+    return (page.get('Response') or {}).get('activities') or []
+
+
+def older_than(activity, until):
+    """older_than(activity, until)"""
+
+    return until is not None and parse_period(activity['period']) < until
+
+
+def iter_activity_history(destiny_membership_id=None, membership_type=None
+                          , character_id=None, mode=None
+                          , count=MAX_PAGE_SIZE, until=None, prefetch=True):
+    """iter_activity_history() -> iterator of activities, newest first
+
+    Stops at the end of the history or at the first activity older than
+    until (a datetime or an ISO 8601 period string).
+    """
+
+    until = as_utc(until)
+    count = int(count)
+
+    def fetch(page):
+        return page_activities(api.getActivityHistory(
+            destiny_membership_id, membership_type, character_id, mode=mode
+            , count=str(count), page=str(page)))
+
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+    pending = None
+    page = 0
+
+    try:
+        activities = fetch(page)
+
+        while activities:
+            if executor is not None and len(activities) == count:
+                pending = scheduler.submit(executor, fetch, page + 1)
+
+            for activity in activities:
+                if older_than(activity, until):
+                    return
+                yield activity
+
+            if len(activities) < count:
+                return
+
+            page += 1
+            if pending is not None:
+                activities, pending = pending.result(), None
+            else:
+                activities = fetch(page)
+    finally:
+        if pending is not None:
+            pending.cancel()
+        if executor is not None:
+            executor.shutdown(wait=False)
@@ -0,0 +1,173 @@
+""" Bulk Post Game Carnage Report fetching for the Bungie.net API module """
+
+import itertools
+import json
+import sqlite3
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from . import api
+from . import decoders
+from . import scheduler
+
+# A Post Game Carnage Report never changes once the activity is over and is
+# shared by every player in it.  PGCRStore keeps reports in a SQLite file as
+# zlib compressed compact JSON, keyed by activity id.  fetch_pgcrs() takes
+# any iterable of activity ids, skips the ones already stored (or already
+# seen in the same run), fetches the rest through a bounded pool of worker
+# threads and writes them to the store as they arrive:
+#
+#   store = PGCRStore('pgcr.sqlite3')
+#   for activity_id, report in fetch_pgcrs(activity_ids, store):
+#       ...
+
+DEFAULT_WORKERS = 8
+DEFAULT_COMMIT_EVERY = 200
+
+
+class PGCRStore(object):
+    """PGCRStore(path)"""
+
+    def __init__(self, path):
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS pgcr (
+                activity_id INTEGER PRIMARY KEY,
+                report BLOB NOT NULL)""")
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM pgcr").fetchone()[0]
+
+    def __contains__(self, activity_id):
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM pgcr WHERE activity_id = ?"
+                                    , (int(activity_id),)).fetchone() \
+                is not None
+
+    def get(self, activity_id):
+        """get(activity_id) -> report dict or None"""
+
+        with self._lock:
+            row = self._db.execute("SELECT report FROM pgcr"
+                                   " WHERE activity_id = ?"
+                                   , (int(activity_id),)).fetchone()
+
+        if row is None:
+            return None
+
+        return decoders.decode(zlib.decompress(row[0]))
+
+    def put(self, activity_id, report, commit=True):
+        """put(activity_id, report, commit=True)"""
+
+        blob = zlib.compress(json.dumps(report, separators=(',', ':'))
+                             .encode('utf-8'))
+
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO pgcr VALUES (?, ?)"
+                             , (int(activity_id), blob))
+            if commit:
+                self._db.commit()
+
+    def commit(self):
+        """commit()"""
+
+        with self._lock:
+            self._db.commit()
+
+    def activity_ids(self):
+        """activity_ids() -> iterator of stored activity ids"""
+
+        with self._lock:
+            rows = self._db.execute("SELECT activity_id FROM pgcr"
+                                    " ORDER BY activity_id").fetchall()
+
+        return (row[0] for row in rows)
+
+    def close(self):
+        """close()"""
+
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+
+
+def _fetch_report(activity_id):
+    """_fetch_report(activity_id) -> report"""
+
+    envelope = api.get_activity_stats(str(activity_id))
+
+    if envelope.get('ErrorCode', 1) != 1:
+        raise api.BungieAPIError.from_envelope(envelope)
+
+    return envelope['Response']
+
+
+def fetch_pgcrs(activity_ids, store=None, workers=DEFAULT_WORKERS
+                , skip_errors=False, commit_every=DEFAULT_COMMIT_EVERY):
+    """fetch_pgcrs(activity_ids, store=None, workers=8) -> iterator of
+    (activity_id, report)
+
+    Yields only the reports fetched in this run, in request order.  At
+    most 2 * workers requests are queued at a time, so activity_ids can be a
+    lazy iterable of any length.  With skip_errors, ids whose report could
+    not be fetched are dropped instead of raising.
+    """
+
+    seen = set()
+
+    def wanted():
+        for activity_id in activity_ids:
+            activity_id = int(activity_id)
+            if activity_id in seen:
+                continue
+            seen.add(activity_id)
+            if store is not None and activity_id in store:
+                continue
+            yield activity_id
+
+    pending_ids = wanted()
+    in_flight = deque()
+    uncommitted = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            for activity_id in itertools.islice(pending_ids, 2 * workers):
+                in_flight.append((activity_id, scheduler.submit(
+                    executor, _fetch_report, activity_id)))
+
+            while in_flight:
+                activity_id, future = in_flight.popleft()
+
+                for next_id in itertools.islice(pending_ids, 1):
+                    in_flight.append((next_id, scheduler.submit(
+                        executor, _fetch_report, next_id)))
+
+                try:
+                    report = future.result()
+                except Exception:
+                    if not skip_errors:
+                        raise
+                    if api.DEBUG:
+                        print("DEBUG: fetch_pgcrs() failed", activity_id)
+                    continue
+
+                if store is not None:
+                    store.put(activity_id, report, commit=False)
+                    uncommitted += 1
+                    if uncommitted >= commit_every:
+                        store.commit()
+                        uncommitted = 0
+
+                yield activity_id, report
+        finally:
+            for _, future in in_flight:
+                future.cancel()
+            if store is not None and uncommitted:
+                store.commit()
@@ -0,0 +1,270 @@
+""" Process pool ingestion pipeline for the Bungie.net API module """
+
+import asyncio
+import itertools
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from . import async_client
+from . import endpoints
+from . import projection
+
+# Once fetching is concurrent, decoding and reducing large getProfile() and
+# PGCR bodies becomes the bottleneck, and the GIL keeps it on one core.
+# Pipeline splits an ingestion run in three stages:
+#
+#   fetch    AsyncBungieClient.fetch_body() on one event loop, raw bytes
+#   process  a process pool decodes each body (projected onto fields) and
+#            applies process(envelope) to it
+#   merge    results are handed out in input order
+#
+# Items move through a window of max_pending: when the fetchers outrun the
+# workers (or the consumer), fetching pauses instead of piling up bodies.
+# At most max_pending items are held at once, each as its raw body until a
+# worker has decoded it and then as its result until the consumer takes it;
+# only 2 * workers of those bodies are handed to the pool at a time.
+#
+#   def kills(envelope):
+#       return sum(entry['values']['kills']['basic']['value']
+#                  for entry in envelope['Response']['entries'])
+#
+#   with Pipeline(kills, workers=4) as pipeline:
+#       for activity_id, total in process_pgcrs(activity_ids
+#                                               , pipeline=pipeline):
+#           ...
+#
+# process runs in the workers, so it must be a module level function (not a
+# lambda or closure), and what it returns must be picklable.
+
+DEFAULT_MAX_CONCURRENCY = 32
+DEFAULT_MAX_PENDING = 128
+
+
+def _process(process, body, fields):
+    """_process(process, body, fields) -> process(decoded body)
+
+    Runs in a worker process.
+    """
+
+    envelope = projection.decode(body, fields)
+
+    if process is None:
+        return envelope
+
+    return process(envelope)
+
+
+def profile_method(destiny_membership_id, membership_type, components):
+    """profile_method(destiny_membership_id, membership_type, components)
+    -> callBungieAPI() method of a getProfile() call"""
+
+    return endpoints.method('GetProfile', membershipType=membership_type
+                            , destinyMembershipId=destiny_membership_id
+                            , components=components)
+
+
+def pgcr_method(activity_id):
+    """pgcr_method(activity_id) -> callBungieAPI() method of a
+    get_activity_stats() call"""
+
+    return endpoints.method('GetPostGameCarnageReport', activityId=activity_id)
+
+
+class Pipeline(object):
+    """Pipeline(process=None, fields=None, workers=None, max_concurrency=32
+    , max_pending=128, skip_errors=False, client=None, executor=None)
+
+    process(envelope) is applied to every decoded body; without it the
+    envelopes themselves are returned.  workers defaults to the number of
+    CPUs.  client is an AsyncBungieClient to fetch with (one is made per
+    run otherwise) and executor an existing process pool.
+    """
+
+    def __init__(self, process=None, fields=None, workers=None
+                 , max_concurrency=DEFAULT_MAX_CONCURRENCY
+                 , max_pending=DEFAULT_MAX_PENDING, skip_errors=False
+                 , client=None, executor=None):
+
+        self.process = process
+        self.fields = tuple(fields) if fields is not None else None
+        self.workers = workers or os.cpu_count() or 1
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.skip_errors = skip_errors
+        self.client = client
+
+        self._executor = executor
+        self._owns_executor = executor is None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """close()"""
+
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _pool(self):
+        """_pool() -> the process pool, started on first use"""
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.workers)
+
+        return self._executor
+
+    async def _outcomes(self, methods):
+        """_outcomes(methods) -> async iterator of (result, error), in the
+        order of methods"""
+
+        loop = asyncio.get_running_loop()
+        client = self.client or async_client.AsyncBungieClient(
+            max_concurrency=self.max_concurrency)
+        executor = self._pool()
+        decoding = asyncio.Semaphore(2 * self.workers)
+
+        async def item(method):
+            body = await client.fetch_body(method)
+            async with decoding:
+                return await loop.run_in_executor(executor, _process
+                                                  , self.process, body
+                                                  , self.fields)
+
+        methods = iter(methods)
+        window = deque()
+
+        try:
+            while True:
+                for method in itertools.islice(
+                        methods, self.max_pending - len(window)):
+                    window.append(asyncio.ensure_future(item(method)))
+
+                if not window:
+                    return
+
+                task = window.popleft()
+                try:
+                    outcome = (await task, None)
+                except Exception as error:
+                    outcome = (None, error)
+                yield outcome
+        finally:
+            for task in window:
+                task.cancel()
+            if window:
+                await asyncio.gather(*window, return_exceptions=True)
+            if self.client is None:
+                client.close()
+
+    async def map_async(self, methods):
+        """map_async(methods) -> async iterator of results, in the order of
+        methods
+
+        methods are callBungieAPI() methods, e.g. pgcr_method(activity_id).
+        A failed item raises, or is left out with skip_errors.
+        """
+
+        outcomes = self._outcomes(methods)
+
+        try:
+            async for result, error in outcomes:
+                if error is None:
+                    yield result
+                elif not self.skip_errors:
+                    raise error
+        finally:
+            await outcomes.aclose()
+
+    def map(self, methods):
+        """map(methods) -> iterator of results, in the order of methods
+
+        Runs its own event loop, which only advances while the next result
+        is awaited.
+        """
+
+        return _drive(self.map_async(methods))
+
+    def _keyed(self, keys, method_for):
+        """_keyed(keys, method_for) -> iterator of (key, result)"""
+
+        pending = deque()
+
+        def methods():
+            for key in keys:
+                pending.append(key)
+                yield method_for(key)
+
+        async def keyed():
+            outcomes = self._outcomes(methods())
+            try:
+                async for result, error in outcomes:
+                    key = pending.popleft()
+                    if error is None:
+                        yield key, result
+                    elif not self.skip_errors:
+                        raise error
+            finally:
+                await outcomes.aclose()
+
+        return _drive(keyed())
+
+
+def _drive(iterator):
+    """_drive(iterator) -> synchronous iterator over an async iterator"""
+
+    loop = asyncio.new_event_loop()
+
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(iterator.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        loop.run_until_complete(iterator.aclose())
+        loop.close()
+
+
+def process_pgcrs(activity_ids, process=None, pipeline=None, **options):
+    """process_pgcrs(activity_ids, process=None, pipeline=None, **options)
+    -> iterator of (activity_id, result), in the order of activity_ids
+
+    process and options are Pipeline() arguments, used when no pipeline is
+    given.
+    """
+
+    return _run(pipeline, process, options, activity_ids, pgcr_method)
+
+
+def process_profiles(members, components, process=None, pipeline=None
+                     , **options):
+    """process_profiles(members, components, process=None, pipeline=None
+    , **options) -> iterator of ((membership_type, membership_id), result)
+
+    members are (membership_type, membership_id) pairs.
+    """
+
+    from . import roster
+
+    components = roster.canonical_components(components)
+
+    return _run(pipeline, process, options, members
+                , lambda member: profile_method(member[1], member[0]
+                                                , components))
+
+
+def _run(pipeline, process, options, keys, method_for):
+    """_run() -> iterator of (key, result) through pipeline, or through a
+    Pipeline(process, **options) closed at the end"""
+
+    if pipeline is not None:
+        yield from pipeline._keyed(keys, method_for)
+        return
+
+    with Pipeline(process, **options) as owned:
+        yield from owned._keyed(keys, method_for)
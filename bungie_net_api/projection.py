@@ -0,0 +1,260 @@
+""" Response projection for the Bungie.net API module """
+
+import io
+
+from . import decoders
+
+# A Projection keeps only the parts of a response a caller asked for.  Fields
+# are dotted paths into the response envelope; "*" matches every key of an
+# object or every element of a list, and a numeric part picks one element:
+#
+#   Projection(['Response.characters.data.*.classType'
+#               , 'Response.characters.data.*.characterId'])
+#
+# The result has the same shape as the full response, pruned down to the
+# selected fields, so code indexing into it does not change.  The envelope
+# fields (ErrorCode, ThrottleSeconds, ...) are always kept; the scheduler and
+# the cache look at them.
+#
+# By default the body is decoded in full with the configured decoder and
+# pruned straight away, so only the projected values outlive the call.  With
+# streaming=True (and ijson installed) the projection is applied while the
+# body is parsed and values outside the selected paths are never
+# materialized: peak memory drops to a fraction of the full decode, at the
+# cost of parsing through Python level events, which is several times slower
+# than orjson.
+
+ENVELOPE_FIELDS = ('ErrorCode', 'ErrorStatus', 'Message', 'MessageData'
+                   , 'ThrottleSeconds')
+
+# ijson events carrying a scalar value
+
+_SCALAR_EVENTS = frozenset(('null', 'boolean', 'integer', 'double', 'number'
+                            , 'string'))
+
+_MISSING = object()
+
+
+def _merge(first, second):
+    """_merge(first, second) -> union of two compiled path trees"""
+
+    if first is True or second is True:
+        return True
+
+    merged = dict(first)
+
+    for key, tree in second.items():
+        merged[key] = _merge(merged[key], tree) if key in merged else tree
+
+    return merged
+
+
+def _child(tree, key):
+    """_child(tree, key) -> the tree selecting below key, or None"""
+
+    if tree is True:
+        return True
+
+    exact = tree.get(key)
+    wildcard = tree.get('*')
+
+    if exact is None:
+        return wildcard
+    if wildcard is None:
+        return exact
+
+    return _merge(exact, wildcard)
+
+
+def compile_fields(fields):
+    """compile_fields(fields) -> nested dict of path parts, True at leaves"""
+
+    tree = {}
+
+    for field in fields:
+        parts = field.split('.')
+        node = tree
+        for part in parts[:-1]:
+            child = node.get(part)
+            if child is True:
+                break
+            if child is None:
+                child = node[part] = {}
+            node = child
+        else:
+            node[parts[-1]] = True
+
+    return tree
+
+
+class Projection(object):
+    """Projection(fields, envelope=True, streaming=False)
+
+    fields is an iterable of dotted field paths; with envelope set the
+    response envelope fields are always included.
+    """
+
+    def __init__(self, fields, envelope=True, streaming=False):
+        if isinstance(fields, str):
+            fields = [fields]
+
+        self.fields = tuple(sorted(set(fields)))
+        self.envelope = envelope
+        self.streaming = streaming
+
+        if envelope:
+            fields = self.fields + ENVELOPE_FIELDS
+        else:
+            fields = self.fields
+
+        self.tree = compile_fields(fields)
+
+    def key(self):
+        """key() -> string identifying the projection"""
+
+        return ','.join(self.fields) + (';envelope' if self.envelope else '')
+
+    def apply(self, document):
+        """apply(document) -> document pruned to the projected fields"""
+
+        selected = _select(document, self.tree)
+
+        return None if selected is _MISSING else selected
+
+    def decode(self, data):
+        """decode(data) -> projection of a JSON bytes body"""
+
+        if not self.streaming or decoders.ijson is None:
+            return self.apply(decoders.decode(data))
+
+        return self.parse(io.BytesIO(data))
+
+    def parse(self, stream):
+        """parse(stream) -> projection of a JSON file-like body"""
+
+        if not self.streaming or decoders.ijson is None:
+            return self.apply(decoders.decode(stream.read()))
+
+        return _build(decoders.ijson.parse(stream, use_float=True), self.tree)
+
+
+def projection(fields):
+    """projection(fields) -> Projection, or None for fields=None
+
+    fields may already be a Projection.
+    """
+
+    if fields is None or isinstance(fields, Projection):
+        return fields
+
+    return Projection(fields)
+
+
+def decode(data, fields=None):
+    """decode(data, fields=None) -> parsed JSON bytes, projected onto fields"""
+
+    if fields is None:
+        return decoders.decode(data)
+
+    return projection(fields).decode(data)
+
+
+def project(document, fields):
+    """project(document, fields) -> document pruned to fields"""
+
+    return projection(fields).apply(document)
+
+
+def _select(node, tree):
+    """_select(node, tree) -> node pruned to tree, or _MISSING"""
+
+    if tree is True:
+        return node
+
+    if isinstance(node, dict):
+        selected = {}
+        if '*' in tree:
+            for key, value in node.items():
+                value = _select(value, _child(tree, key))
+                if value is not _MISSING:
+                    selected[key] = value
+        else:
+            for key, subtree in tree.items():
+                if key in node:
+                    value = _select(node[key], subtree)
+                    if value is not _MISSING:
+                        selected[key] = value
+        return selected
+
+    if isinstance(node, list):
+        selected = []
+        for index, value in enumerate(node):
+            subtree = _child(tree, str(index))
+            if subtree is not None:
+                value = _select(value, subtree)
+                if value is not _MISSING:
+                    selected.append(value)
+        return selected
+
+    return _MISSING
+
+
+class _Frame(object):
+    """_Frame(container, tree)"""
+
+    __slots__ = ('container', 'tree', 'key', 'index')
+
+    def __init__(self, container, tree):
+        self.container = container
+        self.tree = tree
+        self.key = None
+        self.index = 0
+
+    def child_tree(self):
+        """child_tree() -> tree of the next value in this container"""
+
+        if self.tree is None:
+            return None
+
+        if self.key is not None:
+            return _child(self.tree, self.key)
+
+        self.index += 1
+        return _child(self.tree, str(self.index - 1))
+
+    def add(self, value):
+        """add(value)"""
+
+        if self.key is not None:
+            self.container[self.key] = value
+        else:
+            self.container.append(value)
+
+
+def _build(events, tree):
+    """_build(events, tree) -> projection of an ijson event stream"""
+
+    root = _Frame([], {'0': tree})
+    stack = [root]
+
+    for _, event, value in events:
+        frame = stack[-1]
+
+        if event == 'map_key':
+            frame.key = value
+        elif event in _SCALAR_EVENTS:
+            subtree = frame.child_tree()
+            if subtree is True:
+                frame.add(value)
+        elif event == 'start_map' or event == 'start_array':
+            subtree = frame.child_tree()
+            if subtree is None:
+                stack.append(_Frame(None, None))
+            else:
+                container = {} if event == 'start_map' else []
+                frame.add(container)
+                stack.append(_Frame(container, subtree))
+        else:
+            stack.pop()
+
+    return root.container[0] if root.container else None
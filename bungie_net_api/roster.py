@@ -0,0 +1,122 @@
+""" Clan roster fan-out for the Bungie.net API module """
+
+from concurrent.futures import ThreadPoolExecutor
+
+from . import api
+from . import endpoints
+from . import scheduler
+
+# get_clan_roster() lists every member of a group (clan) and fetches each
+# member's profile concurrently, with the union of the requested components
+# in a single getProfile() call per member.  Members are keyed by
+# (membershipType, membershipId), so a member listed twice costs one
+# request.
+#
+#   roster = get_clan_roster(clan_id, components=['Profiles', 'Characters'
+#                                                 , 'CharacterEquipment'])
+#   for member in roster['members']:
+#       print(member['displayName'], list(member['characters']))
+
+DEFAULT_COMPONENTS = ('Profiles', 'Characters')
+DEFAULT_WORKERS = 16
+
+
+def canonical_components(*component_lists):
+    """canonical_components(*component_lists) -> 'A,B,...'
+
+    Union of component names or numbers, de-duplicated and sorted so equal
+    requests produce identical URLs.
+    """
+
+    union = set()
+
+    for components in component_lists:
+        if not components:
+            continue
+        if isinstance(components, str):
+            components = components.split(',')
+        union.update(str(component).strip() for component in components)
+
+    union.discard('')
+
+    return ','.join(sorted(union))
+
+
+def iter_group_members(group_id):
+    """iter_group_members(group_id) -> iterator of member entries"""
+
+    return endpoints.iterate('GetMembersOfGroup', groupId=group_id)
+
+
+def _member_key(member):
+    """_member_key(member) -> (membershipType, membershipId)"""
+
+    info = member['destinyUserInfo']
+
+    return str(info['membershipType']), str(info['membershipId'])
+
+
+def _fetch_member(membership_type, membership_id, components):
+    """_fetch_member() -> {'response': ..., 'error': ...}
+
+    A failed call is recorded as the member's error, so one member does not
+    fail the whole roster.
+    """
+
+    try:
+        envelope = api.getProfile(membership_id, membership_type, components)
+    except Exception as error:
+        return {'response': None, 'error': str(error)}
+
+    if envelope.get('ErrorCode', 1) != 1:
+        return {'response': None
+                , 'error': str(api.BungieAPIError.from_envelope(envelope))}
+
+    return {'response': envelope['Response'], 'error': None}
+
+
+def get_clan_roster(group_id, components=DEFAULT_COMPONENTS
+                    , workers=DEFAULT_WORKERS):
+    """get_clan_roster(group_id, components, workers=16) -> roster dict
+
+    {'groupId': group_id,
+     'components': 'Characters,Profiles',
+     'members': [{'membershipType': '2', 'membershipId': '...',
+                  'displayName': '...', 'isOnline': False,
+                  'profile': Response.profile.data,
+                  'characters': {characterId: character, ...},
+                  'response': the whole profile Response,
+                  'error': None or the error of this member's call}, ...]}
+    """
+
+    components = canonical_components(components, 'Characters')
+    members = iter_group_members(group_id)
+
+    unique = {}
+    for member in members:
+        unique.setdefault(_member_key(member), member)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        requests = dict((key, scheduler.submit(
+            executor, _fetch_member, key[0], key[1], components))
+            for key in unique)
+        results = dict((key, future.result())
+                       for key, future in requests.items())
+
+    roster = []
+    for key, member in unique.items():
+        result = results[key]
+        response = result['response'] or {}
+
+        roster.append({
+            'membershipType': key[0],
+            'membershipId': key[1],
+            'displayName': member['destinyUserInfo'].get('displayName'),
+            'isOnline': member.get('isOnline'),
+            'profile': (response.get('profile') or {}).get('data'),
+            'characters': (response.get('characters') or {}).get('data') or {},
+            'response': result['response'],
+            'error': result['error'],
+        })
+
+    return {'groupId': group_id, 'components': components, 'members': roster}
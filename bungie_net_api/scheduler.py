@@ -0,0 +1,310 @@
+""" Rate limited request scheduler for the Bungie.net API module """
+
+import contextlib
+import contextvars
+import random
+import socket
+import threading
+import time
+import urllib.error
+
+# Bungie.net enforces a request rate per application (API key) and answers
+# with a throttling ErrorCode and a ThrottleSeconds hint once it is exceeded.
+# The Scheduler keeps one token bucket per API key so calls stay under that
+# ceiling, pauses the bucket for ThrottleSeconds when the server asks for
+# it, and retries throttled and transient failures with jittered
+# exponential backoff.  Interactive calls are served before background ones:
+#
+#   with scheduler.background():
+#       crawl_clan_history()
+#
+# The priority lives in a contextvar, which thread pools do not carry over;
+# work handed to an executor goes through submit() to keep it.
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+DEFAULT_RATE = 25.0
+DEFAULT_BURST = 25
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+DEFAULT_MAX_BACKOFF = 30.0
+
+# PlatformErrorCodes meaning "slow down"; 52 and 53 between them are
+# AuthContextCacheAssertion and ExPlatformStringValidationError, which are not.
+
+THROTTLE_ERROR_NAMES = {
+    31: 'ThrottleLimitExceeded',
+    35: 'ThrottleLimitExceededMinutes',
+    36: 'ThrottleLimitExceededMomentarily',
+    37: 'ThrottleLimitExceededSeconds',
+    51: 'PerEndpointRequestThrottleExceeded',
+    54: 'PerApplicationThrottleExceeded',
+    55: 'PerApplicationAnonymousThrottleExceeded',
+    56: 'PerApplicationAuthenticatedThrottleExceeded',
+    57: 'PerUserThrottleExceeded',
+    1672: 'DestinyThrottledByGameServer',
+}
+
+THROTTLE_ERROR_CODES = frozenset(THROTTLE_ERROR_NAMES)
+
+TRANSIENT_HTTP_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+_priority = contextvars.ContextVar('bungie_net_api_priority'
+                                   , default=INTERACTIVE)
+
+
+@contextlib.contextmanager
+def background():
+    """background()
+
+    Context manager marking the calls made inside it (in this thread or
+    task) as background work.
+    """
+
+    token = _priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    """current_priority() -> INTERACTIVE or BACKGROUND"""
+
+    return _priority.get()
+
+
+def submit(executor, fn, *args):
+    """submit(executor, fn, *args) -> executor.submit(fn, *args)
+
+    Runs fn in a copy of the caller's context, so that worker threads keep
+    the caller's priority.
+    """
+
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+
+class TokenBucket(object):
+    """TokenBucket(rate, burst)
+
+    rate tokens per second, holding at most burst tokens.  A background
+    caller is only served while no interactive caller is waiting.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.rate = float(rate)
+        self.burst = float(burst)
+
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiting = [0, 0]
+        self._condition = threading.Condition()
+
+    def pause(self, seconds):
+        """pause(seconds)"""
+
+        with self._condition:
+            self._paused_until = max(self._paused_until
+                                     , time.monotonic() + seconds)
+            # tokens accrue again from the end of the pause, not during it
+            self._tokens = 0.0
+            self._updated = self._paused_until
+
+    def _take(self, priority):
+        """_take(priority) -> 0 when a token was taken, else seconds to wait"""
+
+        now = time.monotonic()
+
+        if now < self._paused_until:
+            return self._paused_until - now
+
+        self._tokens = min(self.burst
+                           , self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+        if priority == BACKGROUND and self._waiting[INTERACTIVE]:
+            return 1.0 / self.rate
+
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return 0
+
+        return (1.0 - self._tokens) / self.rate
+
+    def acquire(self, priority=INTERACTIVE):
+        """acquire(priority=INTERACTIVE)"""
+
+        with self._condition:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    delay = self._take(priority)
+                    if not delay:
+                        return
+                    self._condition.wait(delay)
+            finally:
+                self._waiting[priority] -= 1
+                self._condition.notify_all()
+
+    async def acquire_async(self, priority=INTERACTIVE):
+        """acquire_async(priority=INTERACTIVE)"""
+
+        import asyncio
+
+        with self._condition:
+            self._waiting[priority] += 1
+        try:
+            while True:
+                with self._condition:
+                    delay = self._take(priority)
+                if not delay:
+                    return
+                await asyncio.sleep(delay)
+        finally:
+            with self._condition:
+                self._waiting[priority] -= 1
+                self._condition.notify_all()
+
+
+class Scheduler(object):
+    """Scheduler(rate=25, burst=25, max_retries=3, backoff=0.5
+                 , max_backoff=30)
+
+    execute() runs fn(*args), which must return (response, envelope), under
+    the token bucket of api_key and retries it when the envelope or the HTTP
+    status says the failure was transient.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST
+                 , max_retries=DEFAULT_MAX_RETRIES, backoff=DEFAULT_BACKOFF
+                 , max_backoff=DEFAULT_MAX_BACKOFF):
+
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.retries = 0
+        self.throttled = 0
+
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, api_key):
+        """bucket(api_key) -> TokenBucket"""
+
+        bucket = self._buckets.get(api_key)
+
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get(api_key)
+                if bucket is None:
+                    bucket = TokenBucket(self.rate, self.burst)
+                    self._buckets[api_key] = bucket
+
+        return bucket
+
+    def _delay(self, attempt, throttle_seconds=0):
+        """_delay(attempt, throttle_seconds) -> seconds to sleep"""
+
+        # full jitter keeps retrying clients from synchronizing
+
+        backoff = min(self.max_backoff, self.backoff * (2 ** attempt))
+
+        return max(throttle_seconds, random.uniform(0, backoff))
+
+    def _classify(self, bucket, result):
+        """_classify(bucket, result) -> seconds to wait before a retry or None"""
+
+        response, envelope = result
+
+        if not isinstance(envelope, dict):
+            return None
+
+        throttle_seconds = envelope.get('ThrottleSeconds') or 0
+
+        if throttle_seconds > 0:
+            bucket.pause(throttle_seconds)
+
+        if envelope.get('ErrorCode') in THROTTLE_ERROR_CODES:
+            with self._lock:
+                self.throttled += 1
+            return throttle_seconds
+
+        return None
+
+    def _retryable(self, error):
+        """_retryable(error) -> Retry-After seconds, 0, or None"""
+
+        if isinstance(error, urllib.error.HTTPError):
+            if error.code not in TRANSIENT_HTTP_STATUSES:
+                return None
+            try:
+                return float(error.headers.get('Retry-After') or 0)
+            except ValueError:
+                return 0
+
+        if isinstance(error, (urllib.error.URLError, ConnectionError
+                              , socket.timeout)):
+            return 0
+
+        return None
+
+    def execute(self, fn, api_key, *args):
+        """execute(fn, api_key, *args) -> fn(*args)"""
+
+        bucket = self.bucket(api_key)
+        priority = current_priority()
+        attempt = 0
+
+        while True:
+            bucket.acquire(priority)
+            try:
+                result = fn(*args)
+            except Exception as error:
+                retry_after = self._retryable(error)
+                if retry_after is None or attempt >= self.max_retries:
+                    raise
+                wait = self._delay(attempt, retry_after)
+            else:
+                throttle_seconds = self._classify(bucket, result)
+                if throttle_seconds is None or attempt >= self.max_retries:
+                    return result
+                wait = self._delay(attempt, throttle_seconds)
+
+            with self._lock:
+                self.retries += 1
+            attempt += 1
+            time.sleep(wait)
+
+    async def execute_async(self, fn, api_key, *args):
+        """execute_async(fn, api_key, *args) -> await fn(*args)"""
+
+        import asyncio
+
+        bucket = self.bucket(api_key)
+        priority = current_priority()
+        attempt = 0
+
+        while True:
+            await bucket.acquire_async(priority)
+            try:
+                result = await fn(*args)
+            except Exception as error:
+                retry_after = self._retryable(error)
+                if retry_after is None or attempt >= self.max_retries:
+                    raise
+                wait = self._delay(attempt, retry_after)
+            else:
+                throttle_seconds = self._classify(bucket, result)
+                if throttle_seconds is None or attempt >= self.max_retries:
+                    return result
+                wait = self._delay(attempt, throttle_seconds)
+
+            with self._lock:
+                self.retries += 1
+            attempt += 1
+            await asyncio.sleep(wait)
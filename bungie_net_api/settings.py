@@ -0,0 +1,138 @@
+""" Lazily resolved settings for the Bungie.net API module """
+
+import os
+import os.path
+import threading
+
+# Settings come from, in order of precedence: values passed to Settings()
+# (or api.configure()), environment variables, and the ini style file at
+# $BUNGIE_NET_API_CONFIG or $HOME/CONFIG_FILE_NAME.  Nothing is read until a
+# value is first needed, so importing the package never touches the disk.
+#
+# put a BungieNet API-KEY obtained from https://www.bungie.net/en-US/User/API
+# into the file's [api] section, or export BUNGIE_NET_API_KEY.
+
+CONFIG_FILE_NAME = '.bungie_net_api.rc'
+
+CONFIG_FILE = (os.path.join(os.path.expanduser("~"), CONFIG_FILE_NAME))
+
+CONFIG_FILE_ENVIRONMENT = 'BUNGIE_NET_API_CONFIG'
+
+
+def _flag(value):
+    """_flag(value) -> bool"""
+
+    if isinstance(value, str):
+        return value.strip().lower() not in ('', '0', 'false', 'no', 'off')
+
+    return bool(value)
+
+
+# name: (ini section, ini option, environment variable, type)
+
+OPTIONS = {
+    'api_key': ('api', 'API-KEY', 'BUNGIE_NET_API_KEY', str),
+    'debug': ('default', 'debug', 'BUNGIE_NET_API_DEBUG', _flag),
+    'keep_alive': ('transport', 'keep_alive', 'BUNGIE_NET_API_KEEP_ALIVE'
+                   , _flag),
+    'pool_size': ('transport', 'pool_size', 'BUNGIE_NET_API_POOL_SIZE', int),
+    'idle_timeout': ('transport', 'idle_timeout'
+                     , 'BUNGIE_NET_API_IDLE_TIMEOUT', float),
+    'compress': ('transport', 'compress', 'BUNGIE_NET_API_COMPRESS', _flag),
+    'scheduler': ('scheduler', 'enabled', 'BUNGIE_NET_API_SCHEDULER', _flag),
+    'rate': ('scheduler', 'rate', 'BUNGIE_NET_API_RATE', float),
+    'burst': ('scheduler', 'burst', 'BUNGIE_NET_API_BURST', int),
+    'max_retries': ('scheduler', 'max_retries', 'BUNGIE_NET_API_MAX_RETRIES'
+                    , int),
+    'decoder': ('default', 'decoder', 'BUNGIE_NET_API_DECODER', str),
+    'token_url': ('oauth', 'token_url', 'BUNGIE_NET_API_TOKEN_URL', str),
+    'client_id': ('oauth', 'client_id', 'BUNGIE_NET_API_CLIENT_ID', str),
+    'client_secret': ('oauth', 'client_secret', 'BUNGIE_NET_API_CLIENT_SECRET'
+                      , str),
+}
+
+
+class ConfigurationError(Exception):
+    """ConfigurationError(message)"""
+
+
+class Settings(object):
+    """Settings(config_file=None, **values)
+
+    values are any of the OPTIONS names, e.g.
+    Settings(api_key='0123...', pool_size=20).
+    """
+
+    def __init__(self, config_file=None, **values):
+        unknown = set(values) - set(OPTIONS)
+
+        if unknown:
+            raise TypeError('unknown settings: ' + ', '.join(sorted(unknown)))
+
+        self.config_file = config_file
+
+        self._values = dict((name, value) for name, value in values.items()
+                            if value is not None)
+        self._parser = None
+        self._lock = threading.Lock()
+
+    def _file(self):
+        """_file() -> ConfigParser for the config file, read once"""
+
+        if self._parser is None:
+            with self._lock:
+                if self._parser is None:
+                    import configparser
+
+                    parser = configparser.ConfigParser()
+                    parser.read(self.config_file
+                                or os.environ.get(CONFIG_FILE_ENVIRONMENT)
+                                or CONFIG_FILE)
+                    self._parser = parser
+
+        return self._parser
+
+    def get(self, name, fallback=None):
+        """get(name, fallback=None)"""
+
+        section, option, environment, kind = OPTIONS[name]
+
+        if name in self._values:
+            return kind(self._values[name])
+
+        value = os.environ.get(environment)
+
+        if value is None:
+            value = self._file().get(section, option, fallback=None)
+
+        if value is None:
+            return fallback
+
+        return kind(value)
+
+    def options(self, *names):
+        """options(*names) -> {name: value} for the names that are set"""
+
+        options = {}
+
+        for name in names:
+            value = self.get(name)
+            if value is not None:
+                options[name] = value
+
+        return options
+
+    @property
+    def api_key(self):
+        """the API key, raising ConfigurationError when none is configured"""
+
+        api_key = self.get('api_key')
+
+        if not api_key:
+            raise ConfigurationError(
+                'no Bungie.net API key: pass api_key, set BUNGIE_NET_API_KEY'
+                ' or add an [api] API-KEY entry to ' + (
+                    self.config_file or os.environ.get(CONFIG_FILE_ENVIRONMENT)
+                    or CONFIG_FILE))
+
+        return api_key
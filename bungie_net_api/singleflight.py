@@ -0,0 +1,153 @@
+""" Request coalescing (single-flight) for the Bungie.net API module """
+
+import hashlib
+import threading
+import urllib.parse
+
+# When several threads or tasks ask for the same resource at the same time,
+# SingleFlight lets the first caller (the leader) issue the request and hands
+# its parsed result, or its exception, to every caller that arrived while it
+# was in flight.  Calls are identified by the canonical URL plus the
+# credentials sent with it, so users with different OAuth tokens never share
+# a response.
+#
+# Coalesced callers receive the same parsed object; treat API results as
+# read-only or copy them before modifying.
+
+_KEY_HEADERS = ('X-API-Key', 'Authorization', 'If-None-Match')
+
+# result of an async call whose leader was cancelled before it finished
+
+_LEADER_CANCELLED = object()
+
+
+def canonical_url(call_url):
+    """canonical_url(call_url) -> call_url with sorted query parameters"""
+
+    parts = urllib.parse.urlsplit(call_url)
+
+    if not parts.query:
+        return call_url
+
+    query = urllib.parse.urlencode(sorted(urllib.parse.parse_qsl(
+        parts.query, keep_blank_values=True)), safe=',')
+
+    return urllib.parse.urlunsplit((parts.scheme, parts.netloc, parts.path
+                                    , query, parts.fragment))
+
+
+def request_key(call_url, headers, projection=None):
+    """request_key(call_url, headers, projection=None) -> key identifying a
+    request
+
+    Requests for different projections of the same resource are not shared.
+    """
+
+    digest = hashlib.sha1()
+
+    for name in _KEY_HEADERS:
+        digest.update(((headers or {}).get(name) or '').encode('utf-8'))
+        digest.update(b'\0')
+
+    if projection is not None:
+        digest.update(projection.key().encode('utf-8'))
+
+    return canonical_url(call_url) + '#' + digest.hexdigest()
+
+
+class _Call(object):
+    """_Call()"""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """SingleFlight()"""
+
+    def __init__(self):
+        self.shared = 0
+
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._async_calls = {}
+
+    def do(self, key, fn, *args):
+        """do(key, fn, *args) -> fn(*args), shared with concurrent callers"""
+
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.shared += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args)
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
+
+    async def do_async(self, key, fn, *args):
+        """do_async(key, fn, *args) -> await fn(*args), shared with
+        concurrent tasks on the same event loop
+
+        When the leading task is cancelled, the tasks waiting for it are
+        not: the first of them calls fn(*args) again for the rest.
+        """
+
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+
+        while True:
+            calls = self._async_calls.setdefault(loop, {})
+            future = calls.get(key)
+
+            if future is None:
+                break
+
+            self.shared += 1
+            result = await asyncio.shield(future)
+            if result is not _LEADER_CANCELLED:
+                return result
+
+        future = calls[key] = loop.create_future()
+
+        try:
+            result = await fn(*args)
+        except asyncio.CancelledError:
+            # only the leader was cancelled; its followers elect a new one
+            future.set_result(_LEADER_CANCELLED)
+            raise
+        except BaseException as error:
+            future.set_exception(error)
+            # the leader re-raises; keep an unawaited future from warning
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            del calls[key]
+            if not calls:
+                self._async_calls.pop(loop, None)
+
+        return result
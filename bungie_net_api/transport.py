@@ -0,0 +1,776 @@
+""" HTTP transport for the Bungie.net API module """
+
+import http.client
+import io
+import os
+import socket
+import threading
+import time
+import urllib.error
+import urllib.parse
+import zlib
+from collections import deque
+
+# Every call into the Bungie.net API goes through a Transport.  The default
+# transport keeps a small pool of persistent (keep-alive) connections per
+# host so that consecutive calls to www.bungie.net skip the TCP and TLS
+# handshakes.  A different transport can be plugged in with set_transport().
+#
+# Responses are requested gzip or deflate compressed and decompressed as the
+# body arrives, CHUNK_SIZE bytes at a time, so the compressed body is never
+# held in full; open() hands out the decompressed stream itself, and
+# download() writes one straight to disk.
+#
+# Like urlopen(), redirects are followed (at most MAX_REDIRECTS) and the
+# http_proxy / https_proxy / no_proxy environment variables are honored:
+# plain HTTP goes through the proxy, HTTPS through a CONNECT tunnel.
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_IDLE_TIMEOUT = 60
+DEFAULT_TIMEOUT = 30
+
+ACCEPT_ENCODING = 'gzip, deflate'
+CHUNK_SIZE = 64 * 1024
+
+# urllib.request's limit
+MAX_REDIRECTS = 10
+
+REDIRECT_STATUSES = frozenset([301, 302, 303, 307, 308])
+
+# errors raised when a pooled connection was closed by the server while it
+# sat idle; the request is retried once on a fresh connection.
+
+_STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected,
+                            http.client.BadStatusLine,
+                            ConnectionResetError,
+                            ConnectionAbortedError,
+                            BrokenPipeError)
+
+
+class Decompressor(object):
+    """Decompressor(content_encoding)
+
+    Incremental decoder of a gzip or deflate body; identity for any other
+    content_encoding.
+    """
+
+    __slots__ = ('encoding', '_zlib', '_started', '_head')
+
+    def __init__(self, content_encoding):
+        self.encoding = (content_encoding or 'identity').strip().lower()
+        self._started = False
+        self._head = None
+
+        # gzip and zlib wrapped deflate are told apart by their header
+
+        if self.encoding in ('gzip', 'x-gzip', 'deflate'):
+            self._zlib = zlib.decompressobj(32 + zlib.MAX_WBITS)
+        else:
+            self._zlib = None
+
+        if self.encoding == 'deflate':
+            self._head = b''
+
+    def decompress(self, data):
+        """decompress(data) -> the decompressed bytes available so far"""
+
+        if self._zlib is None:
+            return data
+
+        self._started = True
+
+        if self._head is None:
+            return self._zlib.decompress(data)
+
+        # some servers send deflate without the zlib wrapper, which fails
+        # the two byte header check; the bytes before it are kept to start
+        # over with a raw inflater
+
+        self._head += data
+
+        try:
+            data = self._zlib.decompress(data)
+        except zlib.error:
+            self._zlib = zlib.decompressobj(-zlib.MAX_WBITS)
+            data = self._zlib.decompress(self._head)
+
+        if len(self._head) >= 2:
+            self._head = None
+
+        return data
+
+    def flush(self):
+        """flush() -> the remaining decompressed bytes
+
+        Raises zlib.error when a compressed body ended before its stream
+        did.
+        """
+
+        if self._zlib is None:
+            return b''
+
+        data = self._zlib.flush()
+
+        if self._started and not self._zlib.eof:
+            raise zlib.error('truncated ' + self.encoding + ' body')
+
+        return data
+
+
+def read_body(response, chunk_size=CHUNK_SIZE):
+    """read_body(response, chunk_size=CHUNK_SIZE) -> (decompressed body,
+    bytes received)"""
+
+    decompressor = Decompressor(response.getheader('Content-Encoding'))
+
+    if decompressor.encoding == 'identity':
+        data = response.read()
+        return data, len(data)
+
+    chunks = []
+    size = 0
+
+    while True:
+        chunk = response.read(chunk_size)
+        if not chunk:
+            break
+        size += len(chunk)
+        chunks.append(decompressor.decompress(chunk))
+
+    chunks.append(decompressor.flush())
+
+    return b''.join(chunks), size
+
+
+class Response(object):
+    """Response(url, status, reason, headers, body, timings=None, size=None)
+
+    body is decompressed; size is the number of bytes received for it
+    (len(body) by default).  timings maps request phases (dns, connect,
+    tls, first_byte, read) to seconds; see instrumentation.py.
+    """
+
+    __slots__ = ('url', 'status', 'reason', 'headers', 'body', 'timings'
+                 , 'size')
+
+    def __init__(self, url, status, reason, headers, body, timings=None
+                 , size=None):
+        self.url = url
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+        self.timings = timings
+        self.size = len(body) if size is None else size
+
+
+class StreamingResponse(object):
+    """StreamingResponse(transport, pool, conn, url, response)
+
+    Response whose body is read from the connection on demand, decompressed.
+    size counts the bytes received so far.
+    """
+
+    def __init__(self, transport, pool, conn, url, response, timings=None):
+        self.url = url
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+        self.timings = timings
+        self.size = 0
+
+        self._transport = transport
+        self._pool = pool
+        self._conn = conn
+        self._response = response
+        self._decompressor = Decompressor(
+            response.getheader('Content-Encoding'))
+        self._buffer = b''
+        self._eof = False
+
+    def _fill(self):
+        """_fill() -> False once the body is exhausted"""
+
+        while not self._buffer and not self._eof:
+            chunk = self._response.read(CHUNK_SIZE)
+            self.size += len(chunk)
+            if chunk:
+                self._buffer = self._decompressor.decompress(chunk)
+            else:
+                self._buffer = self._decompressor.flush()
+                self._eof = True
+
+        return bool(self._buffer)
+
+    def read(self, amt=None):
+        """read(amt=None) -> bytes"""
+
+        if amt is None or amt < 0:
+            chunks = []
+            while self._fill():
+                chunks.append(self._buffer)
+                self._buffer = b''
+            return b''.join(chunks)
+
+        if not self._fill():
+            return b''
+
+        data = self._buffer[:amt]
+        self._buffer = self._buffer[amt:]
+
+        return data
+
+    def readinto(self, buffer):
+        """readinto(buffer) -> number of bytes read"""
+
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+
+        return len(data)
+
+    def close(self):
+        """close()"""
+
+        if self._conn is None:
+            return
+
+        # a connection is only reusable once its body was read to the end
+
+        if self._response.isclosed():
+            self._transport._release(self._pool, self._conn
+                                     , self._response.will_close)
+        else:
+            self._conn.close()
+
+        self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _timed_connect(conn):
+    """_timed_connect(conn) -> socket, recording dns and connect into
+    conn.timings"""
+
+    # what socket.create_connection() does, with the lookup timed apart
+
+    start = time.perf_counter()
+    addresses = socket.getaddrinfo(conn.host, conn.port, 0
+                                   , socket.SOCK_STREAM)
+    resolved = time.perf_counter()
+    conn.timings['dns'] = resolved - start
+
+    error = None
+
+    for family, kind, proto, _, address in addresses:
+        sock = socket.socket(family, kind, proto)
+        try:
+            if conn.timeout is not socket._GLOBAL_DEFAULT_TIMEOUT:
+                sock.settimeout(conn.timeout)
+            if conn.source_address:
+                sock.bind(conn.source_address)
+            sock.connect(address)
+        except OSError as failure:
+            sock.close()
+            error = failure
+            continue
+        conn.timings['connect'] = time.perf_counter() - resolved
+        return sock
+
+    raise error or OSError('getaddrinfo returned no addresses for '
+                          + conn.host)
+
+
+class TimedHTTPConnection(http.client.HTTPConnection):
+    """TimedHTTPConnection(host, port=None, timeout=...)
+
+    HTTPConnection recording the time spent resolving and connecting in
+    timings.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timings = {}
+
+    def connect(self):
+        self.sock = _timed_connect(self)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self._tunnel_host:
+            self._tunnel()
+
+
+class TimedHTTPSConnection(http.client.HTTPSConnection):
+    """TimedHTTPSConnection(host, port=None, timeout=...)
+
+    HTTPSConnection recording the time spent resolving, connecting and in
+    the TLS handshake in timings.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timings = {}
+
+    def connect(self):
+        TimedHTTPConnection.connect(self)
+
+        handshake = time.perf_counter()
+        self.sock = self._context.wrap_socket(
+            self.sock, server_hostname=self._tunnel_host or self.host)
+        self.timings['tls'] = time.perf_counter() - handshake
+
+
+def proxy_for(scheme, host):
+    """proxy_for(scheme, host) -> proxy URL from the environment, or None"""
+
+    import urllib.request
+
+    if not host or urllib.request.proxy_bypass(host):
+        return None
+
+    return urllib.request.getproxies().get(scheme)
+
+
+def _parse_proxy(proxy):
+    """_parse_proxy(proxy) -> (host, port, Proxy-Authorization or None)"""
+
+    if '://' not in proxy:
+        proxy = 'http://' + proxy
+
+    parts = urllib.parse.urlsplit(proxy)
+    authorization = None
+
+    if parts.username is not None:
+        import base64
+
+        credentials = (urllib.parse.unquote(parts.username) + ':'
+                       + urllib.parse.unquote(parts.password or ''))
+        authorization = 'Basic ' + base64.b64encode(
+            credentials.encode('utf-8')).decode('ascii')
+
+    return parts.hostname, parts.port or 80, authorization
+
+
+class ConnectionPool(object):
+    """ConnectionPool(scheme, host, port, pool_size, idle_timeout, timeout
+    , proxy=None)
+
+    Thread safe pool of idle keep-alive connections to a single host.  At
+    most pool_size idle connections are kept; connections that have been idle
+    for longer than idle_timeout seconds are closed instead of reused.
+    proxy is the URL of an HTTP proxy to connect through.
+    """
+
+    def __init__(self, scheme, host, port=None, pool_size=DEFAULT_POOL_SIZE
+                 , idle_timeout=DEFAULT_IDLE_TIMEOUT
+                 , timeout=DEFAULT_TIMEOUT, proxy=None):
+
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.proxy = proxy
+        self.connections_opened = 0
+
+        # plain HTTP requests are sent to the proxy with absolute URLs and
+        # proxy_headers; HTTPS ones through a tunnel
+
+        self.proxy_headers = {}
+        self.absolute_form = proxy is not None and scheme != 'https'
+        self._address = (host, port)
+
+        if proxy is not None:
+            proxy_host, proxy_port, authorization = _parse_proxy(proxy)
+            self._address = (proxy_host, proxy_port)
+            if authorization is not None:
+                self.proxy_headers['Proxy-Authorization'] = authorization
+
+        self._idle = deque()
+        self._lock = threading.Lock()
+
+    def new_connection(self):
+        """new_connection()"""
+
+        host, port = self._address
+
+        if self.scheme == 'https':
+            conn = TimedHTTPSConnection(host, port, timeout=self.timeout)
+            if self.proxy is not None:
+                conn.set_tunnel(self.host, self.port
+                                , dict(self.proxy_headers))
+        else:
+            conn = TimedHTTPConnection(host, port, timeout=self.timeout)
+
+        with self._lock:
+            self.connections_opened += 1
+
+        return conn
+
+    def get(self):
+        """get() -> (connection, reused)"""
+
+        expired = []
+        conn = None
+        now = time.monotonic()
+
+        with self._lock:
+            while self._idle:
+                candidate, last_used = self._idle.pop()
+                if now - last_used > self.idle_timeout:
+                    expired.append(candidate)
+                else:
+                    conn = candidate
+                    break
+
+        for stale in expired:
+            stale.close()
+
+        if conn is not None:
+            return conn, True
+
+        return self.new_connection(), False
+
+    def put(self, conn):
+        """put(connection)"""
+
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append((conn, time.monotonic()))
+                return
+
+        conn.close()
+
+    def close(self):
+        """close()"""
+
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+
+        for conn, _ in idle:
+            conn.close()
+
+
+class Transport(object):
+    """Transport(keep_alive=True, pool_size=10, idle_timeout=60, timeout=30)
+
+    Issues HTTP requests, reusing connections through one ConnectionPool per
+    (scheme, host, port) when keep_alive is set.
+    """
+
+    def __init__(self, keep_alive=True, pool_size=DEFAULT_POOL_SIZE
+                 , idle_timeout=DEFAULT_IDLE_TIMEOUT
+                 , timeout=DEFAULT_TIMEOUT, compress=True):
+
+        self.keep_alive = keep_alive
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.compress = compress
+
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def pool_for(self, scheme, host, port=None):
+        """pool_for(scheme, host, port)"""
+
+        key = (scheme, host, port)
+
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = ConnectionPool(scheme, host, port
+                                      , pool_size=self.pool_size
+                                      , idle_timeout=self.idle_timeout
+                                      , timeout=self.timeout
+                                      , proxy=proxy_for(scheme, host))
+                self._pools[key] = pool
+
+        return pool
+
+    @property
+    def connections_opened(self):
+        """number of connections opened by this transport"""
+
+        with self._lock:
+            pools = list(self._pools.values())
+
+        return sum(pool.connections_opened for pool in pools)
+
+    def request(self, url, headers=None, method='GET', body=None):
+        """request(url, headers=None, method='GET', body=None) -> Response
+
+        Follows redirects and raises urllib.error.HTTPError for 4xx/5xx
+        statuses, like urlopen(), and for other 3xx statuses than 304.
+        """
+
+        url, pool, conn, response, timings = self._follow(url, headers
+                                                          , method, body)
+
+        read_start = time.perf_counter()
+        try:
+            data, size = read_body(response)
+        except Exception:
+            conn.close()
+            raise
+        timings['read'] = time.perf_counter() - read_start
+
+        self._release(pool, conn, response.will_close)
+
+        if _failed(response.status):
+            raise urllib.error.HTTPError(url, response.status, response.reason
+                                         , response.headers
+                                         , io.BytesIO(data))
+
+        return Response(url, response.status, response.reason
+                        , response.headers, data, timings, size)
+
+    def open(self, url, headers=None):
+        """open(url, headers=None) -> StreamingResponse
+
+        Like request(), but the body is left on the connection to be read
+        incrementally; close the StreamingResponse (or use it in a with
+        statement) to hand the connection back.
+        """
+
+        url, pool, conn, response, timings = self._follow(url, headers
+                                                          , 'GET', None)
+
+        if _failed(response.status):
+            try:
+                data, _ = read_body(response)
+            finally:
+                self._release(pool, conn, response.will_close)
+            raise urllib.error.HTTPError(url, response.status, response.reason
+                                         , response.headers
+                                         , io.BytesIO(data))
+
+        return StreamingResponse(self, pool, conn, url, response, timings)
+
+    def download(self, url, path, headers=None, chunk_size=CHUNK_SIZE):
+        """download(url, path, headers=None) -> bytes received
+
+        Streams the decompressed body to a file next to path, renamed into
+        place once complete.
+        """
+
+        temp_path = path + '.part'
+
+        try:
+            with self.open(url, headers) as body, \
+                    open(temp_path, 'wb') as target:
+                while True:
+                    data = body.read(chunk_size)
+                    if not data:
+                        break
+                    target.write(data)
+                size = body.size
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        os.replace(temp_path, path)
+
+        return size
+
+    def _follow(self, url, headers, method, body):
+        """_follow(url, headers, method, body) -> (url, pool, conn, response
+        , timings) of the response the redirects lead to (see _redirect())
+        """
+
+        for _ in range(MAX_REDIRECTS + 1):
+            pool, conn, response, timings = self._exchange(url, headers
+                                                            , method, body)
+
+            if not _is_redirect(response.status, response.headers):
+                return url, pool, conn, response, timings
+
+            try:
+                data, _ = read_body(response)
+            except Exception:
+                conn.close()
+                raise
+            self._release(pool, conn, response.will_close)
+
+            url, headers, method, body = _redirect(
+                url, response.status, response.reason, response.headers
+                , data, headers, method, body)
+
+        raise urllib.error.HTTPError(url, response.status
+                                     , 'too many redirects'
+                                     , response.headers, io.BytesIO(data))
+
+    def _exchange(self, url, headers, method, body):
+        """_exchange(url, headers, method, body) -> (pool, conn, response
+        , timings)
+
+        Sends the request and reads the status line and headers.
+        """
+
+        parts = urllib.parse.urlsplit(url)
+        target = parts.path or '/'
+        if parts.query:
+            target = target + '?' + parts.query
+
+        request_headers = dict(headers or {})
+        if not self.keep_alive:
+            request_headers['Connection'] = 'close'
+        if self.compress:
+            request_headers.setdefault('Accept-Encoding', ACCEPT_ENCODING)
+
+        pool = self.pool_for(parts.scheme, parts.hostname, parts.port)
+
+        if pool.absolute_form:
+            target = urllib.parse.urlunsplit(parts._replace(fragment=''))
+
+        if self.keep_alive:
+            conn, reused = pool.get()
+        else:
+            conn, reused = pool.new_connection(), False
+
+        if pool.absolute_form:
+            request_headers.update(pool.proxy_headers)
+
+        try:
+            response = self._send(conn, method, target, request_headers, body)
+        except _STALE_CONNECTION_ERRORS:
+            conn.close()
+            if not reused:
+                raise
+            conn = pool.new_connection()
+            try:
+                response = self._send(conn, method, target, request_headers
+                                      , body)
+            except Exception:
+                conn.close()
+                raise
+        except Exception:
+            conn.close()
+            raise
+
+        return pool, conn, response, self._timings(conn)
+
+    def _send(self, conn, method, target, headers, body):
+        """_send(conn, method, target, headers, body) -> HTTPResponse"""
+
+        conn.send_started = time.perf_counter()
+        conn.request(method, target, body=body, headers=headers)
+        response = conn.getresponse()
+        conn.first_byte = time.perf_counter()
+
+        return response
+
+    def _timings(self, conn):
+        """_timings(conn) -> timings of the exchange just made on conn"""
+
+        timings = getattr(conn, 'timings', None) or {}
+        conn.timings = {}
+
+        # connecting happens inside conn.request(), so take it back out
+
+        timings['first_byte'] = (conn.first_byte - conn.send_started
+                                 - sum(timings.values()))
+
+        return timings
+
+    def _release(self, pool, conn, will_close):
+        """_release(pool, conn, will_close)"""
+
+        if will_close or not self.keep_alive:
+            conn.close()
+        else:
+            pool.put(conn)
+
+    def close(self):
+        """close()"""
+
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools.clear()
+
+        for pool in pools:
+            pool.close()
+
+
+def _is_redirect(status, headers):
+    """_is_redirect(status, headers) -> whether the response is followed"""
+
+    return status in REDIRECT_STATUSES and bool(headers.get('Location'))
+
+
+def _redirect(url, status, reason, response_headers, data, headers, method
+              , body):
+    """_redirect(url, status, reason, response_headers, data, headers, method
+    , body) -> (url, headers, method, body) of the request to send next
+
+    Like urlopen(), a redirected POST is sent again as a GET, except after
+    307 and 308, which raise HTTPError.  Authorization is not sent on to
+    another host.
+    """
+
+    if method not in ('GET', 'HEAD'):
+        if status in (307, 308):
+            raise urllib.error.HTTPError(url, status, reason, response_headers
+                                         , io.BytesIO(data))
+        method, body = 'GET', None
+        headers = dict((name, value)
+                       for name, value in (headers or {}).items()
+                       if not name.lower().startswith('content-'))
+
+    target = urllib.parse.urljoin(url, response_headers['Location'])
+
+    if (urllib.parse.urlsplit(target).netloc
+            != urllib.parse.urlsplit(url).netloc):
+        headers = dict((name, value)
+                       for name, value in (headers or {}).items()
+                       if name.lower() != 'authorization')
+
+    return target, headers, method, body
+
+
+def _failed(status):
+    """_failed(status) -> whether status is an error for the caller
+
+    A 304 answers a conditional request; other 3xx statuses that were not
+    followed would only fail later, decoding an empty or HTML body.
+    """
+
+    return status >= 400 or (300 <= status < 400 and status != 304)
+
+
+_default_transport = None
+_default_transport_lock = threading.Lock()
+
+
+def get_transport():
+    """get_transport()"""
+
+    global _default_transport
+
+    if _default_transport is None:
+        with _default_transport_lock:
+            if _default_transport is None:
+                _default_transport = Transport()
+
+    return _default_transport
+
+
+def set_transport(transport, replace=True):
+    """set_transport(transport, replace=True) -> previous transport
+
+    With replace=False the transport is only installed if none is yet.
+    """
+
+    global _default_transport
+
+    with _default_transport_lock:
+        previous = _default_transport
+        if replace or previous is None:
+            _default_transport = transport
+
+    return previous
@@ -0,0 +1,114 @@
+""" Tests of the asyncio transport """
+
+import asyncio
+import http.server
+import os
+import threading
+import unittest
+import urllib.error
+from unittest import mock
+
+from bungie_net_api import async_client
+from bungie_net_api import transport
+
+from .test_transport import Handler
+
+
+class ProxyHandler(Handler):
+
+    def do_CONNECT(self):
+        self.reply(407)
+
+
+class AsyncTransportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0)
+                                                      , ProxyHandler)
+        self.server.seen = []
+        threading.Thread(target=self.server.serve_forever, args=(0.01,)
+                         , daemon=True).start()
+        self.root = 'http://127.0.0.1:%d' % self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def request(self, url, environment=None, **kwargs):
+        async def request():
+            client = async_client.AsyncTransport(timeout=kwargs.pop(
+                'timeout', transport.DEFAULT_TIMEOUT))
+            try:
+                return await client.request(url, **kwargs)
+            finally:
+                client.close()
+
+        with mock.patch.dict(os.environ, environment or {}):
+            for name in ('no_proxy', 'NO_PROXY'):
+                if not environment or name not in environment:
+                    os.environ.pop(name, None)
+            return asyncio.run(request())
+
+    def test_redirects_are_followed(self):
+        for status in sorted(transport.REDIRECT_STATUSES):
+            response = self.request(self.root + '/moved/%d/' % status)
+            self.assertEqual(response.status, 200)
+            self.assertEqual(response.body, b'{"ErrorCode": 1}')
+            self.assertEqual(response.url, self.root + '/target/')
+
+    def test_redirected_post_is_not_repeated_after_307(self):
+        with self.assertRaises(urllib.error.HTTPError) as raised:
+            self.request(self.root + '/moved/307/', method='POST'
+                         , body=b'form')
+
+        self.assertEqual(raised.exception.code, 307)
+
+    def test_redirect_loops_raise(self):
+        with self.assertRaises(urllib.error.HTTPError) as raised:
+            self.request(self.root + '/loop/')
+
+        self.assertEqual(raised.exception.code, 302)
+        self.assertEqual(len(self.server.seen), transport.MAX_REDIRECTS + 1)
+
+    def test_redirects_without_location_raise(self):
+        with self.assertRaises(urllib.error.HTTPError) as raised:
+            self.request(self.root + '/nowhere/')
+
+        self.assertEqual(raised.exception.code, 302)
+
+    def test_not_modified_is_returned(self):
+        self.assertEqual(self.request(self.root + '/cached/').status, 304)
+
+    def test_http_proxy_from_the_environment(self):
+        self.request('http://www.bungie.net/Platform/Test/'
+                     , {'http_proxy': 'http://user:secret@' + self.root[7:]})
+
+        method, path, headers = self.server.seen[-1]
+        self.assertEqual(path, 'http://www.bungie.net/Platform/Test/')
+        self.assertEqual(headers['Host'], 'www.bungie.net')
+        self.assertEqual(headers['Proxy-Authorization']
+                         , 'Basic dXNlcjpzZWNyZXQ=')
+
+    def test_https_proxy_tunnels(self):
+        with self.assertRaises(OSError) as raised:
+            self.request('https://www.bungie.net/Platform/Test/'
+                         , {'https_proxy': 'http://user:secret@'
+                            + self.root[7:]})
+
+        self.assertIn('407', str(raised.exception))
+        method, path, headers = self.server.seen[-1]
+        self.assertEqual((method, path), ('CONNECT', 'www.bungie.net:443'))
+        self.assertEqual(headers['Proxy-Authorization']
+                         , 'Basic dXNlcjpzZWNyZXQ=')
+
+    def test_stalled_connects_time_out(self):
+        async def open_connection(*args, **kwargs):
+            await asyncio.sleep(60)
+
+        with mock.patch.object(asyncio, 'open_connection', open_connection):
+            with self.assertRaises(asyncio.TimeoutError):
+                self.request(self.root + '/target/', timeout=0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,208 @@
+""" Tests of the response cache """
+
+import gzip
+import http.server
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from bungie_net_api import api
+from bungie_net_api import cache
+from bungie_net_api import transport
+
+PROFILE = 'https://www.bungie.net/Platform/Destiny2/2/Profile/1/'
+PGCR = ('https://www.bungie.net/Platform/Destiny2/Stats/PostGameCarnageReport'
+        '/1/')
+OTHER = 'https://www.bungie.net/Platform/Other/'
+
+
+def response(body, status=200, **headers):
+    return transport.Response(PROFILE, status, 'OK', headers, body)
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch.object(cache.time, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = cache.ResponseCache(policies=cache.DEFAULT_POLICIES)
+
+    def fetch(self, call_url, body, headers=None, **response_headers):
+        lookup = self.cache.prepare(call_url, headers or {})
+        if lookup.body is not None:
+            return lookup, lookup.body
+        return lookup, self.cache.complete(lookup, call_url, response(
+            body, **response_headers))
+
+    def test_entries_expire_after_the_policy_ttl(self):
+        self.fetch(PROFILE, b'first')
+
+        self.clock.now += 14
+        self.assertEqual(self.fetch(PROFILE, b'second')[1], b'first')
+
+        self.clock.now += 2
+        self.assertEqual(self.fetch(PROFILE, b'second')[1], b'second')
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+    def test_permanent_entries_never_expire(self):
+        self.fetch(PGCR, b'report')
+        self.clock.now += 10 ** 9
+
+        self.assertEqual(self.fetch(PGCR, b'other')[1], b'report')
+
+    def test_unmatched_urls_follow_max_age(self):
+        self.fetch(OTHER, b'kept', **{'Cache-Control': 'max-age=30'})
+        self.clock.now += 29
+        self.assertEqual(self.fetch(OTHER, b'new')[1], b'kept')
+
+        self.cache.clear()
+        self.fetch(OTHER, b'kept')
+        self.assertEqual(self.fetch(OTHER, b'new')[1], b'new')
+
+    def test_no_store_is_not_kept(self):
+        self.fetch(PROFILE, b'first', **{'Cache-Control': 'no-store'})
+
+        self.assertEqual(self.fetch(PROFILE, b'second')[1], b'second')
+
+    def test_stale_entries_are_revalidated(self):
+        self.fetch(PROFILE, b'body', ETag='"v1"')
+        self.clock.now += 60
+
+        lookup = self.cache.prepare(PROFILE, {'X-API-Key': 'key'})
+        self.assertIsNone(lookup.body)
+        self.assertEqual(lookup.headers, {'X-API-Key': 'key'
+                                          , 'If-None-Match': '"v1"'})
+
+        body = self.cache.complete(lookup, PROFILE, response(b'', 304))
+        self.assertEqual(body, b'body')
+        self.assertEqual(self.cache.stats()['revalidations'], 1)
+
+        # the 304 made the entry fresh again
+        self.assertEqual(self.cache.prepare(PROFILE, {}).body, b'body')
+
+    def test_authorized_responses_are_private(self):
+        alice = {'Authorization': 'Bearer alice'}
+        bob = {'Authorization': 'Bearer bob'}
+
+        self.fetch(PROFILE, b'alice', alice)
+
+        self.assertEqual(self.fetch(PROFILE, b'bob', bob)[1], b'bob')
+        self.assertEqual(self.fetch(PROFILE, b'public')[1], b'public')
+        self.assertEqual(self.fetch(PROFILE, b'', alice)[1], b'alice')
+        self.assertNotIn('alice', self.cache.key(PROFILE, alice))
+
+    def test_entry_count_is_bounded(self):
+        bounded = cache.ResponseCache(policies=[('', None)], max_entries=2)
+
+        for index in range(3):
+            bounded.put(str(index), b'x', None, None)
+        bounded.get('1')
+        bounded.put('3', b'x', None, None)
+
+        self.assertIsNone(bounded.get('0'))
+        self.assertIsNone(bounded.get('2'))
+        self.assertIsNotNone(bounded.get('1'))
+        self.assertEqual(bounded.stats()['evictions'], 2)
+
+    def test_bytes_are_bounded(self):
+        bounded = cache.ResponseCache(policies=[('', None)], max_bytes=10)
+
+        bounded.put('a', b'12345', None, None)
+        bounded.put('b', b'12345', None, None)
+        bounded.put('c', b'1', None, None)
+        bounded.put('huge', b'x' * 11, None, None)
+
+        self.assertIsNone(bounded.get('a'))
+        self.assertIsNone(bounded.get('huge'))
+        self.assertEqual(bounded.stats()['bytes'], 6)
+
+    def test_disk_tier_survives_a_new_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'cache.sqlite3')
+
+            first = cache.ResponseCache(disk_path=path)
+            first.put(PGCR, b'report', '"v1"', None)
+            first.close()
+
+            second = cache.ResponseCache(disk_path=path)
+            try:
+                entry = second.get(PGCR)
+                self.assertEqual((entry.body, entry.etag, entry.expires)
+                                 , (b'report', '"v1"', None))
+                self.assertIsNone(second.get(PROFILE))
+            finally:
+                second.close()
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.seen.append(self.headers.get('If-None-Match'))
+
+        if self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.send_header('ETag', '"v1"')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = gzip.compress(b'{"ErrorCode": 1, "Response": {"n": 1}}')
+        self.send_response(200)
+        self.send_header('Content-Encoding', 'gzip')
+        self.send_header('ETag', '"v1"')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class RevalidationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0)
+                                                      , Handler)
+        self.server.seen = []
+        threading.Thread(target=self.server.serve_forever, args=(0.01,)
+                         , daemon=True).start()
+        root = 'http://127.0.0.1:%d' % self.server.server_address[1]
+        patcher = mock.patch.object(api, 'BUNGIE_NET_ROOT', root)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_not_modified_serves_the_cached_body(self):
+        responses = cache.ResponseCache(policies=[('/Profile/', 0)])
+
+        with api.BungieClient(api_key='key', scheduler=False
+                              , cache=responses) as client:
+            first = client.callBungieAPI('/Destiny2/2/Profile/1/')
+            second = client.callBungieAPI('/Destiny2/2/Profile/1/')
+
+        self.assertEqual(first, {'ErrorCode': 1, 'Response': {'n': 1}})
+        self.assertEqual(second, first)
+        self.assertEqual(self.server.seen, [None, '"v1"'])
+        self.assertEqual(responses.stats()['revalidations'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
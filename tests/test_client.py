@@ -0,0 +1,147 @@
+""" Tests of explicitly configured clients """
+
+import asyncio
+import http.server
+import os
+import threading
+import unittest
+from unittest import mock
+
+from bungie_net_api import api
+from bungie_net_api import async_client
+from bungie_net_api import endpoints
+from bungie_net_api import oauth
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.seen.append((self.path, self.headers.get('X-API-Key')
+                                 , self.headers.get('Authorization')))
+        body = b'{"ErrorCode": 1, "Response": {}}'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class BungieClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0)
+                                                      , Handler)
+        self.server.seen = []
+        threading.Thread(target=self.server.serve_forever, args=(0.01,)
+                         , daemon=True).start()
+        root = 'http://127.0.0.1:%d' % self.server.server_address[1]
+        patcher = mock.patch.object(api, 'BUNGIE_NET_ROOT', root)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        api.configure()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def keys(self):
+        return [key for path, key, authorization in self.server.seen]
+
+    def test_clients_send_their_own_api_key(self):
+        with api.BungieClient(api_key='first', scheduler=False) as first, \
+             api.BungieClient(api_key='second', rate=50) as second:
+            first.call('GetProfile', membershipType='2'
+                       , destinyMembershipId='1', components='100')
+            second.call('GetProfile', membershipType='2'
+                        , destinyMembershipId='1', components='100')
+            first.callBungieAPI('/Destiny2/Manifest/')
+
+            self.assertIsNone(first.scheduler)
+            self.assertIsNotNone(second.scheduler)
+            self.assertIsNot(first.transport, second.transport)
+
+        self.assertEqual(self.keys(), ['first', 'second', 'first'])
+        self.assertEqual(self.server.seen[0][0]
+                         , '/Platform/Destiny2/2/Profile/1/?components=100')
+
+    def test_configure_drives_the_default_client(self):
+        api.configure(api_key='module', scheduler=False)
+
+        with api.BungieClient(api_key='other') as client:
+            api.callBungieAPI('/Destiny2/Manifest/')
+            client.callBungieAPI('/Destiny2/Manifest/')
+
+        self.assertEqual(self.keys(), ['module', 'other'])
+        self.assertIs(api.get_settings(), api.get_client().settings)
+        self.assertEqual(api.API_KEY, 'module')
+
+    def test_session_calls_use_the_client_api_key(self):
+        api.configure(api_key='module')
+        session = oauth.OAuthSession('access')
+
+        with api.BungieClient(api_key='other', scheduler=False) as client:
+            client.call('GetMembershipsForCurrentUser', token=session)
+        api.callOauthBungieAPI('/User/GetMembershipsForCurrentUser/'
+                               , token=session)
+
+        self.assertEqual(self.keys(), ['other', 'module'])
+        self.assertEqual(self.server.seen[0][2], 'Bearer access')
+
+    def test_async_session_calls_use_the_client_api_key(self):
+        api.configure(config_file=os.devnull)
+        session = oauth.OAuthSession('access')
+
+        async def call_async():
+            async with async_client.AsyncBungieClient('async') as client:
+                await client.call('GetMembershipsForCurrentUser'
+                                  , token=session)
+
+        with mock.patch.dict(os.environ):
+            os.environ.pop('BUNGIE_NET_API_KEY', None)
+            asyncio.run(call_async())
+
+        self.assertEqual(self.server.seen
+                         , [('/Platform/User/GetMembershipsForCurrentUser/'
+                             , 'async', 'Bearer access')])
+
+    def test_required_token(self):
+        client = api.BungieClient(api_key='other')
+
+        with self.assertRaises(ValueError):
+            client.call('GetMembershipsForCurrentUser')
+
+        with self.assertRaises(ValueError):
+            endpoints.call('GetMembershipsForCurrentUser')
+
+        async def call_async():
+            async with async_client.AsyncBungieClient('other') as client:
+                await client.call('GetMembershipsForCurrentUser')
+
+        with self.assertRaises(ValueError):
+            asyncio.run(call_async())
+
+    def test_every_client_builds_the_same_request(self):
+        api.configure(api_key='module', scheduler=False)
+
+        async def call_async():
+            async with async_client.AsyncBungieClient('async') as client:
+                await client.call('SearchDestinyPlayer', membershipType='-1'
+                                  , displayName='Guardian#1234')
+
+        endpoints.call('SearchDestinyPlayer', membershipType='-1'
+                       , displayName='Guardian#1234')
+        asyncio.run(call_async())
+
+        self.assertEqual(self.keys(), ['module', 'async'])
+        self.assertEqual(
+            [path for path, key, authorization in self.server.seen]
+            , ['/Platform/Destiny2/SearchDestinyPlayer/-1/Guardian%231234/']
+            * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
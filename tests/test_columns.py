@@ -0,0 +1,65 @@
+""" Tests of columnar statistics without numpy """
+
+import array
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from bungie_net_api import columns
+
+FIXTURES = os.path.join(os.path.dirname(__file__), '..', 'bench', 'fixtures')
+
+
+def activity():
+    with open(os.path.join(FIXTURES, 'activity.json'), 'rb') as body:
+        return json.loads(body.read())
+
+
+class WithoutNumpyTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(columns, 'numpy', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_columns_fall_back_to_array(self):
+        table = columns.activity_columns([activity(), activity()])
+
+        self.assertIsInstance(table['kills'], array.array)
+        self.assertEqual(list(table['kills'])
+                         , [activity()['values']['kills']['basic']['value']]
+                         * 2)
+        self.assertEqual(columns.activity_columns([activity()]
+                                                  , use_numpy=False).keys()
+                         , table.keys())
+
+    def test_asking_for_numpy_raises(self):
+        builder = columns.ActivityColumns()
+        builder.add(activity())
+
+        for call in (lambda: builder.columns(use_numpy=True)
+                     , lambda: columns.activity_columns([activity()], True)
+                     , lambda: columns.pgcr_columns([], use_numpy=True)):
+            with self.assertRaises(ImportError) as raised:
+                call()
+            self.assertIn('numpy', str(raised.exception))
+
+    def test_reading_with_numpy_raises(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'activities.columns')
+            builder = columns.ActivityColumns()
+            builder.add(activity())
+            builder.write(path)
+
+            with self.assertRaises(ImportError):
+                columns.read_columns(path, use_numpy=True)
+
+            table = columns.read_columns(path)
+            self.assertEqual(table['instance_id']
+                             , builder.columns()['instance_id'])
+
+
+if __name__ == '__main__':
+    unittest.main()
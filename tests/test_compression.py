@@ -0,0 +1,179 @@
+""" Tests of compressed response bodies """
+
+import gzip
+import http.server
+import os
+import random
+import tempfile
+import threading
+import unittest
+import zlib
+
+from bungie_net_api import transport
+
+# several CHUNK_SIZE reads of something that compresses like JSON does
+
+BODY = b''.join(b'{"activityId": %d, "values": [%d, %d]}, ' % (
+    index, random.Random(index).randrange(10 ** 6), index * 7)
+    for index in range(20000))
+
+
+def deflate(data, wbits):
+    compressor = zlib.compressobj(wbits=wbits)
+    return compressor.compress(data) + compressor.flush()
+
+
+ENCODED = {
+    'gzip': ('gzip', gzip.compress(BODY)),
+    'deflate': ('deflate', deflate(BODY, zlib.MAX_WBITS)),
+    'raw': ('deflate', deflate(BODY, -zlib.MAX_WBITS)),
+    'identity': (None, BODY),
+}
+
+
+def pieces(data, size):
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+class DecompressorTest(unittest.TestCase):
+
+    def decode(self, encoding, data, size=1000):
+        decompressor = transport.Decompressor(encoding)
+        chunks = [decompressor.decompress(piece)
+                  for piece in pieces(data, size)]
+        return b''.join(chunks) + decompressor.flush()
+
+    def test_round_trips(self):
+        for name, (encoding, data) in ENCODED.items():
+            for size in (7, 1000, len(data)):
+                self.assertEqual(self.decode(encoding, data, size), BODY
+                                 , (name, size))
+
+    def test_byte_at_a_time(self):
+        small = {'gzip': gzip.compress(b'{"a": 1}')
+                 , 'deflate': deflate(b'{"a": 1}', zlib.MAX_WBITS)
+                 , 'x-gzip': gzip.compress(b'{"a": 1}')
+                 , None: b'{"a": 1}'}
+        raw = deflate(b'{"a": 1}', -zlib.MAX_WBITS)
+
+        for encoding, data in list(small.items()) + [('deflate', raw)]:
+            self.assertEqual(self.decode(encoding, data, 1), b'{"a": 1}'
+                             , encoding)
+
+    def test_encoding_names(self):
+        for encoding in ('GZIP', ' gzip ', 'x-gzip'):
+            self.assertEqual(self.decode(encoding, ENCODED['gzip'][1]), BODY)
+        for encoding in (None, '', 'identity', 'br'):
+            self.assertEqual(transport.Decompressor(encoding).encoding
+                             , (encoding or 'identity').lower())
+            self.assertEqual(self.decode(encoding, b'as is'), b'as is')
+
+    def test_truncated_streams_raise(self):
+        for name in ('gzip', 'deflate', 'raw'):
+            encoding, data = ENCODED[name]
+            with self.assertRaises(zlib.error, msg=name):
+                self.decode(encoding, data[:len(data) // 2])
+
+    def test_corrupt_streams_raise(self):
+        for name in ('gzip', 'deflate'):
+            encoding, data = ENCODED[name]
+            with self.assertRaises(zlib.error, msg=name):
+                self.decode(encoding, data[:100] + b'\xff' * 100 + data[200:])
+
+    def test_empty_bodies(self):
+        for encoding in ('gzip', 'deflate', None):
+            self.assertEqual(transport.Decompressor(encoding).flush(), b'')
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        name = self.path.strip('/')
+        truncated = name.startswith('truncated-')
+        encoding, data = ENCODED[name.replace('truncated-', '')]
+        if truncated:
+            data = data[:len(data) // 2]
+
+        self.send_response(200)
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class StreamingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0)
+                                                      , Handler)
+        threading.Thread(target=self.server.serve_forever, args=(0.01,)
+                         , daemon=True).start()
+        self.root = 'http://127.0.0.1:%d/' % self.server.server_address[1]
+        self.transport = transport.Transport()
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_request_round_trips(self):
+        for name, (encoding, data) in ENCODED.items():
+            response = self.transport.request(self.root + name)
+            self.assertEqual(response.body, BODY, name)
+            self.assertEqual(response.size, len(data), name)
+
+    def test_streamed_round_trips(self):
+        for name, (encoding, data) in ENCODED.items():
+            with self.transport.open(self.root + name) as body:
+                chunks = []
+                while True:
+                    chunk = body.read(4096)
+                    if not chunk:
+                        break
+                    self.assertLessEqual(len(chunk), 4096)
+                    chunks.append(chunk)
+                self.assertEqual(b''.join(chunks), BODY, name)
+                self.assertEqual(body.size, len(data), name)
+
+    def test_streamed_connections_are_reused(self):
+        for name in ENCODED:
+            with self.transport.open(self.root + name) as body:
+                body.read()
+
+        self.assertEqual(self.transport.connections_opened, 1)
+
+    def test_download(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'body')
+            size = self.transport.download(self.root + 'gzip', path)
+
+            with open(path, 'rb') as downloaded:
+                self.assertEqual(downloaded.read(), BODY)
+            self.assertEqual(size, len(ENCODED['gzip'][1]))
+
+    def test_truncated_bodies_raise(self):
+        for name in ('gzip', 'deflate', 'raw'):
+            with self.assertRaises(zlib.error, msg=name):
+                self.transport.request(self.root + 'truncated-' + name)
+            with self.assertRaises(zlib.error, msg=name):
+                with self.transport.open(self.root + 'truncated-' + name) \
+                        as body:
+                    body.read()
+
+    def test_truncated_downloads_leave_no_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'body')
+            with self.assertRaises(zlib.error):
+                self.transport.download(self.root + 'truncated-gzip', path)
+
+            self.assertEqual(os.listdir(directory), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+""" Tests of the declarative endpoint registry """
+
+import threading
+import unittest
+from unittest import mock
+
+from bungie_net_api import endpoints
+from bungie_net_api import scheduler
+
+
+class MethodTest(unittest.TestCase):
+
+    def test_ids_are_sent_as_they_are(self):
+        self.assertEqual(endpoints.method(
+            'GetProfile', membershipType=-1, destinyMembershipId=4611686018
+            , components='100,200')
+            , '/Destiny2/-1/Profile/4611686018/?components=100,200')
+
+    def test_bungie_names_are_encoded(self):
+        self.assertEqual(endpoints.method(
+            'SearchDestinyPlayer', membershipType='-1'
+            , displayName='Guardian#1234')
+            , '/Destiny2/SearchDestinyPlayer/-1/Guardian%231234/')
+
+    def test_encoded_names_are_not_encoded_again(self):
+        self.assertEqual(endpoints.method(
+            'SearchDestinyPlayer', membershipType='-1'
+            , displayName='Guardian%231234')
+            , '/Destiny2/SearchDestinyPlayer/-1/Guardian%231234/')
+
+    def test_non_ascii_names_are_encoded(self):
+        for name, display_name in (
+                ('SearchDestinyPlayer', 'Zoë')
+                , ('GetMembershipIdByDisplayName', 'Зоя')
+                , ('SearchDestinyPlayer', '²')):
+            method = endpoints.method(name, membershipType='2'
+                                      , displayName=display_name)
+            self.assertTrue(method.isascii(), method)
+
+        self.assertEqual(endpoints.method(
+            'SearchDestinyPlayer', membershipType='2'
+            , displayName='Zoë')
+            , '/Destiny2/SearchDestinyPlayer/2/Zo%C3%AB/')
+
+    def test_non_ascii_query_values_are_encoded(self):
+        self.assertEqual(endpoints.method(
+            'GetClanLeaderboards', groupId='1', modes='é')
+            , '/Destiny2/Stats/Leaderboards/Clans/1/?modes=%C3%A9&maxtop=5')
+
+    def test_missing_path_parameter(self):
+        with self.assertRaises(TypeError):
+            endpoints.method('GetProfile', membershipType='2')
+
+
+
+class CallManyTest(unittest.TestCase):
+
+    def test_calls_run_at_the_callers_priority(self):
+        calls = []
+        lock = threading.Lock()
+
+        def call(name, token=None, fields=None, **params):
+            with lock:
+                calls.append(scheduler.current_priority())
+            return {'ErrorCode': 1, 'Response': params['activityId']}
+
+        with mock.patch.object(endpoints, 'call', call):
+            with scheduler.background():
+                envelopes = endpoints.call_many(
+                    'GetPostGameCarnageReport'
+                    , [{'activityId': str(index)} for index in range(10)]
+                    , workers=4)
+
+        self.assertEqual([envelope['Response'] for envelope in envelopes]
+                         , [str(index) for index in range(10)])
+        self.assertEqual(calls, [scheduler.BACKGROUND] * 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
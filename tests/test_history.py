@@ -0,0 +1,107 @@
+""" Tests of incremental activity history sync """
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from bungie_net_api import history
+from bungie_net_api import pagination
+
+
+def activity(character_id, index):
+    return {'period': '2024-01-01T00:%02d:00Z' % (59 - index)
+            , 'activityDetails': {'instanceId': str(int(character_id) * 1000
+                                                    + 999 - index)
+                                  , 'mode': 5}
+            , 'values': {}}
+
+
+class SyncCharactersTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = history.HistoryStore(os.path.join(directory.name
+                                                       , 'history.sqlite3'))
+        self.addCleanup(self.store.close)
+
+    def sync(self, pages, **kwargs):
+        def iter_activity_history(membership_id, membership_type
+                                  , character_id, **options):
+            return pages[character_id]()
+
+        with mock.patch.object(pagination, 'iter_activity_history'
+                               , iter_activity_history):
+            return history.sync_characters(
+                self.store, [('1', '2', character_id)
+                             for character_id in sorted(pages)], **kwargs)
+
+    def stored(self, character_id):
+        return [int(each['activityDetails']['instanceId'])
+                for each in self.store.activities(character_id)]
+
+    def test_characters_sync_concurrently(self):
+        def page(character_id, count):
+            def activities():
+                for index in range(count):
+                    time.sleep(0.001)
+                    yield activity(character_id, index)
+            return activities
+
+        synced = self.sync(dict((str(character_id)
+                                 , page(str(character_id), 30))
+                                for character_id in range(1, 5)))
+
+        for character_id in range(1, 5):
+            expected = [character_id * 1000 + 999 - index
+                        for index in range(30)]
+            self.assertEqual(synced[str(character_id)], expected)
+            self.assertEqual(self.stored(character_id), expected)
+            self.assertEqual(self.store.mark('1', character_id)
+                             , (expected[0], activity(character_id, 0)
+                                ['period']))
+
+    def test_a_failed_character_commits_nothing(self):
+        def succeeding():
+            for index in range(3):
+                yield activity('1', index)
+
+        def failing():
+            for index in range(3):
+                yield activity('2', index)
+
+            # fail only once the other worker has committed
+            deadline = time.monotonic() + 5
+            while (self.store.mark('1', '1') is None
+                   and time.monotonic() < deadline):
+                time.sleep(0.001)
+            raise RuntimeError('connection reset')
+
+        with self.assertRaises(RuntimeError):
+            self.sync({'1': succeeding, '2': failing})
+
+        self.assertEqual(len(self.stored('1')), 3)
+        self.assertEqual(self.stored('2'), [])
+        self.assertIsNone(self.store.mark('1', '2'))
+
+    def test_batches_are_committed_as_they_fill(self):
+        def failing():
+            for index in range(5):
+                yield activity('1', index)
+            raise RuntimeError('connection reset')
+
+        with self.assertRaises(RuntimeError):
+            with mock.patch.object(pagination, 'iter_activity_history'
+                                   , lambda *args, **kwargs: failing()):
+                history.sync_history(self.store, '1', '2', '1'
+                                     , commit_every=2)
+
+        self.assertEqual(self.stored('1'), [1999, 1998, 1997, 1996])
+        self.assertIsNone(self.store.mark('1', '1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
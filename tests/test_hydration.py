@@ -0,0 +1,109 @@
+""" Tests of definition hydration """
+
+import threading
+import time
+import unittest
+from unittest import mock
+
+from bungie_net_api import api
+from bungie_net_api import hydration
+from bungie_net_api import scheduler
+from bungie_net_api import singleflight
+
+ITEM = 'DestinyInventoryItemDefinition'
+
+
+class Manifest(object):
+
+    def __init__(self, name):
+        self.name = name
+
+    def get(self, entity_type, hash_identifier):
+        return {'name': self.name, 'hash': hash_identifier}
+
+
+def envelope():
+    return {'ErrorCode': 1, 'Response': {'items': [{'itemHash': 1}
+                                                    , {'itemHash': 2}]}}
+
+
+class SharedResultTest(unittest.TestCase):
+
+    def test_hydrating_a_coalesced_result_twice(self):
+        flight = singleflight.SingleFlight()
+        started = threading.Event()
+        results = {}
+
+        def fetch():
+            started.set()
+            time.sleep(0.1)
+            return envelope()
+
+        def caller(name):
+            shared = flight.do('profile', fetch)
+            results[name] = (shared, hydration.hydrate(
+                shared, manifest=Manifest(name)))
+
+        leader = threading.Thread(target=caller, args=('leader',))
+        leader.start()
+        started.wait()
+        follower = threading.Thread(target=caller, args=('follower',))
+        follower.start()
+        leader.join()
+        follower.join()
+
+        shared, hydrated = results['leader']
+        self.assertIs(results['follower'][0], shared)
+        self.assertEqual(shared, envelope())
+
+        for name in ('leader', 'follower'):
+            definitions = results[name][1]['Response']['definitions']
+            self.assertEqual(definitions[ITEM][1]['name'], name)
+
+    def test_hydrating_the_same_document_again(self):
+        document = envelope()
+
+        first = hydration.hydrate(document, manifest=Manifest('first'))
+        second = hydration.hydrate(document, manifest=Manifest('second'))
+
+        self.assertEqual(document, envelope())
+        self.assertEqual(first['Response']['definitions'][ITEM][2]['name']
+                         , 'first')
+        self.assertEqual(second['Response']['definitions'][ITEM][2]['name']
+                         , 'second')
+        self.assertIs(first['Response']['items']
+                      , document['Response']['items'])
+
+    def test_documents_without_envelope(self):
+        document = {'itemHash': 7}
+
+        hydrated = hydration.hydrate(document, manifest=Manifest('bare'))
+
+        self.assertNotIn('definitions', document)
+        self.assertEqual(hydrated['definitions'][ITEM][7]['name'], 'bare')
+
+
+class ResolvePriorityTest(unittest.TestCase):
+
+    def test_background_hydration_fetches_in_the_background(self):
+        priorities = []
+        lock = threading.Lock()
+
+        def get_manifest_item(entity_type, hash_identifier):
+            with lock:
+                priorities.append(scheduler.current_priority())
+            return {'ErrorCode': 1, 'Response': {'hash': hash_identifier}}
+
+        with mock.patch.object(api, 'LOCAL_MANIFEST', None), \
+                mock.patch.object(api, 'get_manifest_item'
+                                  , get_manifest_item):
+            with scheduler.background():
+                hydrated = hydration.hydrate(envelope())
+
+        self.assertEqual(priorities, [scheduler.BACKGROUND] * 2)
+        self.assertEqual(hydrated['Response']['definitions'][ITEM][2]
+                         , {'hash': '2'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+""" Tests of the identity resolution cache """
+
+import threading
+import time
+import unittest
+from unittest import mock
+
+from bungie_net_api import api
+from bungie_net_api import identity
+
+CARD = {'membershipType': 3, 'membershipId': '4611686018467260757'
+        , 'bungieGlobalDisplayName': 'Guardian'
+        , 'bungieGlobalDisplayNameCode': 1234}
+
+
+def found(response):
+    return {'ErrorCode': 1, 'ErrorStatus': 'Success', 'Response': response}
+
+
+def failed(error_code, error_status):
+    return {'ErrorCode': error_code, 'ErrorStatus': error_status
+            , 'Message': error_status, 'Response': None}
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class IdentityResolverTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.envelopes = {}
+        self.calls = []
+
+        def searchDestinyPlayer(display_name, membership_type):
+            self.calls.append(display_name)
+            return self.envelopes.get(display_name, found([]))
+
+        def getMembershipsById(membership_id, membership_type):
+            self.calls.append(membership_id)
+            return self.envelopes[membership_id]
+
+        for name, replacement in ((
+                'searchDestinyPlayer', searchDestinyPlayer)
+                , ('getMembershipsById', getMembershipsById)):
+            patcher = mock.patch.object(api, name, replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        patcher = mock.patch.object(identity.time, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def resolver(self, **kwargs):
+        resolver = identity.IdentityResolver(ttl=100, negative_ttl=10
+                                             , **kwargs)
+        self.addCleanup(resolver.close)
+        return resolver
+
+    def test_unknown_names_are_remembered_for_the_negative_ttl(self):
+        resolver = self.resolver(serve_stale=False)
+        self.envelopes['Guardian#1234'] = found([CARD])
+
+        self.assertEqual(resolver.search('Nobody#0001'), [])
+        self.assertEqual(resolver.search('Guardian#1234'), [CARD])
+
+        self.clock.now += 9
+        self.assertEqual(resolver.search('nobody#0001'), [])
+        self.assertEqual(self.calls, ['Nobody#0001', 'Guardian#1234'])
+        self.assertEqual(resolver.stats()['negative_hits'], 1)
+
+        # the negative entry expires long before the found one
+        self.clock.now += 2
+        self.assertEqual(resolver.search('Nobody#0001'), [])
+        self.assertEqual(resolver.search('Guardian#1234'), [CARD])
+        self.assertEqual(self.calls, ['Nobody#0001', 'Guardian#1234'
+                                      , 'Nobody#0001'])
+
+    def test_not_found_statuses_are_negative_answers(self):
+        resolver = self.resolver()
+
+        for index, status in enumerate(sorted(identity.NOT_FOUND_STATUSES)):
+            self.envelopes[str(index)] = failed(index + 100, status)
+
+            self.assertIsNone(resolver.memberships(index), status)
+            self.assertIsNone(resolver.memberships(index), status)
+
+        self.assertEqual(self.calls, [str(index) for index in range(
+            len(identity.NOT_FOUND_STATUSES))])
+        self.assertEqual(resolver.stats()['negative_hits']
+                         , len(identity.NOT_FOUND_STATUSES))
+
+    def test_other_errors_raise_and_are_not_remembered(self):
+        resolver = self.resolver()
+        self.envelopes['1'] = failed(5, 'SystemDisabled')
+
+        for attempt in range(2):
+            with self.assertRaises(api.BungieAPIError) as raised:
+                resolver.memberships('1')
+            self.assertEqual(raised.exception.error_status, 'SystemDisabled')
+
+        self.assertEqual(self.calls, ['1', '1'])
+
+        self.envelopes['1'] = found({'destinyMemberships': [CARD]})
+        self.assertEqual(resolver.memberships_many(['1', '2']
+                                                   , skip_errors=True)
+                         , {'1': {'destinyMemberships': [CARD]}})
+
+    def test_stale_entries_are_served_while_one_refresh_runs(self):
+        resolver = self.resolver()
+        self.envelopes['Guardian#1234'] = found([CARD])
+        self.assertEqual(resolver.search('Guardian#1234'), [CARD])
+
+        renamed = dict(CARD, bungieGlobalDisplayNameCode=4321)
+        release = threading.Event()
+
+        def searchDestinyPlayer(display_name, membership_type):
+            self.calls.append(display_name)
+            release.wait(5)
+            return found([renamed])
+
+        self.clock.now += 101
+        with mock.patch.object(api, 'searchDestinyPlayer'
+                               , searchDestinyPlayer):
+            answers = [resolver.search('Guardian#1234') for _ in range(5)]
+            answers.append(resolver.search_many(['Guardian#1234'])[
+                'Guardian#1234'])
+            release.set()
+
+            deadline = time.monotonic() + 5
+            while resolver._refreshing and time.monotonic() < deadline:
+                time.sleep(0.001)
+
+        self.assertEqual(answers, [[CARD]] * 6)
+        self.assertEqual(self.calls, ['Guardian#1234'] * 2)
+        self.assertEqual(resolver.stats()['stale_hits'], 6)
+        self.assertEqual(resolver.search('Guardian#1234'), [renamed])
+        self.assertEqual(resolver.stats()['stale_hits'], 6)
+
+    def test_failed_refreshes_keep_the_stale_entry(self):
+        resolver = self.resolver()
+        self.envelopes['1'] = found({'destinyMemberships': [CARD]})
+        resolver.memberships('1')
+
+        self.clock.now += 101
+        self.envelopes['1'] = failed(5, 'SystemDisabled')
+        self.assertEqual(resolver.memberships('1')
+                         , {'destinyMemberships': [CARD]})
+
+        deadline = time.monotonic() + 5
+        while resolver._refreshing and time.monotonic() < deadline:
+            time.sleep(0.001)
+
+        self.assertEqual(self.calls, ['1', '1'])
+        self.assertEqual(resolver.memberships('1')
+                         , {'destinyMemberships': [CARD]})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+""" Tests of request instrumentation """
+
+import unittest
+
+from bungie_net_api import endpoints
+from bungie_net_api import instrumentation
+
+ROOT = 'https://www.bungie.net/Platform'
+
+
+def name_of(endpoint, **params):
+    return instrumentation.endpoint_name(ROOT + endpoints.method(endpoint
+                                                                 , **params))
+
+
+class EndpointNameTest(unittest.TestCase):
+
+    def test_ids_are_masked(self):
+        self.assertEqual(name_of('GetProfile', membershipType='2'
+                                 , destinyMembershipId='4611686018'
+                                 , components='100')
+                         , '/Platform/Destiny2/{id}/Profile/{id}/')
+
+    def test_display_names_are_masked(self):
+        self.assertEqual(name_of('SearchDestinyPlayer', membershipType='-1'
+                                 , displayName='Zoë#1234')
+                         , '/Platform/Destiny2/SearchDestinyPlayer/{id}'
+                         '/{name}/')
+        self.assertEqual(name_of('GetMembershipIdByDisplayName'
+                                 , membershipType='2'
+                                 , displayName='Guardian')
+                         , '/Platform/Destiny2/{id}/Stats'
+                         '/GetMembershipIdByDisplayName/{name}/')
+
+    def test_every_registered_path_parameter_is_masked(self):
+        for target in endpoints.ENDPOINTS.values():
+            params = dict((name, 'value' + name)
+                          for name in target.parameters)
+            name = instrumentation.endpoint_name(ROOT + target.method(params))
+            for value in params.values():
+                self.assertNotIn(value, name, target.name)
+
+    def test_literal_segments_win_over_parameters(self):
+        self.assertEqual(name_of('GetCharacterInventorySummary'
+                                 , membershipType='2'
+                                 , destinyMembershipId='1'
+                                 , characterId='3')
+                         , '/Platform/Destiny2/{id}/Account/{id}/Character'
+                         '/{id}/Inventory/Summary/')
+
+    def test_other_urls_mask_ids(self):
+        self.assertEqual(instrumentation.endpoint_name(
+            ROOT + '/App/OAuth/token/'), '/Platform/App/OAuth/token/')
+        self.assertEqual(instrumentation.endpoint_name(
+            ROOT + '/Unknown/123/'), '/Platform/Unknown/{id}/')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,209 @@
+""" Tests of the local manifest and its memory-mapped export """
+
+import copy
+import http.server
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from bungie_net_api import api
+from bungie_net_api import decoders
+from bungie_net_api import manifest
+from bungie_net_api import mapped_manifest
+
+FIXTURES = os.path.join(os.path.dirname(__file__), '..', 'bench', 'fixtures')
+
+ENTITY_TYPES = ('DestinyInventoryItemDefinition', 'DestinyStatDefinition')
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), 'rb') as body:
+        return json.loads(body.read())
+
+
+def definitions(entity_type, count):
+    """definitions(entity_type, count) -> table of count copies of the
+    recorded definition, spread over the whole unsigned 32 bit range"""
+
+    recorded = next(iter(fixture(entity_type + '.json').values()))
+    table = {}
+
+    for index in range(count):
+        hash_identifier = (index * 2654435761) & 0xFFFFFFFF
+        definition = copy.deepcopy(recorded)
+        definition['hash'] = hash_identifier
+        definition['index'] = index
+        definition['displayProperties']['name'] = 'Definition é %d' % index
+        table[str(hash_identifier)] = definition
+
+    return table
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        body = self.server.bodies.get(self.path.split('?')[0])
+
+        if body is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ManifestTest(unittest.TestCase):
+
+    def setUp(self):
+        envelope = fixture('manifest.json')
+        paths = envelope['Response']['jsonWorldComponentContentPaths']['en']
+
+        # an odd row count exercises the padding after the hash column
+        self.tables = {ENTITY_TYPES[0]: definitions(ENTITY_TYPES[0], 301)
+                       , ENTITY_TYPES[1]: definitions(ENTITY_TYPES[1], 8)}
+
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0)
+                                                      , Handler)
+        self.server.bodies = dict(
+            (paths[entity_type], json.dumps(table).encode('utf-8'))
+            for entity_type, table in self.tables.items())
+        self.server.bodies['/Platform/Destiny2/Manifest/'] = json.dumps(
+            envelope).encode('utf-8')
+        threading.Thread(target=self.server.serve_forever, args=(0.01,)
+                         , daemon=True).start()
+        root = 'http://127.0.0.1:%d' % self.server.server_address[1]
+        patcher = mock.patch.object(api, 'BUNGIE_NET_ROOT', root)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        api.configure(api_key='key', scheduler=False)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+        self.manifest = manifest.Manifest(os.path.join(self.directory
+                                                       , 'manifest.sqlite3'))
+        self.addCleanup(self.manifest.close)
+        self.assertTrue(self.manifest.sync())
+
+    def tearDown(self):
+        api.configure()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def export(self):
+        exported = os.path.join(self.directory, 'mapped')
+        mapped_manifest.export_manifest(self.manifest, exported)
+        mapped = mapped_manifest.MappedManifest(exported)
+        self.addCleanup(mapped.close)
+        return mapped
+
+    def test_round_trip(self):
+        mapped = self.export()
+
+        self.assertEqual(mapped.version, self.manifest.version)
+
+        for entity_type, table in self.tables.items():
+            self.assertEqual(len(mapped.table(entity_type)), len(table))
+            for hash_identifier, definition in table.items():
+                stored = self.manifest.get(entity_type, hash_identifier)
+                self.assertEqual(stored, definition)
+                self.assertEqual(mapped.get(entity_type, hash_identifier)
+                                 , stored)
+                self.assertIn((entity_type, hash_identifier), mapped)
+
+    def test_signed_hashes(self):
+        mapped = self.export()
+
+        for hash_identifier in self.tables[ENTITY_TYPES[0]]:
+            signed = int(hash_identifier)
+            if signed >= 2 ** 31:
+                signed -= 2 ** 32
+            self.assertEqual(mapped.get(ENTITY_TYPES[0], signed)
+                             , self.manifest.get(ENTITY_TYPES[0], signed))
+
+    def test_missing_definitions(self):
+        mapped = self.export()
+        stored = set(int(hash_identifier)
+                     for hash_identifier in self.tables[ENTITY_TYPES[1]])
+        missing = [hash_identifier for hash_identifier in (0, 1, 2 ** 32 - 1)
+                   if hash_identifier not in stored]
+
+        for hash_identifier in missing:
+            self.assertIsNone(mapped.get(ENTITY_TYPES[1], hash_identifier))
+            self.assertIsNone(self.manifest.get(ENTITY_TYPES[1]
+                                                , hash_identifier))
+        self.assertIsNone(mapped.get('DestinyActivityDefinition', 1))
+        self.assertNotIn(('DestinyActivityDefinition', 1), mapped)
+
+    def test_reload_maps_a_new_export(self):
+        mapped = self.export()
+        self.assertIsNotNone(mapped.get(ENTITY_TYPES[1], 0))
+
+        self.tables[ENTITY_TYPES[1]] = definitions(ENTITY_TYPES[1], 3)
+        paths = fixture('manifest.json')['Response'][
+            'jsonWorldComponentContentPaths']['en']
+        self.server.bodies[paths[ENTITY_TYPES[1]]] = json.dumps(
+            self.tables[ENTITY_TYPES[1]]).encode('utf-8')
+        self.assertTrue(self.manifest.sync(force=True))
+        mapped_manifest.export_manifest(self.manifest, mapped.directory)
+        mapped.reload()
+
+        self.assertEqual(len(mapped.table(ENTITY_TYPES[1])), 3)
+        table = self.tables[ENTITY_TYPES[1]]
+        for hash_identifier, definition in table.items():
+            self.assertEqual(mapped.get(ENTITY_TYPES[1], hash_identifier)
+                             , definition)
+
+
+    def test_definitions_use_the_configured_decoder(self):
+        decoded = []
+
+        def decoder(data):
+            decoded.append(data)
+            return json.loads(data)
+
+        previous = decoders.set_decoder(decoder)
+        try:
+            for hash_identifier, definition in self.tables[
+                    ENTITY_TYPES[1]].items():
+                self.assertEqual(self.manifest.get(ENTITY_TYPES[1]
+                                                   , hash_identifier)
+                                 , definition)
+        finally:
+            decoders.set_decoder(previous)
+
+        self.assertEqual(len(decoded), len(self.tables[ENTITY_TYPES[1]]))
+        for data in decoded:
+            self.assertIsInstance(data, bytes)
+
+    def test_unknown_entity_types_raise(self):
+        typo = manifest.Manifest(self.manifest.path, entity_types=[
+            ENTITY_TYPES[1], 'DestinyStatDefinitions'])
+        self.addCleanup(typo.close)
+
+        with self.assertRaises(ValueError) as raised:
+            typo.sync(force=True)
+
+        self.assertEqual(str(raised.exception)
+                         , 'unknown entity type: DestinyStatDefinitions')
+        self.assertEqual(sorted(typo.stored_entity_types())
+                         , sorted(ENTITY_TYPES))
+        self.assertIsNotNone(typo.get(ENTITY_TYPES[1], 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
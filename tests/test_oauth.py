@@ -0,0 +1,169 @@
+""" Tests of OAuth sessions """
+
+import http.server
+import json
+import threading
+import time
+import unittest
+import urllib.parse
+from unittest import mock
+
+from bungie_net_api import api
+from bungie_net_api import oauth
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        form = urllib.parse.parse_qs(self.rfile.read(
+            int(self.headers['Content-Length'])).decode('ascii'))
+        refresh_token = form['refresh_token'][0]
+
+        # slow enough for concurrent callers to pile up behind the lock
+        time.sleep(0.05)
+
+        with self.server.lock:
+            self.server.refreshes.append(refresh_token)
+            issued = len(self.server.refreshes)
+
+        if refresh_token == 'revoked':
+            self.reply(400, {'error': 'invalid_grant'
+                             , 'error_description': 'refresh token revoked'})
+            return
+
+        self.reply(200, {'access_token': 'access-%d' % issued
+                         , 'refresh_token': 'refresh-%d' % issued
+                         , 'expires_in': 3600
+                         , 'refresh_expires_in': 7776000
+                         , 'membership_id': '42'})
+
+    def do_GET(self):
+        authorization = self.headers.get('Authorization')
+
+        with self.server.lock:
+            self.server.calls.append(authorization)
+
+        if authorization == 'Bearer refused':
+            self.reply(200, {'ErrorCode': 99
+                             , 'ErrorStatus': 'AccessTokenHasExpired'})
+        else:
+            self.reply(200, {'ErrorCode': 1, 'Response': authorization})
+
+
+class OAuthSessionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0)
+                                                      , Handler)
+        self.server.lock = threading.Lock()
+        self.server.refreshes = []
+        self.server.calls = []
+        threading.Thread(target=self.server.serve_forever, args=(0.01,)
+                         , daemon=True).start()
+        self.root = 'http://127.0.0.1:%d' % self.server.server_address[1]
+        patcher = mock.patch.object(api, 'BUNGIE_NET_ROOT', self.root)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        api.configure(api_key='key', scheduler=False)
+
+    def tearDown(self):
+        api.configure()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def session(self, access_token='access-0', refresh_token='refresh-0'
+                , expires_in=3600, **kwargs):
+        token = oauth.Token(access_token, refresh_token
+                            , time.time() + expires_in)
+        return oauth.OAuthSession(token, client_id='1234'
+                                  , token_url=self.root + '/token/'
+                                  , **kwargs)
+
+    def test_tokens_are_refreshed_before_they_expire(self):
+        refreshed = []
+        session = self.session(expires_in=30, on_refresh=refreshed.append)
+
+        envelope = session.call('/User/GetMembershipsForCurrentUser/')
+
+        self.assertEqual(envelope['Response'], 'Bearer access-1')
+        self.assertEqual(self.server.refreshes, ['refresh-0'])
+        self.assertEqual(refreshed, [session])
+        self.assertEqual(session.token.refresh_token, 'refresh-1')
+        self.assertFalse(session.token.expires_within(3000))
+
+    def test_fresh_tokens_are_not_refreshed(self):
+        session = self.session()
+
+        envelope = session.call('/User/GetMembershipsForCurrentUser/')
+
+        self.assertEqual(envelope['Response'], 'Bearer access-0')
+        self.assertEqual(self.server.refreshes, [])
+
+    def test_refused_tokens_are_refreshed_once(self):
+        session = self.session(access_token='refused')
+
+        envelope = session.call('/User/GetMembershipsForCurrentUser/')
+
+        self.assertEqual(envelope['Response'], 'Bearer access-1')
+        self.assertEqual(self.server.calls, ['Bearer refused'
+                                             , 'Bearer access-1'])
+        self.assertEqual(session.refreshes, 1)
+
+    def test_concurrent_callers_share_one_refresh(self):
+        session = self.session(expires_in=30)
+        barrier = threading.Barrier(8)
+        results = []
+
+        def caller(index):
+            barrier.wait()
+            results.append(session.call('/Destiny2/%d/' % index))
+
+        threads = [threading.Thread(target=caller, args=(index,))
+                   for index in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.server.refreshes, ['refresh-0'])
+        self.assertEqual([envelope['Response'] for envelope in results]
+                         , ['Bearer access-1'] * 8)
+        self.assertEqual(session.refreshes, 1)
+
+    def test_rejected_refresh_tokens_raise(self):
+        session = self.session(refresh_token='revoked', expires_in=30)
+
+        with self.assertRaises(oauth.OAuthError) as raised:
+            session.call('/User/GetMembershipsForCurrentUser/')
+
+        self.assertEqual(raised.exception.error, 'invalid_grant')
+        self.assertEqual(raised.exception.description
+                         , 'refresh token revoked')
+        self.assertEqual(self.server.calls, [])
+        self.assertEqual(session.token.access_token, 'access-0')
+
+    def test_tokens_without_refresh_token(self):
+        session = oauth.OAuthSession('bare')
+
+        with self.assertRaises(oauth.OAuthError):
+            session.refresh()
+
+        self.assertEqual(session.call('/Destiny2/1/')['Response']
+                         , 'Bearer bare')
+
+
+if __name__ == '__main__':
+    unittest.main()
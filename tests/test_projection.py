@@ -0,0 +1,127 @@
+""" Tests of response projection and streamed decoding """
+
+import io
+import os
+import unittest
+from unittest import mock
+
+from bungie_net_api import decoders
+from bungie_net_api import projection
+
+FIXTURES = os.path.join(os.path.dirname(__file__), '..', 'bench', 'fixtures')
+
+# (fixture, fields, envelope) projected by every decode path
+
+CASES = [
+    ('profile.json', ['Response.characters.data.*.classType'
+                      , 'Response.characters.data.*.characterId'], True),
+    ('profile.json', ['Response.profile.data.characterIds.1'
+                      , 'Response.profile.data.userInfo'], True),
+    ('pgcr.json', ['Response.entries.*.player.destinyUserInfo.membershipId'
+                   , 'Response.entries.*.values.kills.basic.value'
+                   , 'Response.activityDetails.modes'], True),
+    ('members.json', ['Response.results.*.destinyUserInfo.membershipId'
+                      , 'Response.hasMore'], True),
+    ('manifest.json', ['Response.jsonWorldComponentContentPaths.en.*'], True),
+    ('leaderboards.json', ['Response.*.*.entries.*.rank'], False),
+    ('DestinyInventoryItemDefinition.json', ['*.displayProperties.name'
+                                             , '*.hash'], False),
+    ('activity.json', ['values.*.basic.value', 'missing.field'], False),
+]
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), 'rb') as body:
+        return body.read()
+
+
+class ProjectionTest(unittest.TestCase):
+
+    def test_characters(self):
+        document = decoders.decode(fixture('profile.json'))
+        characters = document['Response']['characters']['data']
+
+        projected = projection.decode(fixture('profile.json')
+                                      , CASES[0][1])
+
+        self.assertEqual(projected['Response']['characters']['data'], dict(
+            (key, {'classType': value['classType']
+                   , 'characterId': value['characterId']})
+            for key, value in characters.items()))
+        self.assertEqual(projected['ErrorCode'], document['ErrorCode'])
+        self.assertNotIn('profile', projected['Response'])
+
+    def test_list_indexes(self):
+        projected = projection.decode(fixture('profile.json'), CASES[1][1])
+        document = decoders.decode(fixture('profile.json'))
+
+        self.assertEqual(projected['Response']['profile']['data'], {
+            'characterIds': document['Response']['profile']['data']
+            ['characterIds'][1:2]
+            , 'userInfo': document['Response']['profile']['data']
+            ['userInfo']})
+
+    def test_decoders_agree(self):
+        for name, fields, envelope in CASES:
+            expected = projection.Projection(fields, envelope).apply(
+                decoders.decode(fixture(name)))
+
+            for decoder in decoders.DECODERS:
+                previous = decoders.set_decoder(decoder)
+                try:
+                    self.assertEqual(projection.Projection(
+                        fields, envelope).decode(fixture(name))
+                        , expected, (name, decoder))
+                finally:
+                    decoders.set_decoder(previous)
+
+    def test_streaming_falls_back_without_ijson(self):
+        with mock.patch.object(decoders, 'ijson', None):
+            for name, fields, envelope in CASES:
+                streamed = projection.Projection(fields, envelope
+                                                 , streaming=True)
+                full = projection.Projection(fields, envelope)
+
+                self.assertEqual(streamed.parse(io.BytesIO(fixture(name)))
+                                 , full.decode(fixture(name)), name)
+
+    @unittest.skipIf(decoders.ijson is None, 'ijson is not installed')
+    def test_streaming_matches_the_full_decode(self):
+        for name, fields, envelope in CASES:
+            streamed = projection.Projection(fields, envelope, streaming=True)
+            full = projection.Projection(fields, envelope)
+
+            self.assertEqual(streamed.decode(fixture(name))
+                             , full.decode(fixture(name)), name)
+            self.assertEqual(streamed.parse(io.BytesIO(fixture(name)))
+                             , full.decode(fixture(name)), name)
+
+
+class StreamedDecodeTest(unittest.TestCase):
+
+    def check(self):
+        entries = decoders.decode(fixture('pgcr.json'))['Response']['entries']
+        definitions = decoders.decode(fixture('DestinyStatDefinition.json'))
+
+        self.assertEqual(list(decoders.iter_items(io.BytesIO(
+            fixture('pgcr.json')), 'Response.entries.item')), entries)
+        self.assertEqual(list(decoders.iter_items(io.BytesIO(
+            fixture('pgcr.json')), 'Response.entries.item.standing'))
+            , [entry['standing'] for entry in entries])
+        self.assertEqual(list(decoders.iter_kvitems(io.BytesIO(
+            fixture('DestinyStatDefinition.json'))))
+            , list(definitions.items()))
+        self.assertEqual(list(decoders.iter_kvitems(io.BytesIO(
+            fixture('pgcr.json')), 'Response.missing')), [])
+
+    def test_fallback(self):
+        with mock.patch.object(decoders, 'ijson', None):
+            self.check()
+
+    @unittest.skipIf(decoders.ijson is None, 'ijson is not installed')
+    def test_ijson(self):
+        self.check()
+
+
+if __name__ == '__main__':
+    unittest.main()
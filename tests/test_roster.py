@@ -0,0 +1,47 @@
+""" Tests of the clan roster fan-out """
+
+import unittest
+import urllib.error
+from unittest import mock
+
+from bungie_net_api import api
+from bungie_net_api import roster
+
+
+def members(count):
+    return [{'destinyUserInfo': {'membershipType': 2
+                                 , 'membershipId': str(index)
+                                 , 'displayName': 'member%d' % index}
+             , 'isOnline': False} for index in range(count)]
+
+
+class RosterTest(unittest.TestCase):
+
+    def roster(self, getProfile, count=5):
+        with mock.patch.object(roster, 'iter_group_members'
+                               , lambda group_id: iter(members(count))), \
+                mock.patch.object(api, 'getProfile', getProfile):
+            return roster.get_clan_roster('1', workers=4)
+
+    def test_a_failing_member_does_not_fail_the_roster(self):
+        def getProfile(membership_id, membership_type, components):
+            if membership_id == '3':
+                raise urllib.error.URLError('connection reset')
+            return {'ErrorCode': 1, 'Response': {'profile': {'data': {
+                'membershipId': membership_id}}}}
+
+        result = self.roster(getProfile)['members']
+
+        self.assertEqual(len(result), 5)
+        for member in result:
+            if member['membershipId'] == '3':
+                self.assertIsNone(member['response'])
+                self.assertIn('connection reset', member['error'])
+            else:
+                self.assertIsNone(member['error'])
+                self.assertEqual(member['profile']
+                                 , {'membershipId': member['membershipId']})
+
+
+if __name__ == '__main__':
+    unittest.main()
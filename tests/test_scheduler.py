@@ -0,0 +1,239 @@
+""" Tests of the rate limited request scheduler """
+
+import io
+import unittest
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from bungie_net_api import instrumentation
+from bungie_net_api import scheduler
+
+# the throttling members of PlatformErrorCodes, from
+# https://bungie-net.github.io/multi/schema_Exceptions-PlatformErrorCodes.html
+
+PLATFORM_ERROR_CODES = {
+    'ThrottleLimitExceeded': 31,
+    'ThrottleLimitExceededMinutes': 35,
+    'ThrottleLimitExceededMomentarily': 36,
+    'ThrottleLimitExceededSeconds': 37,
+    'PerEndpointRequestThrottleExceeded': 51,
+    'PerApplicationThrottleExceeded': 54,
+    'PerApplicationAnonymousThrottleExceeded': 55,
+    'PerApplicationAuthenticatedThrottleExceeded': 56,
+    'PerUserThrottleExceeded': 57,
+    'DestinyThrottledByGameServer': 1672,
+}
+
+# neighbours of the throttle codes that must not be retried
+
+NOT_THROTTLING = {
+    'AuthContextCacheAssertion': 52,
+    'ExPlatformStringValidationError': 53,
+}
+
+
+class ThrottleErrorCodesTest(unittest.TestCase):
+
+    def test_codes_match_their_names(self):
+        for code, name in scheduler.THROTTLE_ERROR_NAMES.items():
+            self.assertEqual(PLATFORM_ERROR_CODES[name], code, name)
+
+        self.assertEqual(scheduler.THROTTLE_ERROR_CODES
+                         , frozenset(PLATFORM_ERROR_CODES.values()))
+
+    def test_other_codes_are_not_throttling(self):
+        for name, code in NOT_THROTTLING.items():
+            self.assertNotIn(code, scheduler.THROTTLE_ERROR_CODES, name)
+
+    def test_events_report_the_same_codes(self):
+        for code in list(PLATFORM_ERROR_CODES.values()) + [52, 53, 1]:
+            event = instrumentation.RequestEvent('https://example/')
+            event.error_code = code
+            self.assertEqual(event.throttled
+                             , code in PLATFORM_ERROR_CODES.values(), code)
+
+
+class SubmitTest(unittest.TestCase):
+
+    def test_workers_run_at_the_callers_priority(self):
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            with scheduler.background():
+                futures = [scheduler.submit(executor
+                                            , scheduler.current_priority)
+                           for _ in range(20)]
+            interactive = scheduler.submit(executor
+                                           , scheduler.current_priority)
+
+        self.assertEqual([future.result() for future in futures]
+                         , [scheduler.BACKGROUND] * 20)
+        self.assertEqual(interactive.result(), scheduler.INTERACTIVE)
+
+    def test_arguments_are_passed(self):
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            self.assertEqual(scheduler.submit(executor, divmod, 7, 2).result()
+                             , (3, 1))
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TokenBucketTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch.object(scheduler.time, 'monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_is_served_at_once(self):
+        bucket = scheduler.TokenBucket(rate=10, burst=3)
+
+        self.assertEqual([bucket._take(scheduler.INTERACTIVE)
+                          for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(bucket._take(scheduler.INTERACTIVE), 0.1)
+
+    def test_tokens_refill_at_the_rate_up_to_the_burst(self):
+        bucket = scheduler.TokenBucket(rate=10, burst=3)
+        for _ in range(3):
+            bucket._take(scheduler.INTERACTIVE)
+
+        self.clock.now += 0.2
+        self.assertEqual([bucket._take(scheduler.INTERACTIVE)
+                          for _ in range(2)], [0, 0])
+        self.assertGreater(bucket._take(scheduler.INTERACTIVE), 0)
+
+        self.clock.now += 3600
+        self.assertEqual([bucket._take(scheduler.INTERACTIVE)
+                          for _ in range(3)], [0, 0, 0])
+        self.assertGreater(bucket._take(scheduler.INTERACTIVE), 0)
+
+    def test_background_waits_for_interactive_callers(self):
+        bucket = scheduler.TokenBucket(rate=10, burst=3)
+        bucket._waiting[scheduler.INTERACTIVE] = 1
+
+        self.assertGreater(bucket._take(scheduler.BACKGROUND), 0)
+        self.assertEqual(bucket._take(scheduler.INTERACTIVE), 0)
+
+    def test_pause_empties_the_bucket(self):
+        bucket = scheduler.TokenBucket(rate=10, burst=3)
+        bucket.pause(5)
+
+        self.assertAlmostEqual(bucket._take(scheduler.INTERACTIVE), 5)
+        self.clock.now += 5
+        self.assertAlmostEqual(bucket._take(scheduler.INTERACTIVE), 0.1)
+
+
+class ExecuteTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sleeps = []
+        patcher = mock.patch.object(scheduler.time, 'sleep'
+                                    , self.sleeps.append)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.scheduler = scheduler.Scheduler(rate=1000, burst=1000
+                                             , max_retries=3)
+
+    def run_results(self, results):
+        calls = []
+
+        def fn():
+            calls.append(None)
+            result = results[min(len(calls), len(results)) - 1]
+            if isinstance(result, Exception):
+                raise result
+            return None, result
+
+        return calls, fn
+
+    def test_throttle_codes_are_retried(self):
+        for code in scheduler.THROTTLE_ERROR_CODES:
+            calls, fn = self.run_results([{'ErrorCode': code}
+                                          , {'ErrorCode': 1}])
+            self.assertEqual(self.scheduler.execute(fn, 'key')
+                             , (None, {'ErrorCode': 1}))
+            self.assertEqual(len(calls), 2, code)
+
+        self.assertEqual(self.scheduler.throttled
+                         , len(scheduler.THROTTLE_ERROR_CODES))
+
+    def test_other_error_codes_are_returned(self):
+        for code in (52, 53, 7, 1):
+            calls, fn = self.run_results([{'ErrorCode': code}])
+            self.assertEqual(self.scheduler.execute(fn, 'key')
+                             , (None, {'ErrorCode': code}))
+            self.assertEqual(len(calls), 1, code)
+
+        self.assertEqual(self.sleeps, [])
+
+    def test_retries_stop_after_max_retries(self):
+        calls, fn = self.run_results([{'ErrorCode': 36}])
+
+        self.assertEqual(self.scheduler.execute(fn, 'key')
+                         , (None, {'ErrorCode': 36}))
+        self.assertEqual(len(calls), 4)
+        self.assertEqual(self.scheduler.retries, 3)
+
+    def test_throttle_seconds_are_waited_at_least(self):
+        calls, fn = self.run_results([{'ErrorCode': 36
+                                       , 'ThrottleSeconds': 0.02}
+                                      , {'ErrorCode': 1}])
+
+        self.scheduler.execute(fn, 'key')
+
+        self.assertGreaterEqual(self.sleeps[0], 0.02)
+
+    def test_transient_http_errors_are_retried(self):
+        unavailable = urllib.error.HTTPError('url', 503, 'unavailable'
+                                             , {'Retry-After': '2'}
+                                             , io.BytesIO())
+        calls, fn = self.run_results([unavailable, {'ErrorCode': 1}])
+
+        self.scheduler.execute(fn, 'key')
+
+        self.assertEqual(len(calls), 2)
+        self.assertGreaterEqual(self.sleeps[0], 2)
+
+    def test_client_errors_are_raised(self):
+        missing = urllib.error.HTTPError('url', 404, 'missing', {}
+                                         , io.BytesIO())
+        calls, fn = self.run_results([missing])
+
+        with self.assertRaises(urllib.error.HTTPError):
+            self.scheduler.execute(fn, 'key')
+        self.assertEqual(len(calls), 1)
+
+    def test_backoff_grows_exponentially_up_to_the_cap(self):
+        with mock.patch.object(scheduler.random, 'uniform'
+                               , lambda low, high: high):
+            delays = [self.scheduler._delay(attempt)
+                      for attempt in range(8)]
+
+        self.assertEqual(delays, [0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 30.0
+                                  , 30.0])
+
+    def test_async_retries(self):
+        import asyncio
+
+        calls = []
+
+        async def fn():
+            calls.append(None)
+            return None, {'ErrorCode': 36 if len(calls) == 1 else 1}
+
+        with mock.patch.object(asyncio, 'sleep', mock.AsyncMock()):
+            result = asyncio.run(self.scheduler.execute_async(fn, 'key'))
+
+        self.assertEqual(result, (None, {'ErrorCode': 1}))
+        self.assertEqual(len(calls), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+""" Tests of the lazily resolved settings """
+
+import os
+import subprocess
+import sys
+import unittest
+from unittest import mock
+
+from bungie_net_api import api
+from bungie_net_api import settings
+
+
+class DebugFlagTest(unittest.TestCase):
+
+    def test_debug_is_a_flag(self):
+        for value, expected in (('true', True), ('1', True), ('on', True)
+                                , ('0', False), ('off', False), (0, False)
+                                , (2, True)):
+            self.assertIs(settings.Settings(debug=value).get('debug')
+                          , expected, value)
+
+    def test_debug_from_the_environment(self):
+        with mock.patch.dict(os.environ, {'BUNGIE_NET_API_DEBUG': 'yes'}):
+            self.assertIs(settings.Settings().get('debug'), True)
+
+    def test_import_with_a_word_for_debug(self):
+        for value, expected in (('true', 'True'), ('false', 'False')):
+            environment = dict(os.environ, BUNGIE_NET_API_DEBUG=value)
+            output = subprocess.run(
+                [sys.executable, '-c'
+                 , 'import bungie_net_api; print(bungie_net_api.DEBUG)']
+                , env=environment, capture_output=True, text=True
+                , check=True).stdout
+            self.assertEqual(output.strip(), expected)
+
+
+class ConfigureDebugTest(unittest.TestCase):
+
+    def tearDown(self):
+        api.configure()
+        api.ensure_configured()
+
+    def test_configure_turns_debug_on_and_off(self):
+        api.configure(debug=True)
+        api.ensure_configured()
+        self.assertIs(api.DEBUG, True)
+
+        api.configure(debug=0)
+        api.ensure_configured()
+        self.assertIs(api.DEBUG, False)
+
+
+if __name__ == '__main__':
+    unittest.main()
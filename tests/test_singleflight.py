@@ -0,0 +1,75 @@
+""" Tests of request coalescing """
+
+import asyncio
+import unittest
+
+from bungie_net_api import singleflight
+
+
+class DoAsyncTest(unittest.TestCase):
+
+    def test_cancelling_the_leader_does_not_cancel_followers(self):
+        flight = singleflight.SingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(asyncio.current_task())
+            await asyncio.sleep(0.05)
+            return 'profile'
+
+        async def run():
+            leader = asyncio.ensure_future(flight.do_async('key', fetch))
+            await asyncio.sleep(0)
+            followers = [asyncio.ensure_future(flight.do_async('key', fetch))
+                         for _ in range(3)]
+            await asyncio.sleep(0.01)
+
+            leader.cancel()
+            results = await asyncio.gather(*followers)
+
+            with self.assertRaises(asyncio.CancelledError):
+                await leader
+
+            return results
+
+        self.assertEqual(asyncio.run(run()), ['profile'] * 3)
+        # the cancelled leader's call, then one call for all followers
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(flight._async_calls, {})
+
+    def test_followers_share_the_leaders_result(self):
+        flight = singleflight.SingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {'ErrorCode': 1}
+
+        async def run():
+            return await asyncio.gather(*[flight.do_async('key', fetch)
+                                          for _ in range(4)])
+
+        results = asyncio.run(run())
+
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    def test_errors_reach_every_caller(self):
+        flight = singleflight.SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.01)
+            raise ValueError('bad body')
+
+        async def run():
+            return await asyncio.gather(*[flight.do_async('key', fetch)
+                                          for _ in range(3)]
+                                        , return_exceptions=True)
+
+        for result in asyncio.run(run()):
+            self.assertIsInstance(result, ValueError)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+""" Tests of the pooled HTTP transport """
+
+import http.server
+import os
+import threading
+import unittest
+import urllib.error
+from unittest import mock
+
+from bungie_net_api import transport
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body=b'', headers=()):
+        self.server.seen.append((self.command, self.path, dict(self.headers)))
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def route(self):
+        path = self.path.split('://', 1)[-1]
+        path = path[path.index('/'):]
+
+        if path.startswith('/moved/'):
+            self.reply(int(path.split('/')[2])
+                       , headers=[('Location', '/target/')])
+        elif path == '/loop/':
+            self.reply(302, headers=[('Location', '/loop/')])
+        elif path == '/nowhere/':
+            self.reply(302)
+        elif path == '/cached/':
+            self.reply(304)
+        else:
+            self.reply(200, b'{"ErrorCode": 1}')
+
+    def do_GET(self):
+        self.route()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self.route()
+
+
+class TransportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0)
+                                                      , Handler)
+        self.server.seen = []
+        threading.Thread(target=self.server.serve_forever, args=(0.01,)
+                         , daemon=True).start()
+        self.root = 'http://127.0.0.1:%d' % self.server.server_address[1]
+        self.transport = transport.Transport()
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_redirects_are_followed(self):
+        for status in sorted(transport.REDIRECT_STATUSES):
+            response = self.transport.request(self.root + '/moved/%d/'
+                                              % status)
+            self.assertEqual(response.status, 200)
+            self.assertEqual(response.body, b'{"ErrorCode": 1}')
+            self.assertEqual(response.url, self.root + '/target/')
+
+    def test_redirected_post_is_sent_again_as_get(self):
+        response = self.transport.request(
+            self.root + '/moved/303/', method='POST', body=b'form'
+            , headers={'Content-Type': 'application/x-www-form-urlencoded'})
+
+        self.assertEqual(response.status, 200)
+        method, path, headers = self.server.seen[-1]
+        self.assertEqual((method, path), ('GET', '/target/'))
+        self.assertNotIn('Content-Type', headers)
+
+    def test_redirected_post_is_not_repeated_after_307(self):
+        with self.assertRaises(urllib.error.HTTPError) as raised:
+            self.transport.request(self.root + '/moved/307/'
+                                   , method='POST', body=b'form')
+
+        self.assertEqual(raised.exception.code, 307)
+
+    def test_redirect_loops_raise(self):
+        with self.assertRaises(urllib.error.HTTPError) as raised:
+            self.transport.request(self.root + '/loop/')
+
+        self.assertEqual(raised.exception.code, 302)
+        self.assertEqual(len(self.server.seen), transport.MAX_REDIRECTS + 1)
+
+    def test_redirects_without_location_raise(self):
+        with self.assertRaises(urllib.error.HTTPError) as raised:
+            self.transport.request(self.root + '/nowhere/')
+
+        self.assertEqual(raised.exception.code, 302)
+
+    def test_not_modified_is_returned(self):
+        self.assertEqual(self.transport.request(self.root + '/cached/')
+                         .status, 304)
+
+    def test_http_proxy_from_the_environment(self):
+        environment = {'http_proxy': 'http://user:secret@' + self.root[7:]}
+
+        with mock.patch.dict(os.environ, environment):
+            for name in ('no_proxy', 'NO_PROXY'):
+                os.environ.pop(name, None)
+            proxied = transport.Transport()
+            try:
+                proxied.request('http://www.bungie.net/Platform/Test/')
+            finally:
+                proxied.close()
+
+        method, path, headers = self.server.seen[-1]
+        self.assertEqual(path, 'http://www.bungie.net/Platform/Test/')
+        self.assertEqual(headers['Proxy-Authorization']
+                         , 'Basic dXNlcjpzZWNyZXQ=')
+
+    def test_https_proxy_tunnels(self):
+        environment = {'https_proxy': 'proxy.example:3128'
+                       , 'no_proxy': 'localhost'}
+
+        with mock.patch.dict(os.environ, environment):
+            os.environ.pop('NO_PROXY', None)
+            pool = transport.Transport().pool_for('https', 'www.bungie.net')
+            bypassed = transport.Transport().pool_for('https', 'localhost')
+
+        conn = pool.new_connection()
+        self.assertEqual((conn.host, conn.port), ('proxy.example', 3128))
+        self.assertEqual(conn._tunnel_host, 'www.bungie.net')
+        self.assertFalse(pool.absolute_form)
+        self.assertIsNone(bypassed.proxy)
+
+
+if __name__ == '__main__':
+    unittest.main()